@@ -0,0 +1,20 @@
+import statistics
+
+import pytest
+
+pytest_plugins = "pytest_asgi_server"
+
+
+@pytest.fixture
+def report(request):
+    """Print a timing line for the benchmark. Run with 'pytest benchmarks -s'."""
+
+    def _report(label, samples):
+        print(
+            f"\n{request.node.name}: {label}: n={len(samples)}"
+            f" median={statistics.median(samples) * 1000:.1f}ms"
+            f" min={min(samples) * 1000:.1f}ms"
+            f" max={max(samples) * 1000:.1f}ms"
+        )
+
+    yield _report
@@ -0,0 +1,23 @@
+import asyncio
+import contextlib
+import os
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+# Stands in for opening database pools and warming caches
+STARTUP_DELAY = float(os.environ.get("LIFESPAN_STARTUP_DELAY", "0.2"))
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    await asyncio.sleep(STARTUP_DELAY)
+    yield
+
+
+async def ping(request):
+    return PlainTextResponse("pong")
+
+
+app = Starlette(lifespan=lifespan, routes=[Route("/ping", endpoint=ping)])
@@ -0,0 +1,18 @@
+import httpx
+import pytest
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["uvicorn", "hypercorn", "daphne"])
+async def test_backend_throughput(xserver_factory, asgi_load, backend):
+    """Compare the server backends on the same app. Run with 'pytest benchmarks -s'."""
+    pytest.importorskip(backend)
+    with xserver_factory(**xserver_params, backend=backend, name=backend) as xserver:
+        async with httpx.AsyncClient(base_url=xserver.http_base_url) as client:
+            for _ in range(50):  # Warm up
+                await client.get("/api")
+            result = await asgi_load(client, "/api", duration=2.0, concurrency=10)
+    print(f"\n{backend}: {result.summary()}")
+    assert result.errors == 0
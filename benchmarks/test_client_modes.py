@@ -0,0 +1,28 @@
+import statistics
+import time
+
+import pytest
+
+from tests.asgi_app import app
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+@pytest.mark.asyncio
+async def test_asgi_vs_xserver_client(xserver_factory, xclient_factory, report):
+    async def measure(mode):
+        samples = []
+        for n in range(10):
+            xserver = xserver_factory(**xserver_params, name=f"bench-{n}")
+            start = time.perf_counter()
+            async with await xclient_factory(app, xserver, mode=mode) as client:
+                for _ in range(10):
+                    await client.get("/api")
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    xserver = await measure("xserver")
+    asgi = await measure("asgi")
+    report("xserver client, 10 requests", xserver)
+    report("asgi client, 10 requests", asgi)
+    assert statistics.median(asgi) < statistics.median(xserver)
@@ -0,0 +1,17 @@
+import httpx
+import pytest
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+@pytest.mark.asyncio
+async def test_engine_throughput(xserver_factory, asgi_server_engine, asgi_load):
+    """Compare engines with e.g. '--asgi-server-loop asyncio,uvloop
+    --asgi-server-http h11,httptools'. The comparison is in the terminal summary."""
+    with xserver_factory(**xserver_params, name=asgi_server_engine.id) as xserver:
+        async with httpx.AsyncClient(base_url=xserver.http_base_url) as client:
+            for _ in range(50):  # Warm up
+                await client.get("/api")
+            result = await asgi_load(client, "/api", duration=2.0, concurrency=10)
+    print(f"\n{asgi_server_engine.id}: {result.summary()}")
+    assert result.errors == 0
@@ -0,0 +1,22 @@
+import subprocess
+import sys
+import time
+
+
+def measure_import(module, runs=10):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, "-c", f"import {module}"])
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def test_plugin_import_time(report):
+    baseline = measure_import("pytest")
+    plugin = measure_import("pytest_asgi_server")
+    servers = measure_import("pytest_asgi_server.clients")
+    report("import pytest", baseline)
+    report("import pytest_asgi_server", plugin)
+    report("import pytest_asgi_server.clients", servers)
+    assert min(plugin) - min(baseline) < (min(servers) - min(baseline)) / 2
@@ -0,0 +1,20 @@
+import httpx
+import pytest
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("latency", [0.0, 0.01, 0.05])
+async def test_throughput_under_latency(
+    xserver_factory, impairment_proxy_factory, asgi_load, latency
+):
+    """Compare throughput over loopback with added network latency. Run with
+    'pytest benchmarks -s'."""
+    xserver = xserver_factory(**xserver_params)
+    proxy = impairment_proxy_factory(xserver, latency=latency, jitter=latency / 5)
+    with proxy:
+        async with httpx.AsyncClient(base_url=proxy.http_base_url) as client:
+            result = await asgi_load(client, "/api", duration=2.0, concurrency=10)
+    print(f"\nlatency={latency * 1000:.0f}ms: {result.summary()}")
+    assert result.errors == 0
@@ -0,0 +1,20 @@
+import pytest
+
+from tests.asgi_app import app
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("connections", [100, 1000])
+async def test_websocket_fanout(
+    xserver_factory, xclient_factory, asgi_ws_fanout, connections
+):
+    xserver = xserver_factory(**xserver_params, ws_max_queue=1024)
+    async with await xclient_factory(app, xserver, mode="xserver") as client:
+        result = await asgi_ws_fanout(
+            client, "/ws", connections=connections, ramp_up=1.0, messages=20
+        )
+    print(f"\n{result.summary()}")
+    assert result.connect_errors == 0
+    assert result.missed_deliveries == 0
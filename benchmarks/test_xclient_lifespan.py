@@ -0,0 +1,38 @@
+import statistics
+import time
+
+import pytest
+from asgi_lifespan import LifespanManager
+
+from benchmarks.lifespan_app import app
+
+xserver_params = dict(
+    appstr="benchmarks.lifespan_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"}
+)
+
+
+@pytest.mark.asyncio
+async def test_xclient_single_lifespan(xserver_factory, xclient_factory, report):
+    """Time a client from creation to its first response, with the app's lifespan
+    run only by the server versus also in the test process, as it used to be."""
+
+    async def measure(double):
+        samples = []
+        for n in range(5):
+            xserver = xserver_factory(**xserver_params, name=f"lifespan-{n}")
+            start = time.perf_counter()
+            if double:
+                async with LifespanManager(app):
+                    client = await xclient_factory(app, xserver, mode="xserver")
+            else:
+                client = await xclient_factory(app, xserver, mode="xserver")
+            async with client:
+                await client.get("/ping")
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    double = await measure(double=True)
+    single = await measure(double=False)
+    report("lifespan in test and server process", double)
+    report("lifespan in server process only", single)
+    assert statistics.median(single) < statistics.median(double)
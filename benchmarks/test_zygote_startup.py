@@ -0,0 +1,27 @@
+import statistics
+import time
+
+from pytest_asgi_server.zygote import UvicornZygote
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+def test_zygote_vs_cold_spawn_startup(xprocess, pytestconfig, xserver_factory, report):
+    def measure_startup(**kwargs):
+        samples = []
+        for n in range(10):
+            xserver = xserver_factory(**xserver_params, name=f"bench-{n}", **kwargs)
+            start = time.perf_counter()
+            xserver.start()
+            samples.append(time.perf_counter() - start)
+            xserver.stop()
+        return samples
+
+    cold = measure_startup()
+    with UvicornZygote(
+        pytestconfig=pytestconfig, xprocess=xprocess, preload=["tests.asgi_app"]
+    ) as zygote:
+        forked = measure_startup(zygote=zygote)
+    report("cold spawn", cold)
+    report("zygote fork", forked)
+    assert statistics.median(forked) < statistics.median(cold)
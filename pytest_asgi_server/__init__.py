@@ -10,3 +10,30 @@ try:
     __version__ = version(__name__)
 except PackageNotFoundError:  # pragma: no cover
     __version__ = "unknown"
+
+
+# Imported on first access, see 'plugin'
+_LAZY_ATTRIBUTES = {
+    "PytestAsgiXClient": "clients",
+    "PytestAsgiXClientPool": "clients",
+    "PytestUvicornXServer": "servers",
+    "UvicornTestServerThread": "servers",
+    "PooledUvicornXServer": "pools",
+    "PytestUvicornXServerPool": "pools",
+    "UvicornZygote": "zygote",
+    "ServerGroup": "groups",
+    "ImpairmentProxy": "proxy",
+    "run_load": "load",
+    "run_websocket_fanout": "fanout",
+    "TrafficRecorder": "recording",
+    "replay_traffic": "recording",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+
+        module = importlib.import_module(f".{_LAZY_ATTRIBUTES[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
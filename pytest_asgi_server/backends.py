@@ -0,0 +1,282 @@
+# from __future__ import annotations
+
+import asyncio
+import importlib.util
+import inspect
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import uvicorn
+
+from .runner import (
+    SOCKET_PARAM_KEYS,
+    LifespanNotifier,
+    TimingMiddleware,
+    get_hypercorn_config,
+    install_task_timestamps,
+)
+
+
+class ServerBackend:
+    """ASGI server that test servers run apps on.
+
+    The server process runs the backend registered under 'name' in 'runner.py'.
+    In a thread, 'create_thread_server()' returns an object with a 'run(sockets)'
+    method that serves until 'request_exit()' is called, a 'started_event' set
+    once startup finished or failed, 'started' and 'startup_duration'.
+    """
+
+    name = ""
+    module = ""
+    # Log line the server writes once it serves, for readiness="log"
+    pattern = ""
+    default_kwargs: Dict[str, Any] = {}
+    ssl_kwargs: Tuple[str, ...] = ()
+    supports_thread = True
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.name}>"
+
+    def is_available(self) -> bool:
+        return importlib.util.find_spec(self.module) is not None
+
+    def check_available(self) -> None:
+        if not self.is_available():
+            raise ImportError(
+                f"The {self.name!r} server backend requires the {self.module!r}"
+                " package"
+            )
+
+    def get_config_param_keys(self) -> Tuple[str, ...]:
+        raise NotImplementedError
+
+    def normalize_param(self, key: str, value: Any) -> Any:
+        return value
+
+    def create_thread_server(
+        self, kwargs: Dict[str, Any], metrics_size: Optional[int] = None
+    ):
+        raise NotImplementedError
+
+
+class UvicornBackend(ServerBackend):
+    name = "uvicorn"
+    module = "uvicorn"
+    pattern = "Uvicorn running on *"
+    default_kwargs = {"loop": "asyncio", "lifespan": "on"}
+    ssl_kwargs = ("ssl_keyfile", "ssl_certfile")
+
+    def get_config_param_keys(self) -> Tuple[str, ...]:
+        return tuple(inspect.signature(uvicorn.Config).parameters.keys())
+
+    def normalize_param(self, key: str, value: Any) -> Any:
+        if key == "lifespan":
+            return "off" if value is False else "on" if value is True else value
+        return value
+
+    def create_thread_server(
+        self, kwargs: Dict[str, Any], metrics_size: Optional[int] = None
+    ):
+        return _ThreadedUvicornServer(
+            config=uvicorn.Config(**kwargs), metrics_size=metrics_size
+        )
+
+
+class HypercornBackend(ServerBackend):
+    """Serves HTTP/1.1 and HTTP/2, over TLS with 'certfile' and 'keyfile' or as
+    cleartext with prior knowledge. kwargs are Hypercorn config attributes."""
+
+    name = "hypercorn"
+    module = "hypercorn"
+    pattern = "Running on *"
+    default_kwargs = {"accesslog": "-"}
+    ssl_kwargs = ("keyfile", "certfile")
+    # Managed by the test server
+    excluded_param_keys = ("bind", "insecure_bind", "quic_bind", "ssl_enabled")
+
+    def get_config_param_keys(self) -> Tuple[str, ...]:
+        from hypercorn.config import Config
+
+        keys = [
+            key
+            for key, value in vars(Config).items()
+            if not key.startswith("_")
+            and not callable(value)
+            and not isinstance(value, (classmethod, staticmethod))
+            and key not in self.excluded_param_keys
+        ]
+        return (*SOCKET_PARAM_KEYS, *keys)
+
+    def create_thread_server(
+        self, kwargs: Dict[str, Any], metrics_size: Optional[int] = None
+    ):
+        return _ThreadedHypercornServer(kwargs, metrics_size=metrics_size)
+
+
+class DaphneBackend(ServerBackend):
+    """kwargs are the arguments of 'daphne.server.Server'. Daphne can only run
+    in a server process, as its Twisted reactor can't be restarted, and only
+    serves on IPv4 TCP sockets."""
+
+    name = "daphne"
+    module = "daphne"
+    pattern = "Listening on *"
+    supports_thread = False
+    # Managed by the test server
+    excluded_param_keys = ("application", "endpoints", "ready_callable")
+
+    def get_config_param_keys(self) -> Tuple[str, ...]:
+        from daphne.server import Server
+
+        keys = [
+            key
+            for key in inspect.signature(Server).parameters
+            if key not in self.excluded_param_keys
+        ]
+        return (*SOCKET_PARAM_KEYS, *keys)
+
+    def normalize_param(self, key: str, value: Any) -> Any:
+        if key == "uds" and value:
+            raise ValueError("The 'daphne' server backend can't serve on unix sockets")
+        return value
+
+
+BACKENDS: Dict[str, ServerBackend] = {
+    backend.name: backend
+    for backend in (UvicornBackend(), HypercornBackend(), DaphneBackend())
+}
+
+
+def get_backend(backend) -> ServerBackend:
+    """Return the ServerBackend named 'backend'. ServerBackends are returned as is."""
+    if isinstance(backend, ServerBackend):
+        return backend
+    try:
+        return BACKENDS[backend]
+    except KeyError:
+        raise ValueError(
+            f"Unknown server backend {backend!r}, choose from {tuple(BACKENDS)}"
+        ) from None
+
+
+class _ThreadedUvicornServer(uvicorn.Server):
+    def __init__(
+        self, config: uvicorn.Config, metrics_size: Optional[int] = None
+    ) -> None:
+        super().__init__(config)
+        self.metrics_size = metrics_size
+        self.timing_middleware: Optional[TimingMiddleware] = None
+        self.started_event = threading.Event()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.exit_event: Optional[asyncio.Event] = None
+        self.startup_duration: Optional[float] = None
+
+    def install_signal_handlers(self) -> None:
+        """https://github.com/encode/uvicorn/blob/9d9f8820a8155e36dcb5e4d4023f470e51aa4e03/tests/test_main.py#L21"""
+        pass
+
+    async def startup(self, sockets=None) -> None:
+        started_at = time.perf_counter()
+        if self.metrics_size:
+            install_task_timestamps(asyncio.get_running_loop())
+            self.timing_middleware = TimingMiddleware(
+                self.config.loaded_app, size=self.metrics_size
+            )
+            self.config.loaded_app = self.timing_middleware
+        try:
+            await super().startup(sockets=sockets)
+            self.startup_duration = time.perf_counter() - started_at
+        finally:
+            self.started_event.set()
+
+    def run(self, sockets=None) -> None:
+        try:
+            super().run(sockets=sockets)
+        except SystemExit:  # Raised by uvicorn on startup failure
+            pass
+        finally:
+            self.started_event.set()
+
+    async def main_loop(self) -> None:
+        """Same as 'uvicorn.Server.main_loop', but wakes up as soon as
+        'request_exit()' is called instead of on the next 0.1 second tick."""
+        self.loop = asyncio.get_running_loop()
+        self.exit_event = asyncio.Event()
+        counter = 0
+        should_exit = await self.on_tick(counter)
+        while not should_exit:
+            counter = (counter + 1) % 864000
+            try:
+                await asyncio.wait_for(self.exit_event.wait(), 0.1)
+            except asyncio.TimeoutError:
+                pass
+            should_exit = await self.on_tick(counter)
+
+    def request_exit(self, force: bool = False) -> None:
+        """Ask the server to shut down. Thread-safe."""
+        self.should_exit = True
+        if force:
+            self.force_exit = True
+        if self.loop and self.exit_event:
+            try:
+                self.loop.call_soon_threadsafe(self.exit_event.set)
+            except RuntimeError:  # Loop is already closed
+                pass
+
+
+class _ThreadedHypercornServer:
+    def __init__(
+        self, kwargs: Dict[str, Any], metrics_size: Optional[int] = None
+    ) -> None:
+        self.kwargs = kwargs
+        self.metrics_size = metrics_size
+        self.timing_middleware: Optional[TimingMiddleware] = None
+        self.started_event = threading.Event()
+        self.started = False
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.exit_event: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+        self.startup_duration: Optional[float] = None
+
+    def run(self, sockets: Sequence = ()) -> None:
+        try:
+            asyncio.run(self.serve(sockets))
+        finally:
+            self.started_event.set()
+
+    def _on_startup(self, started: bool) -> None:
+        self.started = started
+        if started:
+            self.startup_duration = time.perf_counter() - self.started_at
+        self.started_event.set()
+
+    async def serve(self, sockets: Sequence) -> None:
+        from hypercorn.asyncio import serve
+
+        self.started_at = time.perf_counter()
+        self.loop = asyncio.get_running_loop()
+        self.exit_event = asyncio.Event()
+        self.task = asyncio.current_task()
+        app = self.kwargs["app"]
+        if isinstance(app, str):
+            app = uvicorn.importer.import_from_string(app)
+        if self.metrics_size:
+            install_task_timestamps(self.loop)
+            app = self.timing_middleware = TimingMiddleware(app, self.metrics_size)
+        config = get_hypercorn_config(self.kwargs, sockets)
+        await serve(
+            LifespanNotifier(app, self._on_startup),
+            config,
+            shutdown_trigger=self.exit_event.wait,
+        )
+
+    def request_exit(self, force: bool = False) -> None:
+        """Ask the server to shut down. Thread-safe."""
+        if self.loop and self.exit_event:
+            try:
+                self.loop.call_soon_threadsafe(self.exit_event.set)
+                if force and self.task:
+                    self.loop.call_soon_threadsafe(self.task.cancel)
+            except RuntimeError:  # Loop is already closed
+                pass
@@ -1,37 +1,133 @@
 # from __future__ import annotations
 
+import asyncio
+import functools
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
 import httpx
 import websockets
+from asgi_lifespan import LifespanManager
+
+try:
+    from httpx import AsyncHTTPTransport
+except ImportError:  # httpx < 0.18
+    from httpcore import AsyncConnectionPool as AsyncHTTPTransport
 
+from .pools import PytestUvicornXServerPool
+from .recording import TrafficRecorder
 from .servers import PytestUvicornXServer
+from .transports import CLIENT_MODES, ASGIWebSocketSession
+
+# Seconds to wait for another message when dropping the unread messages of a
+# reused websocket
+DRAIN_TIMEOUT = 0.01
 
 
 class PytestAsgiXClient(httpx.AsyncClient):
-    def __init__(self, xserver: PytestUvicornXServer):
+    """HTTP and websocket client for an ASGI app.
+
+    With mode "xserver" (the default) requests go over the network to 'xserver',
+    which is started and stopped with the client. With mode "asgi" they are passed
+    directly to 'app' in the test process and 'xserver' is never started. The app's
+    lifespan then runs when the client is entered as an asynchronous context
+    manager. Either way it runs once, in the process serving the requests, and
+    'startup_duration' tells how long its startup took.
+
+    Entered as an asynchronous context manager, the client starts and stops
+    'xserver' with 'astart()' and 'astop()', so other tasks keep running and
+    several clients can come up concurrently.
+
+    With a TrafficRecorder as 'recorder', the requests and websocket messages sent
+    by the client are recorded, to be replayed with 'replay_traffic()'.
+    """
+
+    def __init__(
+        self,
+        xserver: PytestUvicornXServer,
+        app=None,
+        mode: str = "xserver",
+        recorder: Optional[TrafficRecorder] = None,
+    ):
+        if mode not in CLIENT_MODES:
+            raise ValueError(f"'mode' must be one of {CLIENT_MODES}, not {mode!r}")
+        if mode == "asgi" and app is None:
+            raise ValueError("'app' is required with mode 'asgi'")
         self.xserver = xserver
+        self.app = app
+        self.mode = mode
+        self.recorder = recorder
+        self.lifespan: Optional[LifespanManager] = None
+        self._lifespan_startup: Optional[float] = None
         self.__instantiated = False
 
     def __call__(self, *args, **kwargs) -> "PytestAsgiXClient":
-        self.xserver.start()
-        base_url = self.xserver.http_base_url
+        if self.mode == "asgi":
+            base_url = "http://testserver"
+            kwargs.setdefault("transport", httpx.ASGITransport(app=self.app))
+        else:
+            if not self.xserver.is_alive():
+                self.xserver.start()
+            base_url = self.xserver.http_base_url
+            if self.xserver.uds:
+                kwargs.setdefault("transport", AsyncHTTPTransport(uds=self.xserver.uds))
         super().__init__(base_url=base_url, *args, **kwargs)
         self.__instantiated = True
         return self
 
+    async def send(self, request, **kwargs):
+        if self.recorder:
+            await self.recorder.record_request(request)
+        timings = self.xserver.timings if self.mode == "xserver" else None
+        if timings is None or timings.first_request is not None:
+            return await super().send(request, **kwargs)
+        started_at = time.perf_counter()
+        response = await super().send(request, **kwargs)
+        timings.first_request = time.perf_counter() - started_at
+        return response
+
     async def __aenter__(self) -> "PytestAsgiXClient":
         if not self.__instantiated:
+            if self.mode == "xserver" and not self.xserver.is_alive():
+                await self.xserver.astart()
             self.__call__()
+        if self.mode == "asgi":
+            started_at = time.perf_counter()
+            self.lifespan = LifespanManager(self.app)
+            await self.lifespan.__aenter__()
+            self._lifespan_startup = time.perf_counter() - started_at
         await super().__aenter__()
         return self
 
     async def __aexit__(self, *args) -> None:
         await super().__aexit__()
-        self.xserver.stop()
+        if self.lifespan:
+            lifespan, self.lifespan = self.lifespan, None
+            await lifespan.__aexit__(*args)
+        if self.mode == "xserver":
+            await self.xserver.astop()
+
+    @property
+    def startup_duration(self) -> Optional[float]:
+        """Seconds the app's lifespan startup took, as reported by the server
+        process in mode "xserver". None if it wasn't reported (yet)."""
+        if self.mode == "asgi":
+            return self._lifespan_startup
+        timings = self.xserver.timings
+        return timings.startup if timings else None
 
     def __exit__(self, *args):
-        self.xserver.stop()
+        if self.mode == "xserver":
+            self.xserver.stop()
 
     def websocket_connect(self, uri: str, *args, **kwargs):
+        if self.recorder:
+            return self.recorder.record_websocket(self._websocket_connect(uri), uri)
+        return self._websocket_connect(uri)
+
+    def _websocket_connect(self, uri: str):
+        if self.mode == "asgi":
+            return ASGIWebSocketSession(self.app, "ws://testserver" + uri)
         if not self.xserver.ws_base_url:
             raise RuntimeError(
                 f"{self.__class__.__name__} must be instantiated or "
@@ -39,4 +135,185 @@ class PytestAsgiXClient(httpx.AsyncClient):
                 "calling 'connect_websocket"
             )
         address = self.xserver.ws_base_url + uri
+        if self.xserver.uds:
+            return websockets.unix_connect(self.xserver.uds, address)
         return websockets.connect(address)
+
+
+def _is_open(websocket) -> bool:
+    state = getattr(websocket, "state", None)
+    if state is not None:
+        return getattr(state, "name", None) == "OPEN"
+    return not getattr(websocket, "closed", True)
+
+
+class _PooledWebSocketConnect:
+    def __init__(self, client: "SharedAsgiXClient", uri: str):
+        self.client = client
+        self.uri = uri
+
+    def __await__(self):
+        return self.client._checkout_websocket(self.uri).__await__()
+
+    async def __aenter__(self):
+        return await self.client._checkout_websocket(self.uri)
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+
+class SharedAsgiXClient(PytestAsgiXClient):
+    """Client handed out by PytestAsgiXClientPool.
+
+    Leaving its context doesn't close its connections or stop the server. Instead
+    'reset()' clears cookies, restores the default headers and returns the
+    websockets opened with 'websocket_connect()' to the client, to be handed out
+    again for the same uri. Websockets that the test closed are discarded, and
+    messages left unread on a reused websocket are dropped.
+    """
+
+    def __call__(self, *args, **kwargs) -> "SharedAsgiXClient":
+        super().__call__(*args, **kwargs)
+        self.default_headers = httpx.Headers(self.headers)
+        self.opened = False
+        self.idle_websockets: Dict[str, List[Any]] = {}
+        self.leased_websockets: List[Tuple[str, Any]] = []
+        return self
+
+    async def __aenter__(self) -> "SharedAsgiXClient":
+        if not self.opened:
+            await super(PytestAsgiXClient, self).__aenter__()
+            self.opened = True
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.reset()
+
+    def __exit__(self, *args) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.cookies.clear()
+        self.headers = self.default_headers
+        for uri, websocket in self.leased_websockets:
+            if _is_open(websocket):
+                self.idle_websockets.setdefault(uri, []).append(websocket)
+        self.leased_websockets.clear()
+
+    def websocket_connect(self, uri: str, *args, **kwargs):
+        return _PooledWebSocketConnect(self, uri)
+
+    async def aclose(self) -> None:
+        """Close the websockets and connections of the client for good"""
+        websockets = [ws for _, ws in self.leased_websockets]
+        for idle in self.idle_websockets.values():
+            websockets.extend(idle)
+        self.leased_websockets.clear()
+        self.idle_websockets.clear()
+        for websocket in websockets:
+            try:
+                await websocket.close()
+            except Exception:
+                pass
+        await super().aclose()
+
+    async def _checkout_websocket(self, uri: str):
+        idle = self.idle_websockets.get(uri, [])
+        websocket = None
+        while idle and websocket is None:
+            websocket = idle.pop()
+            if not _is_open(websocket):
+                websocket = None
+        if websocket is None:
+            websocket = await super().websocket_connect(uri)
+        else:
+            await self._drain_websocket(websocket)
+        self.leased_websockets.append((uri, websocket))
+        return websocket
+
+    @staticmethod
+    async def _drain_websocket(websocket) -> None:
+        # A zero timeout would cancel 'recv()' before it runs on Python < 3.12
+        while True:
+            try:
+                await asyncio.wait_for(websocket.recv(), DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                return
+
+
+class PytestAsgiXClientPool:
+    """Shares warm clients, and the long-lived servers behind them, across tests.
+
+    Servers are leased from 'server_pool' on first use and held, and clients are
+    kept open, until 'adrain()' or 'drain()'.
+    'client_kwargs' (e.g. 'limits', 'http2', 'verify') are passed to every
+    httpx client. A client is bound to the event loop it was created on, so
+    connections are only reused across tests that share an event loop; with a
+    new loop, a new client is created for the same server and the old one is
+    closed, unless its loop is closed already.
+    """
+
+    def __init__(self, *, server_pool: PytestUvicornXServerPool, **client_kwargs):
+        self.server_pool = server_pool
+        self.client_kwargs = client_kwargs
+        self._servers: Dict[str, PytestUvicornXServer] = {}
+        self._clients: Dict[str, Tuple[Any, SharedAsgiXClient]] = {}
+
+    async def acquire(
+        self, appstr: str, env: Dict[str, Any], **kwargs
+    ) -> SharedAsgiXClient:
+        key = self.server_pool.make_key(appstr, env, kwargs)
+        loop = asyncio.get_running_loop()
+        server = self._servers.get(key)
+        if server is None or not server.is_alive():
+            if server is not None:
+                self.server_pool.release(server)
+            server = await loop.run_in_executor(
+                None, functools.partial(self.server_pool.acquire, appstr, env, **kwargs)
+            )
+            self._servers[key] = server
+        entry = self._clients.get(key)
+        if entry is None or entry[0] is not loop or entry[1].xserver is not server:
+            if entry is not None:
+                await self._close_client(*entry)
+            client = SharedAsgiXClient(xserver=server)(**self.client_kwargs)
+            self._clients[key] = (loop, client)
+        else:
+            client = entry[1]
+        client.reset()
+        return client
+
+    def release(self, client: SharedAsgiXClient) -> None:
+        client.reset()
+
+    @staticmethod
+    async def _close_client(loop, client: SharedAsgiXClient) -> None:
+        if loop.is_closed():
+            # The connections can't be closed without the loop they're bound to
+            return
+        if loop is not asyncio.get_running_loop() and loop.is_running():
+            # Still in use by an event loop in another thread
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        else:
+            await client.aclose()
+
+    async def adrain(self) -> None:
+        """Close all clients and release their servers to 'server_pool'"""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for loop, client in clients:
+            await self._close_client(loop, client)
+        self._release_servers()
+
+    def drain(self) -> None:
+        """Same as 'adrain()', for when no event loop is running"""
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.adrain())
+        finally:
+            loop.close()
+
+    def _release_servers(self) -> None:
+        for server in self._servers.values():
+            self.server_pool.release(server)
+        self._servers.clear()
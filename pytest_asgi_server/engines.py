@@ -0,0 +1,99 @@
+# from __future__ import annotations
+
+import importlib.util
+import itertools
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+# Servers test servers can run apps on, see 'backends.py'
+BACKEND_CHOICES = ("uvicorn", "hypercorn", "daphne")
+
+# Implementations uvicorn can run, per config parameter
+ENGINE_CHOICES: Dict[str, Sequence[str]] = {
+    "loop": ("asyncio", "uvloop"),
+    "http": ("auto", "h11", "httptools"),
+    "ws": ("auto", "websockets", "wsproto"),
+}
+
+# Module required by each implementation
+ENGINE_MODULES = {
+    "uvloop": "uvloop",
+    "h11": "h11",
+    "httptools": "httptools",
+    "websockets": "websockets",
+    "wsproto": "wsproto",
+}
+
+DEFAULT_ENGINE = {"loop": "asyncio", "http": "auto", "ws": "auto"}
+
+
+class ServerEngine(NamedTuple):
+    """Event loop and HTTP and websocket protocol implementations of a server"""
+
+    loop: str = DEFAULT_ENGINE["loop"]
+    http: str = DEFAULT_ENGINE["http"]
+    ws: str = DEFAULT_ENGINE["ws"]
+
+    @property
+    def id(self) -> str:
+        return "-".join(self)
+
+    @property
+    def kwargs(self) -> Dict[str, str]:
+        """Server kwargs selecting the engine"""
+        return dict(self._asdict())
+
+    @property
+    def missing(self) -> List[str]:
+        """Modules the engine needs that are not installed"""
+        modules = [ENGINE_MODULES.get(name) for name in self]
+        return [m for m in modules if m and importlib.util.find_spec(m) is None]
+
+
+def parse_engine_choices(key: str, value: Optional[Iterable[str]]) -> List[str]:
+    """Return the implementations for 'key' listed in 'value', which may be a
+    comma separated string or a list of them."""
+    if not value:
+        return [DEFAULT_ENGINE[key]]
+    if isinstance(value, str):
+        value = [value]
+    names = [name.strip() for item in value for name in item.split(",")]
+    names = [name for name in names if name]
+    for name in names:
+        if name not in ENGINE_CHOICES[key]:
+            raise ValueError(
+                f"Unknown {key} implementation {name!r},"
+                f" choose from {ENGINE_CHOICES[key]}"
+            )
+    return names or [DEFAULT_ENGINE[key]]
+
+
+def get_engine_matrix(
+    loop: Optional[Iterable[str]] = None,
+    http: Optional[Iterable[str]] = None,
+    ws: Optional[Iterable[str]] = None,
+) -> List[ServerEngine]:
+    """Return every combination of the given implementations"""
+    return [
+        ServerEngine(*engine)
+        for engine in itertools.product(
+            parse_engine_choices("loop", loop),
+            parse_engine_choices("http", http),
+            parse_engine_choices("ws", ws),
+        )
+    ]
+
+
+def format_engine_table(results: Sequence[tuple]) -> List[str]:
+    """Format '(test name, engine, LoadResult)' tuples as a table comparing the
+    engines of each test"""
+    lines = [
+        f"{'test':<40} {'engine':<28} {'requests':>9} {'rps':>9}"
+        f" {'p50':>10} {'p99':>10} {'errors':>7}"
+    ]
+    for name, engine, result in sorted(results, key=lambda r: (r[0], -r[2].rps)):
+        lines.append(
+            f"{name[-40:]:<40} {engine.id:<28} {result.requests:>9}"
+            f" {result.rps:>9.1f} {result.p50 * 1000:>8.2f}ms"
+            f" {result.p99 * 1000:>8.2f}ms {result.errors:>7}"
+        )
+    return lines
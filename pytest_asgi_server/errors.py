@@ -14,3 +14,45 @@ class AddressAlreadyInUseWarning(Warning):
     def __init__(self, message):
         self.message = message
         super().__init__(self.message)
+
+
+class ServerStartupError(Exception):
+    """Raise when a test server fails to start"""
+
+
+class ServerStartupTimeout(ServerStartupError, TimeoutError):
+    """Raise when a test server is not ready before its startup deadline"""
+
+    def __init__(self, message=None, *, timeout: float):
+        self.timeout = timeout
+        self.message = message or f"Server was not ready within {timeout} seconds"
+        super().__init__(self.message)
+
+
+class WebSocketClosed(Exception):
+    """Raise when an in-process websocket session is closed or rejected by the app"""
+
+    def __init__(self, message=None, *, code: int, reason: str = ""):
+        self.code = code
+        self.reason = reason
+        self.message = message or f"WebSocket closed with code {code}"
+        super().__init__(self.message)
+
+
+class ServerControlError(Exception):
+    """Raise when a server process fails to run a control command"""
+
+
+class ServerGroupError(Exception):
+    """Raise when one or more servers of a group fail to start or stop.
+
+    'errors' is a list of '(server, exception)' pairs.
+    """
+
+    def __init__(self, message=None, *, errors: list):
+        self.errors = errors
+        self.message = message or "{} server(s) failed: {}".format(
+            len(errors),
+            "; ".join(f"{server!r}: {exc!r}" for server, exc in errors),
+        )
+        super().__init__(self.message)
@@ -0,0 +1,167 @@
+# from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import Callable, List, Optional
+
+from .load import LatencyHistogram
+
+
+class FanoutResult:
+    """Outcome of a websocket fan-out run. Latencies are in seconds.
+
+    'memory_per_connection' is the growth of the server's resident memory while
+    the subscribers connected, divided by the number of connections, or None if
+    the server's memory could not be read.
+    """
+
+    def __init__(
+        self,
+        *,
+        connections: int,
+        connect_errors: int,
+        connect: LatencyHistogram,
+        delivery: LatencyHistogram,
+        messages: int,
+        duration: float,
+        rss_before: Optional[int] = None,
+        rss_after: Optional[int] = None,
+    ):
+        self.connections = connections
+        self.connect_errors = connect_errors
+        self.connect = connect
+        self.delivery = delivery
+        self.messages = messages
+        self.duration = duration
+        self.rss_before = rss_before
+        self.rss_after = rss_after
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.summary()}>"
+
+    @property
+    def deliveries(self) -> int:
+        return self.delivery.count
+
+    @property
+    def expected_deliveries(self) -> int:
+        return self.connections * self.messages
+
+    @property
+    def missed_deliveries(self) -> int:
+        return self.expected_deliveries - self.deliveries
+
+    @property
+    def throughput(self) -> float:
+        """Messages delivered to subscribers per second"""
+        return self.deliveries / self.duration if self.duration else 0.0
+
+    @property
+    def memory_per_connection(self) -> Optional[float]:
+        if self.rss_before is None or self.rss_after is None or not self.connections:
+            return None
+        return (self.rss_after - self.rss_before) / self.connections
+
+    def summary(self) -> str:
+        memory = self.memory_per_connection
+        return (
+            f"connections={self.connections} connect_errors={self.connect_errors}"
+            f" connect_p99={self.connect.percentile(99) * 1000:.2f}ms"
+            f" deliveries={self.deliveries}/{self.expected_deliveries}"
+            f" delivery_p50={self.delivery.percentile(50) * 1000:.2f}ms"
+            f" delivery_p99={self.delivery.percentile(99) * 1000:.2f}ms"
+            f" throughput={self.throughput:.0f}msg/s"
+            + (f" memory_per_connection={memory / 1024:.1f}KiB" if memory else "")
+        )
+
+
+async def run_websocket_fanout(
+    client,
+    uri: str,
+    *,
+    connections: int = 100,
+    ramp_up: float = 0.0,
+    messages: int = 10,
+    publish_interval: float = 0.0,
+    payload_size: int = 64,
+    timeout: float = 10.0,
+    server_rss: Optional[Callable[[], Optional[int]]] = None,
+    clock: Callable[[], float] = time.perf_counter,
+) -> FanoutResult:
+    """Open 'connections' websockets to 'uri' with 'client' and broadcast through
+    them.
+
+    The endpoint at 'uri' must send every message it receives to all connected
+    websockets. Connection attempts are spread evenly over 'ramp_up' seconds.
+    Once all are open, the first connection publishes 'messages' messages,
+    'publish_interval' seconds apart, and every subscriber records the delivery
+    latency of each message until it received all of them or 'timeout' passes.
+
+    'server_rss' returns the server's resident memory in bytes. It is read before
+    and after the connections open.
+    """
+    rss_before = server_rss() if server_rss else None
+    connect = LatencyHistogram()
+    delivery = LatencyHistogram()
+    websockets: List = []
+    connect_errors = 0
+
+    async def open_connection(scheduled: float) -> None:
+        nonlocal connect_errors
+        delay = scheduled - clock()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        start = clock()
+        try:
+            websockets.append(await client.websocket_connect(uri))
+        except Exception:
+            connect_errors += 1
+        else:
+            connect.record(clock() - start)
+
+    start = clock()
+    await asyncio.gather(
+        *(
+            open_connection(start + ramp_up * n / connections)
+            for n in range(connections)
+        )
+    )
+    rss_after = server_rss() if server_rss else None
+
+    async def subscribe(ws) -> None:
+        received = 0
+        while received < messages:
+            data = json.loads(await ws.recv())
+            delivery.record(clock() - data["sent"])
+            received += 1
+
+    async def publish(ws) -> None:
+        padding = "x" * payload_size
+        for n in range(messages):
+            await ws.send(json.dumps({"id": n, "sent": clock(), "pad": padding}))
+            if publish_interval:
+                await asyncio.sleep(publish_interval)
+
+    publish_start = clock()
+    subscribers = [asyncio.ensure_future(subscribe(ws)) for ws in websockets]
+    try:
+        if websockets:
+            await publish(websockets[0])
+            await asyncio.wait(subscribers, timeout=timeout)
+        duration = clock() - publish_start
+    finally:
+        for task in subscribers:
+            task.cancel()
+        await asyncio.gather(*subscribers, return_exceptions=True)
+        await asyncio.gather(*(ws.close() for ws in websockets), return_exceptions=True)
+    return FanoutResult(
+        connections=len(websockets),
+        connect_errors=connect_errors,
+        connect=connect,
+        delivery=delivery,
+        messages=messages,
+        duration=duration,
+        rss_before=rss_before,
+        rss_after=rss_after,
+    )
@@ -0,0 +1,110 @@
+# from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from .errors import ServerGroupError
+
+Errors = List[Tuple[object, BaseException]]
+
+
+def _run_all(
+    func: Callable[[object], None], servers: Sequence, max_workers: Optional[int]
+) -> Errors:
+    """Call 'func' with every server in parallel threads and return the errors"""
+    if not servers:
+        return []
+    workers = max_workers or len(servers)
+    with ThreadPoolExecutor(workers, thread_name_prefix="pytest-asgi-server") as pool:
+        futures = [(server, pool.submit(func, server)) for server in servers]
+    return [
+        (server, future.exception())
+        for server, future in futures
+        if future.exception() is not None
+    ]
+
+
+def start_all(servers: Sequence, max_workers: Optional[int] = None) -> None:
+    """Start 'servers' concurrently and wait until all of them are ready.
+
+    If any server fails to start, all servers are stopped again and a
+    ServerGroupError listing every failure is raised. xservers in one group
+    need distinct names.
+    """
+    servers = list(servers)
+    errors = _run_all(lambda server: server.start(), servers, max_workers)
+    if errors:
+        _run_all(lambda server: server.stop(), servers, max_workers)
+        raise ServerGroupError(errors=errors)
+
+
+def stop_all(servers: Sequence, max_workers: Optional[int] = None) -> None:
+    """Stop 'servers' concurrently. Every server is stopped even if some fail, then
+    a ServerGroupError listing the failures is raised."""
+    errors = _run_all(lambda server: server.stop(), list(servers), max_workers)
+    if errors:
+        raise ServerGroupError(errors=errors)
+
+
+async def astart_all(servers: Sequence, max_workers: Optional[int] = None) -> None:
+    """Same as 'start_all()', without blocking the running event loop"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, start_all, list(servers), max_workers)
+
+
+async def astop_all(servers: Sequence, max_workers: Optional[int] = None) -> None:
+    """Same as 'stop_all()', without blocking the running event loop"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, stop_all, list(servers), max_workers)
+
+
+class ServerGroup:
+    """Starts and stops a set of test servers together, e.g. the services of a
+    topology test.
+
+        with ServerGroup(server_thread_factory() for _ in range(12)) as group:
+            urls = [server.http_base_url for server in group]
+
+    Also usable with 'async with', in which case the event loop is not blocked
+    while the servers start and stop.
+    """
+
+    def __init__(self, servers: Sequence = (), max_workers: Optional[int] = None):
+        self.servers = list(servers)
+        self.max_workers = max_workers
+
+    def __iter__(self):
+        return iter(self.servers)
+
+    def __len__(self) -> int:
+        return len(self.servers)
+
+    def __getitem__(self, index):
+        return self.servers[index]
+
+    def add(self, server) -> None:
+        self.servers.append(server)
+
+    def start(self) -> None:
+        start_all(self.servers, self.max_workers)
+
+    def stop(self) -> None:
+        stop_all(self.servers, self.max_workers)
+
+    def is_alive(self) -> bool:
+        return all(server.is_alive() for server in self.servers)
+
+    def __enter__(self) -> "ServerGroup":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    async def __aenter__(self) -> "ServerGroup":
+        await astart_all(self.servers, self.max_workers)
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await astop_all(self.servers, self.max_workers)
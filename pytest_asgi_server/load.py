@@ -0,0 +1,264 @@
+# from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+import httpx
+
+
+class LatencyHistogram:
+    """Log-linear latency histogram in the style of HdrHistogram.
+
+    Values are recorded in microseconds into buckets whose width grows with the
+    value, keeping the relative error of every percentile below
+    1 / 2 ** ('precision_bits' - 1) (under 1% by default) in constant memory.
+    """
+
+    def __init__(self, precision_bits: int = 8):
+        self.precision_bits = precision_bits
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def _get_index(self, micros: int) -> int:
+        shift = max(micros.bit_length() - self.precision_bits, 0)
+        return (shift << self.precision_bits) + (micros >> shift)
+
+    def _get_value(self, index: int) -> float:
+        """Return the upper bound of the bucket at 'index', in seconds"""
+        shift = index >> self.precision_bits
+        mantissa = index & ((1 << self.precision_bits) - 1)
+        return (((mantissa + 1) << shift) - 1) / 1e6
+
+    def record(self, value: float, count: int = 1) -> None:
+        """Record a latency of 'value' seconds"""
+        index = self._get_index(max(int(value * 1e6), 0))
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def record_corrected(self, value: float, expected_interval: float) -> None:
+        """Record 'value' and back-fill the samples a closed-loop client would have
+        missed while it was waiting, as HdrHistogram's 'recordValueWithExpectedInterval'.
+        """
+        self.record(value)
+        if expected_interval <= 0:
+            return
+        missing = value - expected_interval
+        while missing >= expected_interval:
+            self.record(missing)
+            missing -= expected_interval
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        if other.precision_bits != self.precision_bits:
+            raise ValueError("Cannot merge histograms with different precision")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile: float) -> float:
+        """Return the latency in seconds at 'percentile' (0-100)"""
+        if not self.count:
+            return 0.0
+        target = max(self.count * percentile / 100, 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._get_value(index), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class LoadRequest:
+    """A request in a load mix, sent with probability proportional to 'weight'.
+
+    'kwargs' are passed to 'httpx.AsyncClient.request()'.
+    """
+
+    def __init__(self, method: str, url: str, weight: float = 1, **kwargs):
+        self.method = method
+        self.url = url
+        self.weight = weight
+        self.kwargs = kwargs
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.method!r}, {self.url!r})"
+
+    async def send(self, client: httpx.AsyncClient) -> httpx.Response:
+        return await client.request(self.method, self.url, **self.kwargs)
+
+
+class LoadResult:
+    """Outcome of a load run.
+
+    A request is an error if it raised or returned a status >= 400. Latencies are
+    in seconds, e.g. 'assert result.p99 < 0.05'.
+    """
+
+    def __init__(
+        self,
+        *,
+        histogram: LatencyHistogram,
+        duration: float,
+        status_codes: Counter,
+        exceptions: Counter,
+    ):
+        self.histogram = histogram
+        self.duration = duration
+        self.status_codes = status_codes
+        self.exceptions = exceptions
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.summary()}>"
+
+    @property
+    def requests(self) -> int:
+        return sum(self.status_codes.values()) + sum(self.exceptions.values())
+
+    @property
+    def errors(self) -> int:
+        failed = sum(n for status, n in self.status_codes.items() if status >= 400)
+        return failed + sum(self.exceptions.values())
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+    @property
+    def rps(self) -> float:
+        return self.requests / self.duration if self.duration else 0.0
+
+    def percentile(self, percentile: float) -> float:
+        return self.histogram.percentile(percentile)
+
+    @property
+    def p50(self) -> float:
+        return self.percentile(50)
+
+    @property
+    def p90(self) -> float:
+        return self.percentile(90)
+
+    @property
+    def p99(self) -> float:
+        return self.percentile(99)
+
+    @property
+    def p999(self) -> float:
+        return self.percentile(99.9)
+
+    @property
+    def max(self) -> float:
+        return self.histogram.max
+
+    def summary(self) -> str:
+        return (
+            f"requests={self.requests} errors={self.errors} rps={self.rps:.1f}"
+            f" p50={self.p50 * 1000:.2f}ms p90={self.p90 * 1000:.2f}ms"
+            f" p99={self.p99 * 1000:.2f}ms max={self.max * 1000:.2f}ms"
+        )
+
+
+LoadMix = Union[str, LoadRequest, Sequence[Union[str, LoadRequest]]]
+
+
+def _get_load_requests(mix: LoadMix) -> List[LoadRequest]:
+    if isinstance(mix, (str, LoadRequest)):
+        mix = [mix]
+    return [LoadRequest("GET", r) if isinstance(r, str) else r for r in mix]
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    requests: LoadMix = "/",
+    *,
+    duration: float = 1.0,
+    concurrency: int = 10,
+    rate: Optional[float] = None,
+    seed: Optional[int] = None,
+    clock: Callable[[], float] = time.perf_counter,
+) -> LoadResult:
+    """Send requests from the 'requests' mix with 'client' for 'duration' seconds.
+
+    Without 'rate', 'concurrency' workers each send a request as soon as their
+    previous one completes (closed loop). The histogram is corrected for
+    coordinated omission using the mean service time as the expected interval.
+
+    With 'rate', requests are started on a fixed schedule of 'rate' per second
+    (open loop) and each latency is measured from its scheduled start, so time
+    spent waiting on a slow server is counted. At most 'concurrency' requests are
+    in flight; requests that wait for a free slot keep their scheduled start.
+    """
+    load_requests = _get_load_requests(requests)
+    weights = [r.weight for r in load_requests]
+    rng = random.Random(seed)
+    histogram = LatencyHistogram()
+    status_codes: Counter = Counter()
+    exceptions: Counter = Counter()
+    latencies: List[float] = []
+
+    async def send(request: LoadRequest, scheduled: float) -> None:
+        try:
+            response = await request.send(client)
+        except Exception as exc:
+            exceptions[type(exc).__name__] += 1
+        else:
+            status_codes[response.status_code] += 1
+        latencies.append(clock() - scheduled)
+
+    start = clock()
+    deadline = start + duration
+    if rate is None:
+
+        async def worker() -> None:
+            while clock() < deadline:
+                await send(rng.choices(load_requests, weights)[0], clock())
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = clock() - start
+        interval = sum(latencies) / len(latencies) if latencies else 0.0
+        for latency in latencies:
+            histogram.record_corrected(latency, interval)
+    else:
+        slots = asyncio.Semaphore(concurrency)
+        tasks = []
+
+        async def scheduled_send(request: LoadRequest, scheduled: float) -> None:
+            async with slots:
+                await send(request, scheduled)
+
+        for n in _iter_schedule(start, rate, duration):
+            delay = n - clock()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            request = rng.choices(load_requests, weights)[0]
+            tasks.append(asyncio.ensure_future(scheduled_send(request, n)))
+        await asyncio.gather(*tasks)
+        elapsed = clock() - start
+        for latency in latencies:
+            histogram.record(latency)
+    return LoadResult(
+        histogram=histogram,
+        duration=elapsed,
+        status_codes=status_codes,
+        exceptions=exceptions,
+    )
+
+
+def _iter_schedule(start: float, rate: float, duration: float) -> Iterable[float]:
+    for n in range(int(rate * duration)):
+        yield start + n / rate
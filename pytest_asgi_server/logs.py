@@ -0,0 +1,149 @@
+# from __future__ import annotations
+
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Optional
+
+# Longest line kept in full, longer lines are split
+MAX_LINE_BYTES = 64 * 1024
+
+
+class LogTail:
+    """Follows the log file of a server process, keeping its last 'max_lines' lines.
+
+    Each 'poll()' reads only what was appended since the previous one, starting
+    at 'offset' (by default the current end of the file). Lines are numbered in
+    the order they were read, so 'lines_since(mark())' returns the lines logged
+    between two points in time, as far as they are still buffered.
+
+    Once the file grows beyond 'max_bytes' it is rotated: its content is copied
+    to '<path>.1' and the file is truncated in place, so the process writing it
+    with O_APPEND keeps its file descriptor. Lines written between the copy and
+    the truncation are lost.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        name: Optional[str] = None,
+        offset: Optional[int] = None,
+        max_lines: int = 1000,
+        max_bytes: Optional[int] = None,
+    ):
+        self.path = str(path)
+        self.name = name or os.path.basename(self.path)
+        self.offset = self._get_size() if offset is None else offset
+        self.max_bytes = max_bytes
+        self.lines: Deque[str] = deque(maxlen=max_lines)
+        self.count = 0
+        self._partial = b""
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.name} offset={self.offset}>"
+
+    def _get_size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def poll(self) -> int:
+        """Read the lines appended since the last poll and return their number"""
+        with self._lock:
+            size = self._get_size()
+            if size < self.offset:  # Truncated by someone else
+                self.offset = 0
+                self._partial = b""
+            count = self.count
+            if size > self.offset:
+                with open(self.path, "rb") as f:
+                    f.seek(self.offset)
+                    for chunk in iter(lambda: f.read(MAX_LINE_BYTES), b""):
+                        self.offset += len(chunk)
+                        self._add(chunk)
+            if self.max_bytes and self.offset > self.max_bytes:
+                self._rotate()
+            return self.count - count
+
+    def _add(self, chunk: bytes) -> None:
+        *lines, self._partial = (self._partial + chunk).split(b"\n")
+        if len(self._partial) > MAX_LINE_BYTES:
+            lines.append(self._partial)
+            self._partial = b""
+        for line in lines:
+            # Writers without O_APPEND leave a run of NULs after a truncation
+            self.lines.append(line.lstrip(b"\0").decode(errors="replace"))
+        self.count += len(lines)
+
+    def _rotate(self) -> None:
+        shutil.copyfile(self.path, self.path + ".1")
+        with open(self.path, "r+b") as f:
+            f.truncate(0)
+        self.offset = 0
+
+    def rotate(self) -> None:
+        """Rotate the log file if it is larger than 'max_bytes'"""
+        with self._lock:
+            if self.max_bytes and self._get_size() > self.max_bytes:
+                self._rotate()
+
+    def mark(self) -> int:
+        """Return the number of the next line"""
+        self.poll()
+        return self.count
+
+    def lines_since(self, mark: int = 0) -> List[str]:
+        """Return the buffered lines read since 'mark'. Lines that were already
+        dropped from the buffer are left out."""
+        self.poll()
+        with self._lock:
+            dropped = self.count - len(self.lines)
+            return list(self.lines)[max(mark - dropped, 0) :]
+
+
+_active_logs: List[LogTail] = []
+_stopped_logs: List[LogTail] = []
+_poller: Optional[threading.Thread] = None
+_poll_interval = 1.0
+
+
+def _poll_active_logs() -> None:
+    while True:
+        for log_tail in list(_active_logs):
+            try:
+                log_tail.poll()
+            except OSError:
+                pass
+        time.sleep(_poll_interval)
+
+
+def activate_log(log_tail: LogTail) -> None:
+    """Poll 'log_tail' in the background until it is deactivated"""
+    global _poller
+    _active_logs.append(log_tail)
+    if _poller is None:
+        _poller = threading.Thread(
+            target=_poll_active_logs, name="pytest-asgi-server-logs", daemon=True
+        )
+        _poller.start()
+
+
+def deactivate_log(log_tail: LogTail) -> None:
+    """Stop polling 'log_tail'. Its lines stay available to the current test."""
+    if log_tail in _active_logs:
+        _active_logs.remove(log_tail)
+        log_tail.poll()
+        _stopped_logs.append(log_tail)
+
+
+def get_test_logs() -> List[LogTail]:
+    """Return the logs of the servers that ran during the current test"""
+    return _active_logs + _stopped_logs
+
+
+def clear_stopped_logs() -> None:
+    _stopped_logs.clear()
@@ -0,0 +1,93 @@
+# from __future__ import annotations
+
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+
+class AllocationSite(NamedTuple):
+    """Memory allocated at a code location, compared between two snapshots.
+    Sizes are in bytes, counts in memory blocks.
+
+    'traceback' holds "<filename>:<lineno>" frames, oldest first, as many as the
+    server was started with in 'tracemalloc_frames'.
+    """
+
+    traceback: Tuple[str, ...]
+    size_diff: int
+    size: int
+    count_diff: int
+    count: int
+
+    @property
+    def location(self) -> str:
+        """The frame that allocated the memory"""
+        return self.traceback[-1]
+
+
+class MemoryDiff:
+    """Allocation sites of a test server that grew between two tracemalloc
+    snapshots, largest growth first.
+
+    Only the 'limit' sites that grew most in each server process are included;
+    'size_diff' and 'count_diff' are the total change across all sites.
+    """
+
+    def __init__(
+        self,
+        sites: Sequence[AllocationSite],
+        size_diff: Optional[int] = None,
+        count_diff: Optional[int] = None,
+    ):
+        self.sites = sorted(sites, key=lambda site: site.size_diff, reverse=True)
+        self.size_diff = (
+            sum(site.size_diff for site in self.sites)
+            if size_diff is None
+            else size_diff
+        )
+        self.count_diff = (
+            sum(site.count_diff for site in self.sites)
+            if count_diff is None
+            else count_diff
+        )
+
+    def __repr__(self) -> str:
+        top = self.sites[0].location if self.sites else None
+        return (
+            f"<{self.__class__.__name__} size_diff={self.size_diff}"
+            f" sites={len(self.sites)} top={top}>"
+        )
+
+    def __len__(self) -> int:
+        return len(self.sites)
+
+    def __iter__(self):
+        return iter(self.sites)
+
+    @classmethod
+    def from_responses(cls, responses: Sequence[Dict]) -> "MemoryDiff":
+        """Merge the responses to 'tracemalloc_compare' control commands, e.g. of
+        replicas. Sites found in several processes are summed up."""
+        merged: Dict[Tuple[str, ...], List[int]] = {}
+        size_diff = count_diff = 0
+        for response in responses:
+            fields = response["fields"]
+            for stat in response["stats"]:
+                stat = dict(zip(fields, stat))
+                totals = merged.setdefault(tuple(stat["traceback"]), [0, 0, 0, 0])
+                for n, key in enumerate(fields[1:]):
+                    totals[n] += stat[key]
+            size_diff += response["size_diff"]
+            count_diff += response["count_diff"]
+        sites = [AllocationSite(key, *totals) for key, totals in merged.items()]
+        return cls(sites, size_diff, count_diff)
+
+    def filter(
+        self, *, filename: Optional[str] = None, min_size_diff: int = 0
+    ) -> "MemoryDiff":
+        """Return the sites allocated in a file whose path contains 'filename' that
+        grew by at least 'min_size_diff' bytes"""
+        return self.__class__(
+            site
+            for site in self.sites
+            if (filename is None or filename in site.location.rsplit(":", 1)[0])
+            and site.size_diff >= min_size_diff
+        )
@@ -0,0 +1,87 @@
+# from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence
+
+from .load import LatencyHistogram
+
+
+class ServerMetrics:
+    """Requests recorded by the timing middleware of a test server, as seen by the
+    server. Times are in seconds.
+
+    'records' are dicts with the keys 'type' ("http" or "websocket"), 'method',
+    'path', 'status', 'queued' (time between the creation of the asyncio task
+    serving the request and the app being called), 'handler' (time spent in the
+    app) and 'bytes_sent'. Only the most recent requests are kept by the server; 'dropped'
+    is the number of requests that were recorded but are no longer available.
+    """
+
+    def __init__(self, records: Sequence[Dict], total: Optional[int] = None):
+        self.records = list(records)
+        self.total = len(self.records) if total is None else total
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__} requests={self.count}"
+            f" handler_p99={self.handler.percentile(99) * 1000:.2f}ms"
+            f" bytes_sent={self.bytes_sent}>"
+        )
+
+    def __len__(self) -> int:
+        return self.count
+
+    @classmethod
+    def from_responses(cls, responses: Sequence[Dict]) -> "ServerMetrics":
+        """Merge the responses to 'metrics' control commands, e.g. of replicas"""
+        records: List[Dict] = []
+        total = 0
+        for response in responses:
+            fields = response["fields"]
+            records += [dict(zip(fields, record)) for record in response["records"]]
+            total += response["total"]
+        return cls(records, total)
+
+    @property
+    def count(self) -> int:
+        return len(self.records)
+
+    @property
+    def dropped(self) -> int:
+        return self.total - self.count
+
+    @property
+    def bytes_sent(self) -> int:
+        return sum(record["bytes_sent"] for record in self.records)
+
+    def _get_histogram(self, field: str) -> LatencyHistogram:
+        histogram = LatencyHistogram()
+        for record in self.records:
+            if record[field] is not None:
+                histogram.record(record[field])
+        return histogram
+
+    @property
+    def handler(self) -> LatencyHistogram:
+        return self._get_histogram("handler")
+
+    @property
+    def queued(self) -> LatencyHistogram:
+        return self._get_histogram("queued")
+
+    def filter(
+        self,
+        *,
+        path: Optional[str] = None,
+        method: Optional[str] = None,
+        status: Optional[int] = None,
+        type: Optional[str] = None,
+    ) -> "ServerMetrics":
+        """Return the metrics of the requests matching all given values"""
+        criteria = {"path": path, "method": method, "status": status, "type": type}
+        criteria = {k: v for k, v in criteria.items() if v is not None}
+        records = [
+            record
+            for record in self.records
+            if all(record[k] == v for k, v in criteria.items())
+        ]
+        return self.__class__(records)
@@ -1,23 +1,420 @@
+import json
+
 import pytest
-from asgi_lifespan import LifespanManager
 
-from .clients import PytestAsgiXClient
-from .servers import PytestUvicornXServer, UvicornTestServerThread
+from .engines import (
+    BACKEND_CHOICES,
+    ENGINE_CHOICES,
+    ServerEngine,
+    format_engine_table,
+    get_engine_matrix,
+)
+from .logs import clear_stopped_logs, get_test_logs
+from .profiling import PROFILE_MODES, dump_active_profiles
+from .timings import TimingsRegistry, get_registry, set_registry
+from .transports import CLIENT_MODES
+
+# The servers, clients and their dependencies (uvicorn, httpx, websockets, xprocess,
+# asgi_lifespan) are imported by the fixtures that use them, so that test runs
+# which never start a server don't pay for importing them.
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("asgi-server")
+    group.addoption(
+        "--asgi-server-pool",
+        action="store_true",
+        default=None,
+        help="reuse running xserver processes across tests with the same config",
+    )
+    group.addoption(
+        "--asgi-server-pool-size",
+        type=int,
+        default=None,
+        help="maximum number of xserver processes kept by the pool; idle ones "
+        "beyond it are stopped, least recently used first",
+    )
+    group.addoption(
+        "--asgi-server-zygote",
+        action="store_true",
+        default=None,
+        help="fork xserver processes from a pre-initialized zygote process",
+    )
+    group.addoption(
+        "--asgi-server-zygote-preload",
+        action="append",
+        default=None,
+        help="module (or '<module>:<attribute>') imported once by the zygote",
+    )
+    group.addoption(
+        "--asgi-server-backend",
+        choices=BACKEND_CHOICES,
+        default=None,
+        help="server that test servers run apps on",
+    )
+    group.addoption(
+        "--asgi-server-client-mode",
+        choices=CLIENT_MODES,
+        default=None,
+        help="run xclient requests against an xserver or in-process via ASGI",
+    )
+    group.addoption(
+        "--asgi-server-shared-client",
+        action="store_true",
+        default=None,
+        help="hand out warm xclients bound to long-lived xservers across tests",
+    )
+    group.addoption(
+        "--asgi-server-http2",
+        action="store_true",
+        default=None,
+        help="enable HTTP/2 in shared xclients (requires the 'h2' package)",
+    )
+    group.addoption(
+        "--asgi-server-profile",
+        choices=PROFILE_MODES,
+        default=None,
+        help="profile xserver processes with a stack sampler ('sample') or "
+        "cProfile ('cprofile') and write a profile per test next to their logs",
+    )
+    group.addoption(
+        "--asgi-server-metrics",
+        action="store_true",
+        default=None,
+        help="record the requests handled by test servers, see 'metrics()'",
+    )
+    group.addoption(
+        "--asgi-server-resources",
+        action="store_true",
+        default=None,
+        help="sample the RSS, CPU time, open fds and threads of test servers",
+    )
+    group.addoption(
+        "--asgi-server-tracemalloc",
+        action="store_true",
+        default=None,
+        help="trace memory allocations in xserver processes, see 'take_snapshot()'",
+    )
+    for key, label in (
+        ("loop", "event loops"),
+        ("http", "HTTP protocol implementations"),
+        ("ws", "websocket protocol implementations"),
+    ):
+        group.addoption(
+            f"--asgi-server-{key}",
+            metavar="NAMES",
+            default=None,
+            help=f"comma separated {label} ({', '.join(ENGINE_CHOICES[key])}) to run "
+            "tests using the 'asgi_server_engine' fixture with",
+        )
+        parser.addini(
+            f"asgi_server_{key}",
+            default="",
+            help=f"comma separated {label} to run tests using the "
+            "'asgi_server_engine' fixture with",
+        )
+    group.addoption(
+        "--asgi-server-timings",
+        action="store_true",
+        default=None,
+        help="report server start, ready and shutdown times at the end of the run "
+        "and record them as test properties",
+    )
+    group.addoption(
+        "--asgi-server-record",
+        metavar="PATH",
+        default=None,
+        help="append the traffic sent by xclients to a recording at PATH, to be "
+        "replayed with 'asgi_replay'",
+    )
+    group.addoption(
+        "--asgi-server-timings-json",
+        metavar="PATH",
+        default=None,
+        help="write server start, ready and shutdown times to a JSON file",
+    )
+    parser.addini(
+        "asgi_server_pool",
+        type="bool",
+        default=False,
+        help="reuse running xserver processes across tests with the same config",
+    )
+    parser.addini(
+        "asgi_server_pool_size",
+        default="4",
+        help="maximum number of xserver processes kept by the pool; idle ones "
+        "beyond it are stopped, least recently used first",
+    )
+    parser.addini(
+        "asgi_server_zygote",
+        type="bool",
+        default=False,
+        help="fork xserver processes from a pre-initialized zygote process",
+    )
+    parser.addini(
+        "asgi_server_zygote_preload",
+        type="linelist",
+        default=[],
+        help="modules (or '<module>:<attribute>') imported once by the zygote",
+    )
+    parser.addini(
+        "asgi_server_backend",
+        default="uvicorn",
+        help="server that test servers run apps on: 'uvicorn', 'hypercorn' or "
+        "'daphne'",
+    )
+    parser.addini(
+        "asgi_server_client_mode",
+        default="xserver",
+        help="run xclient requests against an xserver ('xserver') or in-process "
+        "via ASGI ('asgi')",
+    )
+    parser.addini(
+        "asgi_server_shared_client",
+        type="bool",
+        default=False,
+        help="hand out warm xclients bound to long-lived xservers across tests",
+    )
+    parser.addini(
+        "asgi_server_http2",
+        type="bool",
+        default=False,
+        help="enable HTTP/2 in shared xclients (requires the 'h2' package)",
+    )
+    parser.addini(
+        "asgi_server_profile",
+        default="",
+        help="profile xserver processes with a stack sampler ('sample') or "
+        "cProfile ('cprofile') and write a profile per test next to their logs",
+    )
+    parser.addini(
+        "asgi_server_metrics",
+        type="bool",
+        default=False,
+        help="record the requests handled by test servers, see 'metrics()'",
+    )
+    parser.addini(
+        "asgi_server_resources",
+        type="bool",
+        default=False,
+        help="sample the RSS, CPU time, open fds and threads of test servers, "
+        "see 'resources'",
+    )
+    parser.addini(
+        "asgi_server_resources_interval",
+        default="0.1",
+        help="seconds between two resource samples of a test server",
+    )
+    parser.addini(
+        "asgi_server_tracemalloc",
+        type="bool",
+        default=False,
+        help="trace memory allocations in xserver processes, see 'take_snapshot()'",
+    )
+    parser.addini(
+        "asgi_server_timings",
+        type="bool",
+        default=False,
+        help="report server start, ready and shutdown times at the end of the run "
+        "and record them as test properties",
+    )
+    parser.addini(
+        "asgi_server_log_lines",
+        default="1000",
+        help="number of xserver log lines kept per process and attached to the "
+        "reports of failing tests",
+    )
+    parser.addini(
+        "asgi_server_log_max_bytes",
+        default=str(10 * 2**20),
+        help="size at which xserver log files are rotated, 0 to never rotate",
+    )
+    parser.addini(
+        "asgi_server_client_max_connections",
+        default="100",
+        help="maximum number of connections of each shared xclient",
+    )
+    parser.addini(
+        "asgi_server_client_max_keepalive",
+        default="20",
+        help="maximum number of idle keep-alive connections of each shared xclient",
+    )
+    parser.addini(
+        "asgi_server_client_keepalive_expiry",
+        default="5.0",
+        help="seconds an idle keep-alive connection of a shared xclient is kept",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "asgi_server_isolated: never hand a pooled xserver to this test",
+    )
+    config.addinivalue_line(
+        "markers",
+        "asgi_server_client_mode(mode): run xclient requests against an xserver "
+        "('xserver') or in-process via ASGI ('asgi')",
+    )
+    config.addinivalue_line(
+        "markers",
+        "asgi_server_external: always run xclient requests against an xserver",
+    )
+    config.addinivalue_line(
+        "markers",
+        "asgi_server_profile(mode='sample'): profile the xservers of this test",
+    )
+    config.addinivalue_line(
+        "markers",
+        "asgi_server_engines(loop=None, http=None, ws=None): implementations to "
+        "run this test's 'asgi_server_engine' with, overriding the options",
+    )
+    config._asgi_server_engine_results = []
+    set_registry(TimingsRegistry())
+
+
+def pytest_unconfigure(config):
+    set_registry(None)
+
+
+def pytest_generate_tests(metafunc):
+    if "asgi_server_engine" not in metafunc.fixturenames:
+        return
+    choices = {
+        key: _get_option(metafunc.config, f"asgi_server_{key}")
+        for key in ENGINE_CHOICES
+    }
+    marker = metafunc.definition.get_closest_marker("asgi_server_engines")
+    if marker:
+        choices.update(marker.kwargs)
+    engines = get_engine_matrix(**choices)
+    metafunc.parametrize(
+        "asgi_server_engine",
+        engines,
+        ids=[engine.id for engine in engines],
+        indirect=True,
+    )
+
+
+def pytest_runtest_setup(item):
+    item._asgi_server_timings_start = len(get_registry() or ())
+    clear_stopped_logs()
+    item._asgi_server_log_marks = {log: log.mark() for log in get_test_logs()}
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    report = outcome.get_result()
+    if not report.failed:
+        return
+    marks = getattr(item, "_asgi_server_log_marks", {})
+    for log in get_test_logs():
+        lines = log.lines_since(marks.get(log, 0))
+        if lines:
+            report.sections.append((f"asgi-server log {log.name}", "\n".join(lines)))
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_teardown(item):
+    yield
+    # The running test is no longer set in the environment after its teardown
+    dump_active_profiles(item.nodeid)
+    registry = get_registry()
+    if registry is not None and _get_option(item.config, "asgi_server_timings"):
+        start = getattr(item, "_asgi_server_timings_start", len(registry))
+        for timings in registry.timings[start:]:
+            item.user_properties.append(
+                ("asgi_server_timings", json.dumps(timings.as_dict()))
+            )
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    engine_results = getattr(config, "_asgi_server_engine_results", None)
+    if engine_results:
+        terminalreporter.write_sep("-", "asgi-server engines")
+        for line in format_engine_table(engine_results):
+            terminalreporter.write_line(line)
+    registry = get_registry()
+    if not registry:
+        return
+    json_path = config.getoption("asgi_server_timings_json")
+    if json_path:
+        registry.write_json(json_path)
+        terminalreporter.write_line(f"asgi-server timings written to {json_path}")
+    if _get_option(config, "asgi_server_timings"):
+        terminalreporter.write_sep("-", "asgi-server timings")
+        for line in registry.format_table():
+            terminalreporter.write_line(line)
+
+
+def _get_option(config, name):
+    value = config.getoption(name)
+    return config.getini(name) if value is None else value
 
 
 @pytest.fixture
-def server_thread_factory(app):
+def asgi_server_engine(request):
+    """The ServerEngine the test runs with. Tests using it are run with every
+    combination of the '--asgi-server-loop', '--asgi-server-http' and
+    '--asgi-server-ws' implementations, and the servers they start use it.
+    Combinations that are not installed are skipped.
+
+    Engines only apply to the uvicorn backend. With another '--asgi-server-backend',
+    or a server started with another 'backend', tests run once, with the default
+    engine, and the other combinations are skipped."""
+    engine = getattr(request, "param", ServerEngine())
+    if engine.missing:
+        pytest.skip(f"{engine.id} requires {', '.join(engine.missing)}")
+    backend = _get_option(request.config, "asgi_server_backend")
+    if backend != "uvicorn" and engine != ServerEngine():
+        pytest.skip(f"{engine.id} only applies to the uvicorn backend, not {backend}")
+    return engine
+
+
+def _get_engine_kwargs(request, backend) -> dict:
+    """Return the kwargs of the test's engine for a server on 'backend'. Servers on
+    other backends than uvicorn run without them: the test is skipped for all but
+    the default engine, and its results are left out of the engine table."""
+    if "asgi_server_engine" not in request.fixturenames:
+        return {}
+    engine = request.getfixturevalue("asgi_server_engine")
+    name = getattr(backend, "name", backend)
+    if name == "uvicorn":
+        return engine.kwargs
+    if engine != ServerEngine():
+        pytest.skip(f"{engine.id} only applies to the uvicorn backend, not {name}")
+    request.node._asgi_server_engine_unused = True
+    return {}
+
+
+@pytest.fixture
+def server_thread_factory(request, app, pytestconfig):
+    from .groups import stop_all
+    from .servers import UvicornTestServerThread
+
     server_threads = []
+    backend = _get_option(pytestconfig, "asgi_server_backend")
+    metrics = bool(_get_option(pytestconfig, "asgi_server_metrics"))
+    resources = bool(_get_option(pytestconfig, "asgi_server_resources"))
+    resources_interval = float(pytestconfig.getini("asgi_server_resources_interval"))
 
     def _server_thread_factory(*args, **kwargs):
+        kwargs.setdefault("backend", backend)
+        if metrics:
+            kwargs.setdefault("metrics", True)
+        if resources:
+            kwargs.setdefault("resources", True)
+        kwargs.setdefault("resources_interval", resources_interval)
+        for key, value in _get_engine_kwargs(request, kwargs["backend"]).items():
+            kwargs.setdefault(key, value)
         server_thread = UvicornTestServerThread(app=app, *args, **kwargs)
         server_threads.append(server_thread)
         return server_thread
 
     yield _server_thread_factory
 
-    for server_thread in server_threads:
-        server_thread.stop()
+    stop_all(server_threads)
 
 
 @pytest.fixture
@@ -26,33 +423,275 @@ def server_thread(server_thread_factory):
 
 
 @pytest.fixture
-def xserver_factory(xprocess, pytestconfig):
-    def _xserver_factory(appstr, env, **kwargs):
+def impairment_proxy_factory():
+    """Return a factory of ImpairmentProxies in front of a test server, which are
+    stopped at the end of the test"""
+    from .groups import stop_all
+    from .proxy import ImpairmentProxy
+
+    proxies = []
+
+    def _impairment_proxy_factory(upstream, **kwargs):
+        proxy = ImpairmentProxy(upstream, **kwargs)
+        proxies.append(proxy)
+        return proxy
+
+    yield _impairment_proxy_factory
+
+    stop_all(proxies)
+
+
+@pytest.fixture(scope="session")
+def xserver_pool(xprocess, pytestconfig):
+    from .pools import PytestUvicornXServerPool
+
+    pool = PytestUvicornXServerPool(
+        pytestconfig=pytestconfig,
+        xprocess=xprocess,
+        max_size=int(_get_option(pytestconfig, "asgi_server_pool_size")),
+    )
+    yield pool
+    pool.drain()
+
+
+@pytest.fixture(scope="session")
+def xserver_zygote(xprocess, pytestconfig):
+    from .zygote import UvicornZygote
+
+    with UvicornZygote(
+        pytestconfig=pytestconfig,
+        xprocess=xprocess,
+        preload=_get_option(pytestconfig, "asgi_server_zygote_preload"),
+    ) as zygote:
+        yield zygote
+
+
+@pytest.fixture(scope="session")
+def xclient_pool(xserver_pool, pytestconfig):
+    import httpx
+
+    from .clients import PytestAsgiXClientPool
+
+    limits = httpx.Limits(
+        max_connections=int(pytestconfig.getini("asgi_server_client_max_connections")),
+        max_keepalive_connections=int(
+            pytestconfig.getini("asgi_server_client_max_keepalive")
+        ),
+        keepalive_expiry=float(
+            pytestconfig.getini("asgi_server_client_keepalive_expiry")
+        ),
+    )
+    client_kwargs = {"limits": limits}
+    if _get_option(pytestconfig, "asgi_server_http2"):
+        client_kwargs["http2"] = True
+    pool = PytestAsgiXClientPool(server_pool=xserver_pool, **client_kwargs)
+    yield pool
+    pool.drain()
+
+
+@pytest.fixture
+def xserver_factory(request, xprocess, pytestconfig):
+    from .groups import stop_all
+    from .pools import PooledUvicornXServer
+    from .servers import PytestUvicornXServer
+
+    use_pool = bool(_get_option(pytestconfig, "asgi_server_pool"))
+    if request.node.get_closest_marker("asgi_server_isolated"):
+        use_pool = False
+    use_zygote = bool(_get_option(pytestconfig, "asgi_server_zygote"))
+    profile = _get_option(pytestconfig, "asgi_server_profile") or None
+    marker = request.node.get_closest_marker("asgi_server_profile")
+    if marker:
+        profile = marker.kwargs.get("mode", marker.args[0] if marker.args else "sample")
+    backend = _get_option(pytestconfig, "asgi_server_backend")
+    metrics = bool(_get_option(pytestconfig, "asgi_server_metrics"))
+    resources = bool(_get_option(pytestconfig, "asgi_server_resources"))
+    resources_interval = float(pytestconfig.getini("asgi_server_resources_interval"))
+    tracemalloc = bool(_get_option(pytestconfig, "asgi_server_tracemalloc"))
+    log_lines = int(pytestconfig.getini("asgi_server_log_lines"))
+    log_max_bytes = int(pytestconfig.getini("asgi_server_log_max_bytes")) or None
+    leases = []
+
+    def _xserver_factory(appstr, env, pooled=None, reset=None, **kwargs):
         nonlocal xprocess, pytestconfig
+        if use_zygote:
+            kwargs.setdefault("zygote", request.getfixturevalue("xserver_zygote"))
+        if profile:
+            kwargs.setdefault("profile", profile)
+        kwargs.setdefault("backend", backend)
+        if metrics:
+            kwargs.setdefault("metrics", True)
+        if resources:
+            kwargs.setdefault("resources", True)
+        kwargs.setdefault("resources_interval", resources_interval)
+        if tracemalloc:
+            kwargs.setdefault("tracemalloc", True)
+        kwargs.setdefault("log_lines", log_lines)
+        kwargs.setdefault("log_max_bytes", log_max_bytes)
+        for key, value in _get_engine_kwargs(request, kwargs["backend"]).items():
+            kwargs.setdefault(key, value)
+        if use_pool if pooled is None else pooled:
+            lease = PooledUvicornXServer(
+                pool=request.getfixturevalue("xserver_pool"),
+                appstr=appstr,
+                env=env,
+                reset=reset,
+                **kwargs,
+            )
+            leases.append(lease)
+            return lease
         return PytestUvicornXServer(
             pytestconfig=pytestconfig,
             xprocess=xprocess,
             appstr=appstr,
             env=env,
-            **kwargs
+            **kwargs,
         )
 
     yield _xserver_factory
 
+    stop_all(leases)
+
+
+def _get_client_mode(request) -> str:
+    if request.node.get_closest_marker("asgi_server_external"):
+        return "xserver"
+    marker = request.node.get_closest_marker("asgi_server_client_mode")
+    if marker:
+        return marker.args[0]
+    return _get_option(request.config, "asgi_server_client_mode")
+
 
 @pytest.fixture
-async def xclient_factory():
-    async def _xclient_factory(app, xserver):
-        async with LifespanManager(app):
-            return PytestAsgiXClient(xserver=xserver)
+async def xclient_factory(request):
+    from .clients import PytestAsgiXClient
+
+    default_mode = _get_client_mode(request)
+
+    recorder = None
+    if request.config.getoption("asgi_server_record"):
+        recorder = request.getfixturevalue("asgi_server_recorder")
+
+    async def _xclient_factory(app, xserver, mode=None):
+        # The app's lifespan runs once, in the process serving the requests: the
+        # xserver process, or the test process with mode "asgi"
+        return PytestAsgiXClient(
+            xserver=xserver, app=app, mode=mode or default_mode, recorder=recorder
+        )
 
     yield _xclient_factory
 
 
 @pytest.fixture
-async def xclient(xserver_factory, xclient_factory):
+async def xclient(request, xserver_factory, xclient_factory):
+    use_shared = bool(_get_option(request.config, "asgi_server_shared_client"))
+    if request.node.get_closest_marker("asgi_server_isolated"):
+        use_shared = False
+    shared_clients = []
+
     async def _xclient(app, appstr, env):
+        if use_shared and _get_client_mode(request) == "xserver":
+            pool = request.getfixturevalue("xclient_pool")
+            client = await pool.acquire(appstr, env)
+            shared_clients.append((pool, client))
+            return client
         _xserver = xserver_factory(appstr=appstr, env=env)
         return await xclient_factory(app, xserver=_xserver)
 
     yield _xclient
+
+    for pool, client in shared_clients:
+        pool.release(client)
+
+
+@pytest.fixture
+def asgi_load(request):
+    """Return 'run_load()'. Summaries of the runs are added to the test report."""
+    from .load import run_load
+
+    results = []
+
+    async def _asgi_load(client, requests="/", **kwargs):
+        result = await run_load(client, requests, **kwargs)
+        results.append(result)
+        if "asgi_server_engine" in request.fixturenames and not getattr(
+            request.node, "_asgi_server_engine_unused", False
+        ):
+            request.config._asgi_server_engine_results.append(
+                (
+                    request.node.originalname,
+                    request.getfixturevalue("asgi_server_engine"),
+                    result,
+                )
+            )
+        return result
+
+    yield _asgi_load
+
+    if results:
+        request.node.add_report_section(
+            "call", "asgi-load", "\n".join(result.summary() for result in results)
+        )
+
+
+@pytest.fixture(scope="session")
+def asgi_server_recorder(pytestconfig):
+    """TrafficRecorder of the xclients, writing to '--asgi-server-record'"""
+    from .recording import TrafficRecorder
+
+    path = pytestconfig.getoption("asgi_server_record")
+    if not path:
+        pytest.skip("no recording path given with '--asgi-server-record'")
+    with TrafficRecorder(path) as recorder:
+        yield recorder
+
+
+@pytest.fixture
+def asgi_replay(request):
+    """Return 'replay_traffic()'. Summaries of the replays are added to the test
+    report."""
+    from .recording import replay_traffic
+
+    results = []
+
+    async def _asgi_replay(client, path, **kwargs):
+        result = await replay_traffic(client, path, **kwargs)
+        results.append(result)
+        return result
+
+    yield _asgi_replay
+
+    if results:
+        request.node.add_report_section(
+            "call", "asgi-replay", "\n".join(result.summary() for result in results)
+        )
+
+
+@pytest.fixture
+def asgi_ws_fanout(request):
+    """Return 'run_websocket_fanout()'. With an xserver client, the server's memory
+    is measured by default. Summaries of the runs are added to the test report."""
+    from .fanout import run_websocket_fanout
+    from .resources import read_resources
+
+    results = []
+
+    def _get_server_rss(xserver):
+        samples = [read_resources(pid) for pid in xserver.pids]
+        if not samples or None in samples:
+            return None
+        return sum(sample.rss for sample in samples)
+
+    async def _asgi_ws_fanout(client, uri, **kwargs):
+        if client.mode == "xserver":
+            kwargs.setdefault("server_rss", lambda: _get_server_rss(client.xserver))
+        result = await run_websocket_fanout(client, uri, **kwargs)
+        results.append(result)
+        return result
+
+    yield _asgi_ws_fanout
+
+    if results:
+        request.node.add_report_section(
+            "call", "asgi-ws-fanout", "\n".join(r.summary() for r in results)
+        )
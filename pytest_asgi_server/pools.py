@@ -0,0 +1,259 @@
+# from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from xprocess import XProcess
+
+from .backends import get_backend
+from .memory import MemoryDiff
+from .metrics import ServerMetrics
+from .resources import ResourceSampler
+from .servers import BaseUvicornTestServerFacade, PytestUvicornXServer
+from .timings import ServerTimings
+
+log = logging.getLogger(__name__)
+
+ResetHook = Callable[[PytestUvicornXServer], None]
+
+_pool_ids = itertools.count()
+
+
+class _PoolEntry:
+    def __init__(self, server: PytestUvicornXServer):
+        self.server = server
+        self.leases = 0
+        self.used = False
+
+
+class PytestUvicornXServerPool:
+    """Keeps running PytestUvicornXServer processes alive across tests.
+
+    Servers are keyed by '(appstr, env, kwargs)'. Every request for an identical
+    configuration is handed the same running process. Idle servers are evicted in
+    least-recently-used order once the pool holds more than 'max_size' servers.
+
+    Servers may be acquired from several threads at once, e.g. by 'start_all()'.
+    Servers with different configurations start in parallel.
+    """
+
+    def __init__(
+        self,
+        *,
+        pytestconfig,
+        xprocess: XProcess,
+        max_size: int = 4,
+        reset: Optional[ResetHook] = None,
+    ):
+        self.pytestconfig = pytestconfig
+        self.xprocess = xprocess
+        self.max_size = max_size
+        self.reset = reset
+        self.name = f"pool{next(_pool_ids)}"
+        self._entries: "OrderedDict[str, _PoolEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(appstr: str, env: Dict[str, Any], kwargs: Dict[str, Any]) -> str:
+        return json.dumps([appstr, env, kwargs], sort_keys=True, default=repr)
+
+    def acquire(
+        self,
+        appstr: str,
+        env: Dict[str, Any],
+        reset: Optional[ResetHook] = None,
+        **kwargs,
+    ) -> PytestUvicornXServer:
+        key = self.make_key(appstr, env, kwargs)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            return self._acquire(key, appstr, env, reset, kwargs)
+
+    def _acquire(
+        self,
+        key: str,
+        appstr: str,
+        env: Dict[str, Any],
+        reset: Optional[ResetHook],
+        kwargs: Dict[str, Any],
+    ) -> PytestUvicornXServer:
+        entry = self._entries.get(key)
+        if entry and not entry.server.is_alive():
+            log.warning(f"Discarding dead pooled server: {entry.server.name}")
+            self._discard(key)
+            entry = None
+        if entry is None:
+            name = kwargs.pop("name", appstr)
+            digest = hashlib.sha1(key.encode()).hexdigest()[:8]
+            server = PytestUvicornXServer(
+                pytestconfig=self.pytestconfig,
+                xprocess=self.xprocess,
+                appstr=appstr,
+                name=f"{name}-{self.name}-{digest}",
+                env=dict(env),
+                **kwargs,
+            )
+            server.start()
+            if not server.is_alive():
+                return server
+            with self._lock:
+                entry = self._entries[key] = _PoolEntry(server)
+        else:
+            reset = reset or self.reset
+            if entry.used and reset:
+                reset(entry.server)
+        with self._lock:
+            self._entries.move_to_end(key)
+            entry.leases += 1
+            entry.used = True
+            self._evict()
+        return entry.server
+
+    def release(self, server: PytestUvicornXServer) -> None:
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry.server is server:
+                    entry.leases = max(entry.leases - 1, 0)
+                    self._entries.move_to_end(key)
+                    break
+            else:
+                server.stop()
+            self._evict()
+
+    def drain(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._discard(key)
+
+    def _discard(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key)
+        entry.server.stop()
+
+    def _evict(self) -> None:
+        with self._lock:
+            while len(self._entries) > self.max_size:
+                idle = [k for k, entry in self._entries.items() if not entry.leases]
+                if not idle:
+                    break
+                self._discard(idle[0])
+
+
+class PooledUvicornXServer(BaseUvicornTestServerFacade):
+    """Lease on a server held by a PytestUvicornXServerPool.
+
+    Behaves like a PytestUvicornXServer, but 'start()' acquires a running server
+    from the pool and 'stop()' hands it back instead of terminating it.
+    """
+
+    def __init__(
+        self,
+        *,
+        pool: PytestUvicornXServerPool,
+        appstr: str,
+        env: Dict[str, Any] = {},
+        reset: Optional[ResetHook] = None,
+        **kwargs,
+    ):
+        self.backend = get_backend(kwargs.get("backend", "uvicorn"))
+        config_param_keys = self._get_config_param_keys(self.backend)
+        self.options = {k: v for k, v in kwargs.items() if k not in config_param_keys}
+        self.kwargs: dict = {}
+        self._update_kwargs(
+            **{k: v for k, v in kwargs.items() if k in config_param_keys}
+        )
+        self.pool = pool
+        self.appstr = appstr
+        self.env = dict(env)
+        self.reset = reset
+        self.server: Optional[PytestUvicornXServer] = None
+        self.timings: Optional[ServerTimings] = None
+
+    def start(self) -> None:
+        if self.server:
+            raise RuntimeError(
+                f"'start()' was called while {self.__class__.__name__} is",
+                "already holding a pooled server.",
+            )
+        self.server = self.pool.acquire(
+            self.appstr,
+            self.env,
+            reset=self.reset,
+            **self.options,
+            **self.kwargs,
+        )
+        self.timings = self.server.timings
+
+    def stop(self) -> None:
+        if self.server:
+            server, self.server = self.server, None
+            self.pool.release(server)
+            self.timings = None
+
+    def is_alive(self) -> bool:
+        return bool(self.server and self.server.is_alive())
+
+    def metrics(self) -> ServerMetrics:
+        if not self.server:
+            raise RuntimeError(f"{self.__class__.__name__} is not holding a server")
+        return self.server.metrics()
+
+    def reset_metrics(self) -> None:
+        if not self.server:
+            raise RuntimeError(f"{self.__class__.__name__} is not holding a server")
+        self.server.reset_metrics()
+
+    def take_snapshot(self, name: str, collect: bool = True) -> None:
+        if not self.server:
+            raise RuntimeError(f"{self.__class__.__name__} is not holding a server")
+        self.server.take_snapshot(name, collect=collect)
+
+    def compare_snapshots(
+        self, old: str, new: str, limit: int = 10, key_type: str = "lineno"
+    ) -> MemoryDiff:
+        if not self.server:
+            raise RuntimeError(f"{self.__class__.__name__} is not holding a server")
+        return self.server.compare_snapshots(old, new, limit=limit, key_type=key_type)
+
+    def clear_snapshots(self) -> None:
+        if not self.server:
+            raise RuntimeError(f"{self.__class__.__name__} is not holding a server")
+        self.server.clear_snapshots()
+
+    @property
+    def host(self) -> str:
+        return self.server.host if self.server else self.kwargs.get("host")
+
+    @property
+    def port(self) -> int:
+        return self.server.port if self.server else self.kwargs.get("port", 0)
+
+    @property
+    def uds(self) -> Optional[str]:
+        return self.server.uds if self.server else None
+
+    @property
+    def pids(self) -> List[int]:
+        return self.server.pids if self.server else []
+
+    @property
+    def resources(self) -> Optional[ResourceSampler]:
+        return self.server.resources if self.server else None
+
+    @property
+    def ws_base_url(self) -> Optional[str]:
+        return self.server.ws_base_url if self.is_alive() else None
+
+    @property
+    def http_base_url(self) -> Optional[str]:
+        return self.server.http_base_url if self.is_alive() else None
@@ -0,0 +1,86 @@
+# from __future__ import annotations
+
+import logging
+import os
+import re
+from typing import Optional, Set
+
+from .errors import ServerControlError
+from .utils import send_control
+
+log = logging.getLogger(__name__)
+
+PROFILE_MODES = ("sample", "cprofile")
+
+# "sample" writes collapsed stacks, "cprofile" pstats files
+PROFILE_EXTENSIONS = {"sample": ".collapsed", "cprofile": ".prof"}
+
+_written_paths: Set[str] = set()
+
+
+def get_current_test_name(nodeid: Optional[str] = None) -> str:
+    """Return the id of the test 'nodeid', or else of the running test, made safe
+    for use as a file name"""
+    if nodeid is None:
+        current = os.environ.get("PYTEST_CURRENT_TEST")
+        nodeid = current.rsplit(" ", 1)[0] if current else "session"
+    return re.sub(r"[^\w.-]+", "_", nodeid).strip("_")
+
+
+class ServerProfile:
+    """Profile of a server process, collected in the process and written to
+    'output_dir' in one file per test on 'dump()'.
+
+    Files are named after the running test with 'suffix' appended. Each dump
+    holds the samples collected since the previous one. Files left by previous
+    test runs are overwritten.
+    """
+
+    def __init__(
+        self, *, control_path: str, mode: str, output_dir: str, suffix: str = ""
+    ):
+        self.control_path = control_path
+        self.mode = mode
+        self.output_dir = output_dir
+        self.suffix = suffix
+
+    def _get_dump_path(self, nodeid: Optional[str] = None) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = get_current_test_name(nodeid) + self.suffix
+        base = os.path.join(self.output_dir, name)
+        extension = PROFILE_EXTENSIONS[self.mode]
+        path, n = base + extension, 1
+        while path in _written_paths:
+            n += 1
+            path = f"{base}-{n}{extension}"
+        _written_paths.add(path)
+        return path
+
+    def dump(self, nodeid: Optional[str] = None) -> Optional[str]:
+        """Write the profile collected since the last dump and return its path. The
+        file is named after the test 'nodeid', by default the running test."""
+        path = self._get_dump_path(nodeid)
+        try:
+            send_control(self.control_path, "profile_dump", path=path)
+        except (OSError, ServerControlError) as exc:
+            log.warning(f"Could not dump server profile to {path}: {exc}")
+            return None
+        return path
+
+
+_active_profiles: Set[ServerProfile] = set()
+
+
+def activate_profile(profile: ServerProfile) -> None:
+    _active_profiles.add(profile)
+
+
+def deactivate_profile(profile: ServerProfile) -> None:
+    _active_profiles.discard(profile)
+
+
+def dump_active_profiles(nodeid: Optional[str] = None) -> None:
+    """Dump the profiles of all running servers, e.g. at the end of the test
+    'nodeid'"""
+    for profile in list(_active_profiles):
+        profile.dump(nodeid)
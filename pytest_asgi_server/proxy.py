@@ -0,0 +1,340 @@
+# from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, Optional, Set, Tuple, Union
+
+log = logging.getLogger(__name__)
+
+# Largest chunk read from a connection at once
+CHUNK_SIZE = 64 * 1024
+
+# Chunks buffered per direction of a connection, in flight or waiting for bandwidth
+QUEUE_SIZE = 64
+
+# Impairments that can be changed with 'ImpairmentProxy.update()'
+IMPAIRMENTS = ("latency", "jitter", "bandwidth", "reset_probability", "accept_delay")
+
+
+class _Connection:
+    def __init__(self, proxy: "ImpairmentProxy", reader, writer):
+        self.proxy = proxy
+        self.client_reader = reader
+        self.client_writer = writer
+        self.upstream_writer: Optional[asyncio.StreamWriter] = None
+        self.tasks: Set[asyncio.Task] = set()
+        self.task = asyncio.current_task()
+
+    async def run(self) -> None:
+        proxy = self.proxy
+        try:
+            if proxy.accept_delay:
+                await asyncio.sleep(proxy.accept_delay)
+            upstream_reader, self.upstream_writer = await proxy._open_upstream()
+        except (OSError, asyncio.CancelledError):
+            self.close()
+            return
+        pipes = [
+            (self.client_reader, self.upstream_writer, "bytes_upstream"),
+            (upstream_reader, self.client_writer, "bytes_downstream"),
+        ]
+        for reader, writer, counter in pipes:
+            queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+            self.tasks.add(asyncio.ensure_future(self._read(reader, queue)))
+            self.tasks.add(asyncio.ensure_future(self._write(queue, writer, counter)))
+        try:
+            await asyncio.gather(*self.tasks)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.close()
+
+    async def _read(self, reader: asyncio.StreamReader, queue: asyncio.Queue) -> None:
+        """Queue each chunk with the time it's due to arrive on the other side"""
+        proxy = self.proxy
+        due = 0.0
+        while True:
+            try:
+                data = await reader.read(CHUNK_SIZE)
+            except OSError:
+                data = b""
+            delay = proxy.latency
+            if proxy.jitter:
+                delay += proxy.random.uniform(-proxy.jitter, proxy.jitter)
+            # Chunks never overtake each other
+            due = max(due, time.monotonic() + max(delay, 0.0))
+            await queue.put((due, data))
+            if not data:
+                return
+
+    async def _write(
+        self, queue: asyncio.Queue, writer: asyncio.StreamWriter, counter: str
+    ) -> None:
+        proxy = self.proxy
+        while True:
+            due, data = await queue.get()
+            await asyncio.sleep(due - time.monotonic())
+            if not data:
+                if writer.can_write_eof():
+                    try:
+                        writer.write_eof()
+                    except OSError:
+                        pass
+                return
+            if proxy.reset_probability and (
+                proxy.random.random() < proxy.reset_probability
+            ):
+                self.reset()
+                return
+            while data:
+                size = len(data)
+                if proxy.bandwidth:
+                    # Send what the bandwidth allows in 10ms at a time
+                    size = max(int(proxy.bandwidth / 100), 1)
+                chunk, data = data[:size], data[size:]
+                try:
+                    writer.write(chunk)
+                    await writer.drain()
+                except OSError:
+                    self.close()
+                    return
+                proxy.stats[counter] += len(chunk)
+                if proxy.bandwidth:
+                    await asyncio.sleep(len(chunk) / proxy.bandwidth)
+
+    def reset(self) -> None:
+        """Abort the connection to the client with a TCP reset"""
+        sock = self.client_writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(
+                socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+            )
+        self.proxy.stats["resets"] += 1
+        self.client_writer.transport.abort()
+        self.close()
+
+    def close(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        for writer in (self.client_writer, self.upstream_writer):
+            if writer is not None:
+                writer.close()
+        self.proxy._connections.discard(self)
+
+
+class ImpairmentProxy:
+    """TCP proxy that impairs the connections to a test server like a real network
+    would, running an event loop in a background thread.
+
+    'upstream' is a test server (or a '(host, port)' tuple) to forward to. The
+    proxy can stand in for the server wherever a server is expected, e.g.
+    'PytestAsgiXClient(ImpairmentProxy(xserver))': it has the same 'start()',
+    'stop()', 'is_alive()' and base URLs, and starts and stops the server with
+    itself.
+
+    Data is forwarded in both directions with 'latency' seconds added, varied by
+    up to +/- 'jitter' seconds, at most 'bandwidth' bytes per second per
+    connection and direction. Each forwarded chunk aborts its connection with a
+    TCP reset with 'reset_probability'. New connections wait 'accept_delay'
+    seconds before they are served; the connection is already established by
+    then, so clients see a slow first response rather than a slow connect.
+
+    All impairments can be changed while the proxy runs with 'update()'. They
+    apply to the data read from then on.
+    """
+
+    def __init__(
+        self,
+        upstream: Union[Any, Tuple[str, int]],
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        bandwidth: Optional[float] = None,
+        reset_probability: float = 0.0,
+        accept_delay: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.upstream = upstream
+        self.listen_host = host
+        self.listen_port = port
+        self.random = random.Random(seed)
+        self.stats: Dict[str, int] = {}
+        self.reset_stats()
+        self.update(
+            latency=latency,
+            jitter=jitter,
+            bandwidth=bandwidth,
+            reset_probability=reset_probability,
+            accept_delay=accept_delay,
+        )
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.address: Optional[Tuple[str, int]] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._connections: Set[_Connection] = set()
+        self._started_upstream = False
+
+    def __repr__(self) -> str:
+        impairments = " ".join(f"{key}={getattr(self, key)}" for key in IMPAIRMENTS)
+        return f"<{self.__class__.__name__} {self.address} {impairments}>"
+
+    def __enter__(self) -> "ImpairmentProxy":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def update(self, **impairments) -> None:
+        """Change the impairments, e.g. 'update(latency=0.1, bandwidth=None)'"""
+        for key, value in impairments.items():
+            if key not in IMPAIRMENTS:
+                raise TypeError(
+                    f"Unknown impairment {key!r}, choose from {IMPAIRMENTS}"
+                )
+            if value is not None and value < 0:
+                raise ValueError(f"{key!r} must not be negative")
+            setattr(self, key, value)
+
+    def reset_stats(self) -> None:
+        self.stats.update(connections=0, resets=0, bytes_upstream=0, bytes_downstream=0)
+
+    @property
+    def _is_upstream_server(self) -> bool:
+        return not isinstance(self.upstream, tuple)
+
+    async def _open_upstream(self):
+        if self._is_upstream_server and self.upstream.uds:
+            return await asyncio.open_unix_connection(self.upstream.uds)
+        if self._is_upstream_server:
+            return await asyncio.open_connection(self.upstream.host, self.upstream.port)
+        return await asyncio.open_connection(*self.upstream)
+
+    async def _handle(self, reader, writer) -> None:
+        self.stats["connections"] += 1
+        connection = _Connection(self, reader, writer)
+        self._connections.add(connection)
+        await connection.run()
+
+    async def _serve(self, started: threading.Event) -> None:
+        self._stopped = asyncio.Event()
+        try:
+            self._server = await asyncio.start_server(
+                self._handle, self.listen_host, self.listen_port
+            )
+            self.address = self._server.sockets[0].getsockname()[:2]
+        finally:
+            started.set()
+        async with self._server:
+            await self._stopped.wait()
+            connections = list(self._connections)
+            for connection in connections:
+                connection.close()
+            await asyncio.gather(
+                *(connection.task for connection in connections),
+                return_exceptions=True,
+            )
+
+    def _run(self, started: threading.Event) -> None:
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self._serve(started))
+        finally:
+            self.loop.close()
+
+    def start(self) -> None:
+        if self.thread:
+            log.warning(f"{self.__class__.__name__} is already running: {self}")
+            return
+        if self._is_upstream_server and not self.upstream.is_alive():
+            self.upstream.start()
+            self._started_upstream = True
+        self.reset_stats()
+        self.address = None
+        started = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run,
+            args=(started,),
+            name="pytest-asgi-server-proxy",
+            daemon=True,
+        )
+        self.thread.start()
+        started.wait()
+        if self.address is None:
+            self.thread.join()
+            self.thread = None
+            self.stop()
+            raise RuntimeError(f"{self.__class__.__name__} failed to start")
+
+    def stop(self) -> None:
+        """Stop the proxy, closing its connections, and the server if the proxy
+        started it"""
+        if self.thread:
+            self.loop.call_soon_threadsafe(self._stopped.set)
+            self.thread.join()
+            self.thread = None
+        if self._started_upstream:
+            self._started_upstream = False
+            self.upstream.stop()
+
+    async def astart(self) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.start)
+
+    async def astop(self) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.stop)
+
+    def reset_connections(self) -> None:
+        """Abort all open connections with a TCP reset"""
+        if self.loop and self.thread:
+
+            def reset():
+                for connection in list(self._connections):
+                    connection.reset()
+
+            self.loop.call_soon_threadsafe(reset)
+
+    def is_alive(self) -> bool:
+        upstream_alive = not self._is_upstream_server or self.upstream.is_alive()
+        return bool(self.thread and self.thread.is_alive() and upstream_alive)
+
+    @property
+    def host(self) -> str:
+        return self.address[0] if self.address else self.listen_host
+
+    @property
+    def port(self) -> int:
+        return self.address[1] if self.address else self.listen_port
+
+    @property
+    def uds(self) -> None:
+        return None
+
+    @property
+    def is_ssl(self) -> bool:
+        return self._is_upstream_server and self.upstream.is_ssl
+
+    @property
+    def timings(self):
+        return self.upstream.timings if self._is_upstream_server else None
+
+    @property
+    def ws_base_url(self) -> Optional[str]:
+        if self.is_alive():
+            scheme = "wss://" if self.is_ssl else "ws://"
+            return f"{scheme}{self.host}:{self.port}"
+        return None
+
+    @property
+    def http_base_url(self) -> Optional[str]:
+        if self.is_alive():
+            scheme = "https://" if self.is_ssl else "http://"
+            return f"{scheme}{self.host}:{self.port}"
+        return None
@@ -0,0 +1,228 @@
+import http.client
+import os
+import re
+import select
+import shutil
+import socket
+import ssl
+import tempfile
+import threading
+import time
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+from .errors import ServerStartupError, ServerStartupTimeout
+
+
+class ReadinessProbe:
+    """Base class for checks that tell when a server can accept connections.
+
+    Subclasses implement 'check()'. Probes that can be woken up by the server
+    itself override 'wait()' to block until then instead of sleeping.
+    """
+
+    def check(self) -> bool:
+        raise NotImplementedError
+
+    def wait(self, timeout: float) -> bool:
+        if self.check():
+            return True
+        time.sleep(timeout)
+        return False
+
+    def close(self) -> None:
+        pass
+
+
+class TCPProbe(ReadinessProbe):
+    """Ready when a TCP connection to (host, port) succeeds"""
+
+    def __init__(self, host: str, port: int, connect_timeout: float = 0.5):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+
+    def check(self) -> bool:
+        try:
+            with socket.create_connection(
+                (self.host, self.port), timeout=self.connect_timeout
+            ):
+                return True
+        except OSError:
+            return False
+
+
+class UnixProbe(ReadinessProbe):
+    """Ready when a connection to the unix socket at 'path' succeeds"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def check(self) -> bool:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            return sock.connect_ex(self.path) == 0
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, **kwargs):
+        super().__init__("localhost", **kwargs)
+        self.path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class HTTPProbe(ReadinessProbe):
+    """Ready when a GET request to 'url' returns a non-5xx response.
+
+    If 'uds' is given, the request is sent over the unix socket at that path.
+    """
+
+    def __init__(
+        self, url: str, request_timeout: float = 1.0, uds: Optional[str] = None
+    ):
+        self.url = urlsplit(url)
+        self.request_timeout = request_timeout
+        self.uds = uds
+
+    def check(self) -> bool:
+        if self.uds:
+            conn: http.client.HTTPConnection = _UnixHTTPConnection(
+                self.uds, timeout=self.request_timeout
+            )
+        elif self.url.scheme == "https":
+            conn = http.client.HTTPSConnection(
+                self.url.hostname,
+                self.url.port,
+                timeout=self.request_timeout,
+                context=ssl._create_unverified_context(),
+            )
+        else:
+            conn = http.client.HTTPConnection(
+                self.url.hostname, self.url.port, timeout=self.request_timeout
+            )
+        try:
+            conn.request("GET", self.url.path or "/")
+            return conn.getresponse().status < 500
+        except (OSError, http.client.HTTPException):
+            return False
+        finally:
+            conn.close()
+
+
+class LogPatternProbe(ReadinessProbe):
+    """Ready when a line of the log file at 'path' matches the regex 'pattern'"""
+
+    def __init__(self, path: str, pattern: str):
+        self.path = path
+        self.pattern = re.compile(pattern)
+        self.offset = os.path.getsize(path) if os.path.exists(path) else 0
+        self.buffer = ""
+
+    def check(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, errors="surrogateescape") as f:
+            f.seek(self.offset)
+            self.buffer += f.read()
+            self.offset = f.tell()
+        *lines, self.buffer = self.buffer.split("\n")
+        return any(self.pattern.search(line) for line in lines)
+
+
+class EventProbe(ReadinessProbe):
+    """Ready when a threading.Event is set"""
+
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def check(self) -> bool:
+        return self.event.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        return self.event.wait(timeout)
+
+
+class LifespanProbe(ReadinessProbe):
+    """Ready when the server process reports that startup (including the lifespan
+    startup events) is complete.
+
+    The probe listens on a unix socket at 'path'. The server process connects to it
+    and writes 'ready' or 'failed' once 'uvicorn.Server.startup' returns, preceded
+    by 'startup <seconds>' with the duration of the startup, which is kept in
+    'startup_duration'.
+    """
+
+    def __init__(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="pytest-asgi-server-")
+        self.path = os.path.join(self.tmpdir, "ready.sock")
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.path)
+        self.listener.listen(1)
+        self.conn: Optional[socket.socket] = None
+        self.buffer = b""
+        self.startup_duration: Optional[float] = None
+        self.ready = False
+
+    def check(self) -> bool:
+        return self.wait(0)
+
+    def wait(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while not self.ready:
+            sock = self.conn or self.listener
+            remaining = max(deadline - time.monotonic(), 0)
+            readable, _, _ = select.select([sock], [], [], remaining)
+            if not readable:
+                return False
+            if sock is self.listener:
+                self.conn, _ = self.listener.accept()
+                continue
+            data = self.conn.recv(1024)
+            if not data:
+                raise ServerStartupError("Server process exited during startup.")
+            *lines, self.buffer = (self.buffer + data).split(b"\n")
+            for line in lines:
+                if line.startswith(b"startup "):
+                    self.startup_duration = float(line.split()[1])
+                elif line == b"failed":
+                    raise ServerStartupError("Server startup failed.")
+                elif line == b"ready":
+                    self.ready = True
+        return True
+
+    def close(self) -> None:
+        if self.conn:
+            self.conn.close()
+        self.listener.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+def wait_until_ready(
+    probe: ReadinessProbe,
+    *,
+    timeout: float = 10.0,
+    is_alive: Optional[Callable[[], bool]] = None,
+    initial_delay: float = 0.001,
+    max_delay: float = 0.05,
+) -> None:
+    """Block until 'probe' reports ready, backing off exponentially between checks.
+
+    Raises ServerStartupTimeout when 'timeout' seconds pass, or ServerStartupError
+    as soon as 'is_alive()' returns False.
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ServerStartupTimeout(
+                f"Server was not ready within {timeout} seconds.", timeout=timeout
+            )
+        if probe.wait(min(delay, remaining)):
+            return
+        if is_alive and not is_alive():
+            raise ServerStartupError("Server exited during startup.")
+        delay = min(delay * 2, max_delay)
@@ -0,0 +1,334 @@
+# from __future__ import annotations
+
+import asyncio
+import base64
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Set, TextIO, Union
+
+import httpx
+
+from .load import LatencyHistogram, LoadResult
+
+# Headers set by the client for each request, which are not replayed
+SKIPPED_HEADERS = ("host", "content-length", "transfer-encoding", "connection")
+
+# Headers left out of recordings by default, as they may hold credentials
+REDACTED_HEADERS = ("authorization", "proxy-authorization", "cookie")
+
+
+def _encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def _decode(data: str) -> bytes:
+    return base64.b64decode(data)
+
+
+class TrafficRecorder:
+    """Appends the HTTP requests and websocket messages sent by clients to the
+    JSON lines file at 'path', one event per line.
+
+    Every event has the seconds since the first event in "t" and its "type":
+    "http" (with "method", "path", "headers" and a base64 "body" if not empty),
+    "ws_connect" (with "path"), "ws_send" (with "text", or base64 "bytes") and
+    "ws_close". Websocket events carry the "id" of their connection. Headers in
+    'redact_headers' are left out.
+
+    Each recorder starts a session with a "session" line before its first event,
+    as several recorders may append to the same file one after another. "t" and
+    websocket ids start over in each session.
+
+    Pass the recorder to clients with 'PytestAsgiXClient(recorder=...)'. Several
+    clients, also in several threads, may share one recorder. The file is opened
+    once, line-buffered, and kept open until 'close()' or the end of the 'with'
+    block.
+    """
+
+    def __init__(self, path: str, redact_headers: Sequence[str] = REDACTED_HEADERS):
+        self.path = str(path)
+        self.skipped_headers = {*SKIPPED_HEADERS, *(h.lower() for h in redact_headers)}
+        self.started_at: Optional[float] = None
+        self.count = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._file: Optional[TextIO] = open(self.path, "a", buffering=1)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.path} events={self.count}>"
+
+    def __enter__(self) -> "TrafficRecorder":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def record(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._file is None:
+                raise ValueError(f"{self!r} is closed")
+            now = time.monotonic()
+            if self.started_at is None:
+                self.started_at = now
+                self._file.write('{"t":0,"type":"session"}\n')
+            line = json.dumps(
+                {"t": round(now - self.started_at, 6), **event},
+                separators=(",", ":"),
+            )
+            self._file.write(line + "\n")
+            self.count += 1
+
+    async def record_request(self, request: httpx.Request) -> None:
+        body = await request.aread()
+        event = {
+            "type": "http",
+            "method": request.method,
+            "path": request.url.raw_path.decode("ascii"),
+            "headers": [
+                [key, value]
+                for key, value in request.headers.items()
+                if key.lower() not in self.skipped_headers
+            ],
+        }
+        if body:
+            event["body"] = _encode(body)
+        self.record(event)
+
+    def record_websocket(self, connect, path: str) -> "RecordingWebSocketConnect":
+        """Wrap the websocket connection 'connect' to record what is sent on it"""
+        return RecordingWebSocketConnect(self, connect, path, next(self._ids))
+
+
+class RecordingWebSocket:
+    """Websocket that records the messages sent on it, otherwise the same as the
+    wrapped 'websocket'"""
+
+    def __init__(self, recorder: TrafficRecorder, websocket, id: int):
+        self._recorder = recorder
+        self._websocket = websocket
+        self._id = id
+        self._closed = False
+
+    def __getattr__(self, name: str):
+        return getattr(self._websocket, name)
+
+    async def send(self, data: Union[str, bytes]) -> None:
+        if isinstance(data, str):
+            self._recorder.record({"type": "ws_send", "id": self._id, "text": data})
+        else:
+            data = bytes(data)
+            message = {"type": "ws_send", "id": self._id, "bytes": _encode(data)}
+            self._recorder.record(message)
+        await self._websocket.send(data)
+
+    def _record_close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._recorder.record({"type": "ws_close", "id": self._id})
+
+    async def close(self, *args, **kwargs) -> None:
+        self._record_close()
+        await self._websocket.close(*args, **kwargs)
+
+
+class RecordingWebSocketConnect:
+    """Connects like the wrapped 'connect', awaited or as an asynchronous context
+    manager, and returns a RecordingWebSocket"""
+
+    def __init__(self, recorder: TrafficRecorder, connect, path: str, id: int):
+        self.recorder = recorder
+        self.connect = connect
+        self.path = path
+        self.id = id
+        self.websocket: Optional[RecordingWebSocket] = None
+
+    def _wrap(self, websocket) -> RecordingWebSocket:
+        self.recorder.record({"type": "ws_connect", "id": self.id, "path": self.path})
+        self.websocket = RecordingWebSocket(self.recorder, websocket, self.id)
+        return self.websocket
+
+    async def _await(self) -> RecordingWebSocket:
+        return self._wrap(await self.connect)
+
+    def __await__(self):
+        return self._await().__await__()
+
+    async def __aenter__(self) -> RecordingWebSocket:
+        return self._wrap(await self.connect.__aenter__())
+
+    async def __aexit__(self, *args) -> None:
+        if self.websocket:
+            self.websocket._record_close()
+        await self.connect.__aexit__(*args)
+
+
+def read_recording(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the events recorded at 'path' one at a time, so recordings of any size
+    can be replayed.
+
+    The sessions appended to the file are replayed one after another: each event
+    gets the number of its session in "session", and its "t" is offset to follow
+    the last event of the previous session.
+    """
+    session = 0
+    offset = last = 0.0
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if event["type"] == "session":
+                session += 1
+                offset = last
+                continue
+            event["t"] = last = offset + event["t"]
+            event["session"] = session
+            yield event
+
+
+class _Replay:
+    """State of a 'replay_traffic()' run"""
+
+    def __init__(self, client, concurrency: int, clock: Callable[[], float]):
+        self.client = client
+        self.clock = clock
+        self.slots = asyncio.Semaphore(concurrency)
+        self.histogram = LatencyHistogram()
+        self.status_codes: Counter = Counter()
+        self.exceptions: Counter = Counter()
+
+    async def send_request(self, event: dict, scheduled: float, acquired: bool):
+        if not acquired:
+            await self.slots.acquire()
+        try:
+            response = await self.client.request(
+                event["method"],
+                event["path"],
+                headers=event["headers"],
+                content=_decode(event["body"]) if "body" in event else None,
+            )
+        except Exception as exc:
+            self.exceptions[type(exc).__name__] += 1
+        else:
+            self.status_codes[response.status_code] += 1
+        finally:
+            self.slots.release()
+        self.histogram.record(self.clock() - scheduled)
+
+    async def run_websocket(
+        self, event: dict, queue: asyncio.Queue, scheduled: float, acquired: bool
+    ) -> None:
+        if not acquired:
+            await self.slots.acquire()
+        try:
+            websocket = await self.client.websocket_connect(event["path"])
+        except Exception as exc:
+            self.exceptions[type(exc).__name__] += 1
+            return
+        else:
+            self.status_codes[101] += 1
+        finally:
+            self.slots.release()
+            self.histogram.record(self.clock() - scheduled)
+        reader = asyncio.ensure_future(_discard_messages(websocket))
+        try:
+            while True:
+                message = await queue.get()
+                if message is None or message["type"] == "ws_close":
+                    break
+                if "text" in message:
+                    await websocket.send(message["text"])
+                else:
+                    await websocket.send(_decode(message["bytes"]))
+        except Exception as exc:
+            self.exceptions[type(exc).__name__] += 1
+        finally:
+            reader.cancel()
+            try:
+                await websocket.close()
+            except Exception:
+                pass
+
+
+async def replay_traffic(
+    client,
+    path: str,
+    *,
+    speed: Optional[float] = 1.0,
+    concurrency: int = 10,
+    clock: Callable[[], float] = time.perf_counter,
+) -> LoadResult:
+    """Send the traffic recorded at 'path' with 'client', e.g. a PytestAsgiXClient
+    of a fresh server.
+
+    With 'speed' 1 events are sent at their recorded pace, with 'speed' N at N
+    times that pace, and latencies are measured from the scheduled send time, so
+    time spent waiting on a slow server is counted. With 'speed=None' events are
+    sent as fast as possible, reading no further ahead in the recording than the
+    free slots allow. Either way at most 'concurrency' requests and websocket
+    connects are in flight. The messages of a websocket are sent in order on its
+    connection; messages received on it are discarded.
+
+    Each HTTP request and websocket connect counts as a request of the result.
+    """
+    if speed is not None and speed <= 0:
+        raise ValueError(f"'speed' must be positive or None, not {speed}")
+    replay = _Replay(client, concurrency, clock)
+    tasks: Set[asyncio.Future] = set()
+    websockets: Dict[tuple, asyncio.Queue] = {}
+    start = clock()
+    for event in read_recording(path):
+        key = (event["session"], event.get("id", 0))
+        scheduled = clock()
+        if speed is not None:
+            scheduled = start + event["t"] / speed
+            if scheduled > clock():
+                await asyncio.sleep(scheduled - clock())
+        if event["type"] in ("http", "ws_connect"):
+            # As fast as possible, the slot is taken before reading on
+            acquired = speed is None
+            if acquired:
+                await replay.slots.acquire()
+                scheduled = clock()
+            if event["type"] == "http":
+                task = replay.send_request(event, scheduled, acquired)
+            else:
+                queue: asyncio.Queue = asyncio.Queue()
+                replaced = websockets.get(key)
+                if replaced is not None:
+                    replaced.put_nowait(None)
+                websockets[key] = queue
+                task = replay.run_websocket(event, queue, scheduled, acquired)
+            future = asyncio.ensure_future(task)
+            tasks.add(future)
+            future.add_done_callback(tasks.discard)
+        elif key in websockets:
+            websockets[key].put_nowait(event)
+            if event["type"] == "ws_close":
+                del websockets[key]
+    for queue in websockets.values():
+        queue.put_nowait(None)
+    await asyncio.gather(*tasks)
+    return LoadResult(
+        histogram=replay.histogram,
+        duration=clock() - start,
+        status_codes=replay.status_codes,
+        exceptions=replay.exceptions,
+    )
+
+
+async def _discard_messages(websocket) -> None:
+    try:
+        while True:
+            await websocket.recv()
+    except Exception:
+        pass
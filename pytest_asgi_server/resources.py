@@ -0,0 +1,196 @@
+# from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Iterator, List, NamedTuple, Optional, Sequence
+
+# Fields of a ResourceSample that can be compared over time
+RESOURCE_FIELDS = ("rss", "cpu", "fds", "threads")
+
+_clock_ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+class ResourceSample(NamedTuple):
+    """Resource usage of process 'pid' at 'time' (time.monotonic())"""
+
+    time: float
+    pid: int
+    # Resident set size in bytes
+    rss: int
+    # User and system CPU time in seconds
+    cpu: float
+    # Open file descriptors
+    fds: int
+    threads: int
+
+
+def read_resources(pid: int) -> Optional[ResourceSample]:
+    """Sample the resource usage of process 'pid' from /proc. Returns None if it
+    can't be read (the process is gone or /proc is not available)."""
+    now = time.monotonic()
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces, the fields after it don't
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/statm") as f:
+            rss_pages = int(f.read().split()[1])
+        fds = len(os.listdir(f"/proc/{pid}/fd"))
+    except (OSError, ValueError, IndexError):
+        return None
+    # Fields are numbered from 1 in proc(5), 'fields' starts at field 3
+    utime, stime, threads = int(fields[11]), int(fields[12]), int(fields[17])
+    return ResourceSample(
+        time=now,
+        pid=pid,
+        rss=rss_pages * os.sysconf("SC_PAGE_SIZE"),
+        cpu=(utime + stime) / _clock_ticks,
+        fds=fds,
+        threads=threads,
+    )
+
+
+class ResourceSamples(Sequence):
+    """Time series of ResourceSamples, oldest first"""
+
+    def __init__(self, samples: Sequence[ResourceSample]):
+        self.samples = list(samples)
+
+    def __repr__(self) -> str:
+        if not self.samples:
+            return f"<{self.__class__.__name__} samples=0>"
+        return (
+            f"<{self.__class__.__name__} samples={len(self)}"
+            f" peak_rss={self.peak('rss') / 2**20:.1f}MiB"
+            f" peak_fds={self.peak('fds')} peak_threads={self.peak('threads')}>"
+        )
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def __getitem__(self, index):
+        return self.samples[index]
+
+    def __iter__(self) -> Iterator[ResourceSample]:
+        return iter(self.samples)
+
+    @property
+    def pids(self) -> List[int]:
+        return sorted({sample.pid for sample in self.samples})
+
+    def filter(
+        self,
+        *,
+        pid: Optional[int] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> "ResourceSamples":
+        """Return the samples of 'pid' taken between the monotonic times 'since'
+        and 'until'"""
+        return self.__class__(
+            sample
+            for sample in self.samples
+            if (pid is None or sample.pid == pid)
+            and (since is None or sample.time >= since)
+            and (until is None or sample.time <= until)
+        )
+
+    def values(self, field: str) -> List:
+        if field not in RESOURCE_FIELDS:
+            raise ValueError(f"'field' must be one of {RESOURCE_FIELDS}")
+        return [getattr(sample, field) for sample in self.samples]
+
+    def peak(self, field: str):
+        """Highest value of 'field' in any sample, e.g. peak("rss")"""
+        return max(self.values(field), default=None)
+
+    def growth(self, field: str):
+        """Increase of 'field' from the first to the last sample, summed over
+        processes"""
+        total = 0
+        for pid in self.pids:
+            values = self.filter(pid=pid).values(field)
+            total += values[-1] - values[0]
+        return total
+
+    def is_growing(self, field: str, min_growth=1) -> bool:
+        """Return whether 'field' grew by at least 'min_growth' in any process
+        without ever decreasing in between, the pattern of a leak, e.g.
+        'assert not samples.is_growing("fds")'"""
+        for pid in self.pids:
+            values = self.filter(pid=pid).values(field)
+            if all(a <= b for a, b in zip(values, values[1:])):
+                if values[-1] - values[0] >= min_growth:
+                    return True
+        return False
+
+
+class ResourceSampler:
+    """Samples the resource usage of the processes returned by 'get_pids' every
+    'interval' seconds in a background thread, keeping the last 'max_samples'.
+
+    Each sample reads a few small files from /proc, so the sampled processes
+    are not interrupted.
+    """
+
+    def __init__(
+        self,
+        get_pids: Callable[[], Sequence[int]],
+        interval: float = 0.1,
+        max_samples: int = 100000,
+    ):
+        self.get_pids = get_pids
+        self.interval = interval
+        self._samples: Deque[ResourceSample] = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} interval={self.interval}>"
+
+    def start(self) -> None:
+        if self._thread:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="pytest-asgi-server-resources", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling. The samples taken so far stay available."""
+        if self._thread:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            self.sample()
+            if self._stopped.wait(self.interval):
+                break
+
+    def sample(self) -> List[ResourceSample]:
+        """Sample every process now and return the samples, e.g. to mark the start
+        of a batch of requests"""
+        samples = [read_resources(pid) for pid in self.get_pids()]
+        samples = [sample for sample in samples if sample is not None]
+        with self._lock:
+            self._samples.extend(samples)
+        return samples
+
+    @property
+    def samples(self) -> ResourceSamples:
+        with self._lock:
+            return ResourceSamples(list(self._samples))
+
+    def since(self, samples: Sequence[ResourceSample]) -> ResourceSamples:
+        """Return the samples taken since 'samples' were, including them"""
+        start = min((sample.time for sample in samples), default=None)
+        return self.samples.filter(since=start)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
@@ -0,0 +1,582 @@
+"""Entry point of the PytestUvicornXServer subprocess.
+
+This module is copied to a temporary file and run as a script, so it must not
+import anything from the 'pytest_asgi_server' package.
+
+Usage:
+    runner.py <params>            Run a server.
+    runner.py --zygote <params>   Run a zygote that forks servers on request.
+"""
+
+import array
+import asyncio
+import cProfile
+import gc
+import importlib
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+import weakref
+from collections import Counter, deque
+
+import uvicorn
+
+# Modules imported by 'uvicorn.Config.load()', preloaded by the zygote.
+UVICORN_MODULES = (
+    "uvicorn.lifespan.on",
+    "uvicorn.loops.auto",
+    "uvicorn.loops.asyncio",
+    "uvicorn.protocols.http.auto",
+    "uvicorn.protocols.http.h11_impl",
+    "uvicorn.protocols.websockets.auto",
+    "uvicorn.protocols.websockets.websockets_impl",
+)
+
+
+class Notifier:
+    """Reports server state to the test process over its unix socket"""
+
+    def __init__(self, path=None):
+        self.sock = None
+        if path:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(path)
+
+    def send(self, message: str) -> None:
+        if self.sock:
+            self.sock.sendall(message.encode() + b"\n")
+
+    def close(self) -> None:
+        if self.sock:
+            self.sock.close()
+
+
+def receive_sockets(path: str, max_fds: int = 64):
+    """Connect to the test process' SocketHandoff and return the sockets it sends"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(path)
+        fds = array.array("i")
+        _, ancdata, _, _ = conn.recvmsg(64, socket.CMSG_SPACE(max_fds * fds.itemsize))
+        for level, type_, data in ancdata:
+            if level == socket.SOL_SOCKET and type_ == socket.SCM_RIGHTS:
+                fds.frombytes(data[: len(data) - len(data) % fds.itemsize])
+    return [socket.socket(fileno=fd) for fd in fds]
+
+
+class ControlServer:
+    """Runs commands sent by the test process over a unix socket at 'path'.
+
+    Each request is a JSON object on one line with the command name in "cmd". The
+    handler registered for it is called with the other keys in the control thread
+    and its return value is sent back as a JSON line, or {"error": ...} if it
+    raised.
+    """
+
+    thread_name = "pytest-asgi-server-control"
+
+    def __init__(self, path: str):
+        self.handlers = {}
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(path)
+        self.listener.listen(16)
+        self.thread = threading.Thread(
+            target=self.run, name=self.thread_name, daemon=True
+        )
+        self.thread.start()
+
+    def register(self, cmd: str, handler) -> None:
+        self.handlers[cmd] = handler
+
+    def run(self) -> None:
+        while True:
+            conn, _ = self.listener.accept()
+            with conn, conn.makefile("rwb") as f:
+                for line in f:
+                    f.write(json.dumps(self.handle(json.loads(line))).encode())
+                    f.write(b"\n")
+                    f.flush()
+
+    def handle(self, request: dict) -> dict:
+        handler = self.handlers.get(request.pop("cmd", None))
+        if handler is None:
+            return {"error": "unknown command"}
+        try:
+            return handler(**request) or {}
+        except Exception as exc:
+            return {"error": f"{type(exc).__name__}: {exc}"}
+
+
+def run_in_loop(loop, func, timeout: float = 30.0):
+    """Call 'func' in the thread running 'loop' and return its result"""
+
+    async def call():
+        return func()
+
+    return asyncio.run_coroutine_threadsafe(call(), loop).result(timeout)
+
+
+class SamplingProfiler:
+    """Samples the stacks of all server threads every 'interval' seconds and
+    dumps them in collapsed stack format, the input of flamegraph tools."""
+
+    thread_name = "pytest-asgi-server-profiler"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self.lock = threading.Lock()
+
+    def start(self, loop) -> None:
+        threading.Thread(target=self.run, name=self.thread_name, daemon=True).start()
+
+    def run(self) -> None:
+        ignored = (self.thread_name, ControlServer.thread_name)
+        while True:
+            time.sleep(self.interval)
+            names = {t.ident: t.name for t in threading.enumerate()}
+            samples = []
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, str(ident))
+                if name in ignored:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+                    )
+                    frame = frame.f_back
+                samples.append(";".join([name, *reversed(stack)]))
+            with self.lock:
+                self.stacks.update(samples)
+
+    def dump(self, path: str) -> dict:
+        with self.lock:
+            stacks, self.stacks = self.stacks, Counter()
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return {"path": path, "samples": sum(stacks.values())}
+
+
+class DeterministicProfiler:
+    """Profiles the event loop thread with cProfile and dumps pstats files"""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.loop = None
+
+    def start(self, loop) -> None:
+        """Start profiling. Must be called in the thread running 'loop'."""
+        self.loop = loop
+        self.profile.enable()
+
+    def dump(self, path: str) -> dict:
+        def swap():
+            profile, self.profile = self.profile, cProfile.Profile()
+            profile.disable()
+            self.profile.enable()
+            return profile
+
+        run_in_loop(self.loop, swap).dump_stats(path)
+        return {"path": path}
+
+
+def get_profiler(params: dict):
+    if params["mode"] == "sample":
+        return SamplingProfiler(params.get("interval", 0.005))
+    elif params["mode"] == "cprofile":
+        return DeterministicProfiler()
+    raise ValueError(f"Unknown profile mode: {params['mode']!r}")
+
+
+class MemoryTracer:
+    """Traces memory allocations with tracemalloc, storing up to 'frames' frames
+    per allocation, and compares named snapshots taken on command."""
+
+    # Allocations made by tracing itself and by the import machinery
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ]
+    fields = ("traceback", "size_diff", "size", "count_diff", "count")
+
+    def __init__(self, frames: int = 1):
+        self.snapshots = {}
+        tracemalloc.start(frames)
+
+    def snapshot(self, name: str, collect: bool = True) -> dict:
+        """Take a snapshot named 'name', after a garbage collection if 'collect'"""
+        if collect:
+            gc.collect()
+        snapshot = tracemalloc.take_snapshot().filter_traces(self.filters)
+        self.snapshots[name] = snapshot
+        stats = snapshot.statistics("filename")
+        return {
+            "name": name,
+            "size": sum(stat.size for stat in stats),
+            "count": sum(stat.count for stat in stats),
+        }
+
+    def compare(
+        self, old: str, new: str, limit: int = 10, key_type: str = "lineno"
+    ) -> dict:
+        """Return the 'limit' allocation sites that grew the most from snapshot
+        'old' to snapshot 'new'"""
+        diff = self.snapshots[new].compare_to(self.snapshots[old], key_type)
+        growing = [stat for stat in diff if stat.size_diff > 0][:limit]
+        return {
+            "fields": self.fields,
+            "stats": [
+                (
+                    [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                    stat.size_diff,
+                    stat.size,
+                    stat.count_diff,
+                    stat.count,
+                )
+                for stat in growing
+            ],
+            "size_diff": sum(stat.size_diff for stat in diff),
+            "count_diff": sum(stat.count_diff for stat in diff),
+        }
+
+    def clear(self) -> None:
+        self.snapshots.clear()
+
+
+_task_created_at = weakref.WeakKeyDictionary()
+
+
+def install_task_timestamps(loop) -> None:
+    """Record the creation time of every task created on 'loop'"""
+    parent_factory = loop.get_task_factory()
+
+    def task_factory(loop, coro, **kwargs):
+        if parent_factory is None:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        else:
+            task = parent_factory(loop, coro, **kwargs)
+        _task_created_at[task] = time.perf_counter()
+        return task
+
+    loop.set_task_factory(task_factory)
+
+
+class TimingMiddleware:
+    """ASGI middleware that records the requests handled by 'app' in a ring buffer
+    of the last 'size' requests.
+
+    Each record is a list of the scope type, method, path, response status,
+    queueing time (from the creation of the task handling the request until the
+    app was called, if 'install_task_timestamps()' was called for the loop),
+    handler time and bytes sent in response bodies and websocket messages.
+    """
+
+    fields = ("type", "method", "path", "status", "queued", "handler", "bytes_sent")
+
+    def __init__(self, app, size: int = 10000):
+        self.app = app
+        self.records = deque(maxlen=size)
+        self.total = 0
+        self.lock = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        started_at = time.perf_counter()
+        created_at = _task_created_at.get(asyncio.current_task())
+        record = [
+            scope["type"],
+            scope.get("method"),
+            scope.get("path"),
+            None,
+            None if created_at is None else started_at - created_at,
+            None,
+            0,
+        ]
+
+        async def timed_send(message):
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                record[3] = message["status"]
+            elif message_type == "http.response.body":
+                record[6] += len(message.get("body", b""))
+            elif message_type == "websocket.accept":
+                record[3] = 101
+            elif message_type == "websocket.send":
+                data = message.get("bytes")
+                if data is None:
+                    data = (message.get("text") or "").encode()
+                record[6] += len(data)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            record[5] = time.perf_counter() - started_at
+            with self.lock:
+                self.records.append(record)
+                self.total += 1
+
+    def get_metrics(self) -> dict:
+        with self.lock:
+            records, total = list(self.records), self.total
+        return {"fields": self.fields, "records": records, "total": total}
+
+    def reset_metrics(self) -> dict:
+        with self.lock:
+            self.records.clear()
+            self.total = 0
+        return {}
+
+
+class Server(uvicorn.Server):
+    def __init__(self, config, notifier: Notifier, profiler=None, metrics=False):
+        super().__init__(config)
+        self.notifier = notifier
+        self.profiler = profiler
+        self.metrics = metrics
+        self.loop = None
+
+    async def startup(self, sockets=None):
+        self.loop = asyncio.get_running_loop()
+        if self.metrics:
+            install_task_timestamps(self.loop)
+        if self.profiler:
+            self.profiler.start(self.loop)
+        started_at = time.perf_counter()
+        try:
+            await super().startup(sockets=sockets)
+        except BaseException:
+            self.notifier.send("failed")
+            raise
+        self.notifier.send(f"startup {time.perf_counter() - started_at:.6f}")
+        if sockets and not self.should_exit:
+            # uvicorn only logs the address when it binds the socket itself
+            logger = logging.getLogger("uvicorn.error")
+            address = sockets[0].getsockname()
+            if sockets[0].family == socket.AF_UNIX:
+                logger.info(
+                    "Uvicorn running on unix socket %s (Press CTRL+C to quit)",
+                    address,
+                )
+            else:
+                logger.info(
+                    "Uvicorn running on %s://%s:%d (Press CTRL+C to quit)",
+                    "https" if self.config.ssl else "http",
+                    *address[:2],
+                )
+        self.notifier.send("failed" if self.should_exit else "ready")
+
+
+# Server params handled by the test process, which binds the listening sockets
+SOCKET_PARAM_KEYS = ("app", "host", "port", "uds", "backlog")
+
+
+class LifespanNotifier:
+    """ASGI middleware that calls 'callback' with True once 'app' completed its
+    lifespan startup or with False if the startup failed. Apps that don't support
+    the lifespan protocol count as started."""
+
+    def __init__(self, app, callback):
+        self.app = app
+        self.callback = callback
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "lifespan":
+            return await self.app(scope, receive, send)
+        notified = False
+
+        async def notify_send(message):
+            nonlocal notified
+            if not notified and message["type"].startswith("lifespan.startup."):
+                notified = True
+                self.callback(message["type"] == "lifespan.startup.complete")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, notify_send)
+        finally:
+            if not notified:
+                self.callback(True)
+
+
+def get_hypercorn_config(kwargs: dict, sockets):
+    """Return a Hypercorn config serving on duplicates of 'sockets'"""
+    from hypercorn.config import Config
+
+    config = Config()
+    for key, value in kwargs.items():
+        if key not in SOCKET_PARAM_KEYS:
+            setattr(config, key, value)
+    config.bind = [f"fd://{os.dup(sock.fileno())}" for sock in sockets]
+    return config
+
+
+def serve_uvicorn(app, params: dict, sockets, notifier, profiler, metrics) -> None:
+    config = uvicorn.Config(app, **params["kwargs"])
+    server = Server(config, notifier=notifier, profiler=profiler, metrics=metrics)
+    server.run(sockets=sockets)
+
+
+def serve_hypercorn(app, params: dict, sockets, notifier, profiler, metrics) -> None:
+    from hypercorn.asyncio import serve as hypercorn_serve
+
+    def on_startup(started: bool) -> None:
+        if started:
+            notifier.send(f"startup {time.perf_counter() - started_at:.6f}")
+        notifier.send("ready" if started else "failed")
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        if metrics:
+            install_task_timestamps(loop)
+        if profiler:
+            profiler.start(loop)
+        config = get_hypercorn_config(params["kwargs"], sockets)
+        await hypercorn_serve(LifespanNotifier(app, on_startup), config)
+
+    started_at = time.perf_counter()
+    asyncio.run(main())
+
+
+def serve_daphne(app, params: dict, sockets, notifier, profiler, metrics) -> None:
+    from daphne.server import Server as DaphneServer
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+    def on_ready() -> None:
+        # Called in the reactor thread, once the asyncio reactor's loop is set
+        loop = asyncio.get_event_loop()
+        if metrics:
+            install_task_timestamps(loop)
+        if profiler:
+            profiler.start(loop)
+        notifier.send(f"startup {time.perf_counter() - started_at:.6f}")
+        notifier.send("ready")
+
+    started_at = time.perf_counter()
+    # Twisted only adopts listening sockets of the default AF_INET family
+    # when given as an endpoint string
+    if any(sock.family != socket.AF_INET for sock in sockets):
+        raise ValueError("Daphne can only serve on IPv4 TCP sockets")
+    endpoints = [f"fd:fileno={os.dup(sock.fileno())}" for sock in sockets]
+    kwargs = {k: v for k, v in params["kwargs"].items() if k not in SOCKET_PARAM_KEYS}
+    server = DaphneServer(app, endpoints=endpoints, ready_callable=on_ready, **kwargs)
+    server.run()
+
+
+BACKENDS = {
+    "uvicorn": serve_uvicorn,
+    "hypercorn": serve_hypercorn,
+    "daphne": serve_daphne,
+}
+
+
+def serve(params: dict) -> None:
+    os.chdir(params["rootdir"])
+    notifier = Notifier(params.get("ready_path"))
+    sockets = None
+    if params.get("sockets_path"):
+        sockets = receive_sockets(params["sockets_path"])
+    control = None
+    if params.get("control_path"):
+        control = ControlServer(params["control_path"])
+    if params.get("tracemalloc"):
+        tracer = MemoryTracer(params["tracemalloc"]["frames"])
+        control.register("tracemalloc_snapshot", tracer.snapshot)
+        control.register("tracemalloc_compare", tracer.compare)
+        control.register("tracemalloc_clear", tracer.clear)
+    profiler = None
+    if params.get("profile"):
+        profiler = get_profiler(params["profile"])
+        control.register("profile_dump", profiler.dump)
+    app = uvicorn.importer.import_from_string(params["appstr"])
+    if params.get("metrics"):
+        app = TimingMiddleware(app, size=params["metrics"]["size"])
+        control.register("metrics", app.get_metrics)
+        control.register("metrics_reset", app.reset_metrics)
+    backend = BACKENDS[params.get("backend", "uvicorn")]
+    backend(app, params, sockets, notifier, profiler, bool(params.get("metrics")))
+
+
+def preload(modules) -> None:
+    for module in modules:
+        try:
+            if ":" in module:
+                uvicorn.importer.import_from_string(module)
+            else:
+                importlib.import_module(module)
+        except ImportError:
+            traceback.print_exc()
+
+
+def fork_server(request: dict) -> None:
+    """Run 'main()' with the request argv in the forked child. Never returns."""
+    code = 1
+    try:
+        fd = os.open(request["logpath"], os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+        os.dup2(fd, 1)
+        os.dup2(fd, 2)
+        os.close(fd)
+        os.environ.clear()
+        os.environ.update(request["env"])
+        for path in reversed(request["env"].get("PYTHONPATH", "").split(":")):
+            if path and path not in sys.path:
+                sys.path.insert(0, path)
+        main(request["argv"])
+        code = 0
+    except SystemExit as exc:
+        code = exc.code if isinstance(exc.code, int) else 1
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def zygote(params: dict) -> None:
+    os.chdir(params["rootdir"])
+    preload(UVICORN_MODULES)
+    preload(params["preload"])
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # Reap forked servers
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(params["control_path"])
+    listener.listen(16)
+    notifier = Notifier(params.get("ready_path"))
+    notifier.send("ready")
+    notifier.close()
+    while True:
+        conn, _ = listener.accept()
+        with conn:
+            request = json.loads(conn.makefile().readline())
+            pid = os.fork()
+            if pid == 0:
+                listener.close()
+                conn.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                fork_server(request)
+            conn.sendall(json.dumps({"pid": pid}).encode() + b"\n")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[0] == "--zygote":
+        zygote(json.loads(argv[1]))
+    else:
+        serve(json.loads(argv[0]))
+
+
+if __name__ == "__main__":
+    main()
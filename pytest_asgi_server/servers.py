@@ -1,21 +1,57 @@
 # from __future__ import annotations
 
-import inspect
+import asyncio
+import errno
+import functools
 import json
 import logging
 import os
+import shutil
+import socket
 import sys
 import tempfile
 import threading
 import time
 import warnings
-from typing import Any, Dict, Optional, Sequence
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
 
-import uvicorn
 from xprocess import ProcessStarter, XProcess
 
-from .errors import AddressAlreadyInUseException, AddressAlreadyInUseWarning
-from .utils import get_unused_tcp_port, is_port_in_use
+from .backends import ServerBackend, get_backend
+from .errors import (
+    AddressAlreadyInUseException,
+    AddressAlreadyInUseWarning,
+    ServerStartupError,
+)
+from .logs import LogTail, activate_log, deactivate_log
+from .memory import MemoryDiff
+from .metrics import ServerMetrics
+from .profiling import (
+    PROFILE_MODES,
+    ServerProfile,
+    activate_profile,
+    deactivate_profile,
+)
+from .readiness import (
+    EventProbe,
+    HTTPProbe,
+    LifespanProbe,
+    ReadinessProbe,
+    TCPProbe,
+    UnixProbe,
+    wait_until_ready,
+)
+from .resources import ResourceSampler
+from .runner import TimingMiddleware
+from .timings import ServerTimings, start_timings
+from .utils import (
+    SocketHandoff,
+    bind_socket,
+    bind_unix_socket,
+    is_port_in_use,
+    send_control,
+)
 
 log = logging.getLogger(__name__)
 
@@ -29,14 +65,27 @@ class PytestXProcessWrapper:
         args: Sequence[str],
         env: dict,
         name="test-server-process",
+        ready_timeout: float = 10.0,
     ):
         self.xprocess = xprocess
         self.name = name
         self.pattern = pattern
         self.args = args
         self.env = env
+        self.ready_timeout = ready_timeout
+        self.spawned_at: Optional[float] = None
 
-    def start(self) -> None:
+    def start(
+        self,
+        probe: Optional[ReadinessProbe] = None,
+        handoff: Optional[SocketHandoff] = None,
+    ) -> None:
+        """Start the process and block until it is ready.
+
+        Readiness is checked with 'probe' if given, otherwise by matching 'pattern'
+        in the process log. If 'handoff' is given, its sockets are sent to the
+        process first.
+        """
         if self.is_alive():
             raise RuntimeError(
                 f"'start()' was called while {self.__class__.__name__} is",
@@ -49,10 +98,24 @@ class PytestXProcessWrapper:
                 args = self.args
                 env = self.env
 
-            self.xprocess.ensure(self.name, Starter)
-            self.xprocess_info = self.xprocess.getinfo(self.name)
-        if not self.is_alive():  # Use looping check and timeout
-            time.sleep(0.1)
+                def wait(starter, log_file) -> bool:
+                    self.spawned_at = time.perf_counter()
+                    info = starter.process.getinfo(self.name)
+                    if handoff is not None:
+                        handoff.serve(
+                            timeout=self.ready_timeout, is_alive=info.isrunning
+                        )
+                    if probe is None:
+                        return super().wait(log_file)
+                    wait_until_ready(
+                        probe, timeout=self.ready_timeout, is_alive=info.isrunning
+                    )
+                    return True
+
+            try:
+                self.xprocess.ensure(self.name, Starter)
+            finally:
+                self.xprocess_info = self.xprocess.getinfo(self.name)
 
     def stop(self) -> None:
         if hasattr(self, "xprocess_info"):
@@ -66,13 +129,54 @@ class PytestXProcessWrapper:
             return False
 
 
+Readiness = Union[str, Callable[["BaseUvicornTestServerFacade"], ReadinessProbe]]
+
+
 class BaseUvicornTestServerFacade:
-    def __init__(self, **kwargs) -> None:
+    """Common interface of the test servers.
+
+    'readiness' selects how 'start()' decides the server is ready: "lifespan" waits
+    for the server to report that startup is complete, "tcp" for a successful
+    connection, "http" for a non-5xx response from 'readiness_path'. A callable
+    taking the server and returning a ReadinessProbe may be passed instead.
+
+    'uds=True' serves on a unix socket at a new path in a temporary directory
+    instead of TCP. The path is available from the 'uds' property once started.
+
+    'backend' names the server the app runs on: "uvicorn", "hypercorn" or
+    "daphne". kwargs are validated against the config of that server.
+
+    With 'resources=True' the RSS, CPU time, open file descriptors and threads of
+    the server processes are sampled every 'resources_interval' seconds while the
+    server runs. The samples are available from 'resources.samples'.
+    """
+
+    def __init__(
+        self,
+        *,
+        backend: Union[str, ServerBackend] = "uvicorn",
+        readiness: Readiness = "lifespan",
+        readiness_path: str = "/",
+        ready_timeout: float = 10.0,
+        resources: bool = False,
+        resources_interval: float = 0.1,
+        **kwargs,
+    ) -> None:
+        self.readiness = readiness
+        self.readiness_path = readiness_path
+        self.ready_timeout = ready_timeout
+        self.timings: Optional[ServerTimings] = None
+        self.resources: Optional[ResourceSampler] = (
+            ResourceSampler(lambda: self.pids, interval=resources_interval)
+            if resources
+            else None
+        )
+        self.backend = get_backend(backend)
+        self.backend.check_available()
         self.kwargs: dict = {
-            "loop": "asyncio",
             "host": "127.0.0.1",
-            "port": get_unused_tcp_port(),
-            "lifespan": "on",
+            "port": 0,
+            **self.backend.default_kwargs,
         }
         self._update_kwargs(**kwargs)
 
@@ -87,8 +191,15 @@ class BaseUvicornTestServerFacade:
     def __exit__(self, *args) -> None:
         self.stop()
 
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _get_config_param_keys(
+        backend: Union[str, ServerBackend] = "uvicorn",
+    ) -> Sequence[str]:
+        return get_backend(backend).get_config_param_keys()
+
     def _update_kwargs(self, **kwargs) -> None:
-        config_param_keys = tuple(inspect.signature(uvicorn.Config).parameters.keys())
+        config_param_keys = self._get_config_param_keys(self.backend)
         for key, value in kwargs.items():
             if key in config_param_keys:
                 self._update_config_param(key, value)
@@ -96,12 +207,13 @@ class BaseUvicornTestServerFacade:
                 raise TypeError(
                     f"{self.__class__} got an unexpected keyword argument '{key}'.",
                     f"{self.__class__} accepts the same kwargs",
-                    "as {uvicorn.Config.__class__}.",
+                    f"as the config of the {self.backend.name!r} server backend.",
                 )
 
     def _update_config_param(self, key, value) -> None:
-        if key == "lifespan":
-            value = "off" if value is False else "on" if value is True else value
+        value = self.backend.normalize_param(key, value)
+        if key == "uds":
+            self._uds_tmpdir = None if value is True else False
         self.kwargs[key] = value
 
     def check_address_in_use(self) -> None:
@@ -110,15 +222,86 @@ class BaseUvicornTestServerFacade:
         if is_port_in_use(host=host, port=port):
             raise AddressAlreadyInUseException(host=host, port=port)
 
+    def bind_socket(self, reuse_port: bool = False) -> socket.socket:
+        """Bind the listening socket that is handed to the server.
+
+        If 'port' is 0 it is updated with the port picked by the OS.
+        """
+        host = self.kwargs["host"]
+        port = self.kwargs["port"]
+        backlog = self.kwargs.get("backlog", 2048)
+        if self.kwargs.get("uds"):
+            if getattr(self, "_uds_tmpdir", False) is None:
+                self._uds_tmpdir = tempfile.mkdtemp(prefix="pytest-asgi-server-")
+                self.kwargs["uds"] = os.path.join(self._uds_tmpdir, "server.sock")
+            try:
+                return bind_unix_socket(self.kwargs["uds"], backlog=backlog)
+            except OSError as err:
+                if err.errno == errno.EADDRINUSE:
+                    raise AddressAlreadyInUseException(
+                        f"Address already in use: {self.kwargs['uds']}",
+                        host=self.kwargs["uds"],
+                        port=port,
+                    ) from err
+                raise
+        try:
+            sock = bind_socket(host, port, backlog=backlog, reuse_port=reuse_port)
+        except OSError as err:
+            if err.errno == errno.EADDRINUSE:
+                raise AddressAlreadyInUseException(host=host, port=port) from err
+            raise
+        self.kwargs["port"] = sock.getsockname()[1]
+        return sock
+
+    def _remove_uds(self) -> None:
+        if getattr(self, "_uds_tmpdir", None):
+            shutil.rmtree(self._uds_tmpdir, ignore_errors=True)
+            self._uds_tmpdir = None
+            self.kwargs["uds"] = True
+
+    def get_readiness_probe(self) -> Optional[ReadinessProbe]:
+        if callable(self.readiness):
+            return self.readiness(self)
+        elif self.readiness == "tcp":
+            return UnixProbe(self.uds) if self.uds else TCPProbe(self.host, self.port)
+        elif self.readiness == "http":
+            scheme = "https://" if self.is_ssl else "http://"
+            return HTTPProbe(
+                self._get_base_url(scheme) + self.readiness_path, uds=self.uds
+            )
+        else:
+            raise ValueError(f"Unknown readiness probe: {self.readiness!r}")
+
     def start(self) -> None:
-        self.check_address_in_use()
+        self.socket = self.bind_socket()
 
     def stop(self) -> None:
         raise NotImplementedError
 
+    def _start_resources(self) -> None:
+        if self.resources:
+            self.resources.start()
+
+    def _stop_resources(self) -> None:
+        if self.resources:
+            self.resources.stop()
+
+    async def astart(self) -> None:
+        """Same as 'start()', but waits for the server in a worker thread so the
+        running event loop is not blocked."""
+        await asyncio.get_running_loop().run_in_executor(None, self.start)
+
+    async def astop(self) -> None:
+        """Same as 'stop()', without blocking the running event loop"""
+        await asyncio.get_running_loop().run_in_executor(None, self.stop)
+
     def is_alive(self) -> bool:
         raise NotImplementedError
 
+    @property
+    def pids(self) -> List[int]:
+        raise NotImplementedError
+
     @property
     def host(self) -> str:
         return self.kwargs["host"]
@@ -127,59 +310,67 @@ class BaseUvicornTestServerFacade:
     def port(self) -> int:
         return self.kwargs["port"]
 
+    @property
+    def uds(self) -> Optional[str]:
+        uds = self.kwargs.get("uds")
+        return uds if isinstance(uds, str) else None
+
     @property
     def is_ssl(self) -> bool:
-        keyfile = self.kwargs.get("ssl_keyfile")
-        certfile = self.kwargs.get("ssl_certfile")
-        return bool(keyfile or certfile)
+        return any(self.kwargs.get(key) for key in self.backend.ssl_kwargs)
+
+    def _get_base_url(self, scheme: str) -> str:
+        if self.uds:
+            return f"{scheme}localhost"
+        host = self.kwargs["host"]
+        port = self.kwargs["port"]
+        return f"{scheme}{host}:{port}"
 
     @property
     def ws_base_url(self) -> Optional[str]:
         if self.is_alive():
-            scheme = "wss://" if self.is_ssl else "ws://"
-            host = self.kwargs["host"]
-            port = self.kwargs["port"]
-            return f"{scheme}{host}:{port}"
+            return self._get_base_url("wss://" if self.is_ssl else "ws://")
         else:
             return None
 
     @property
     def http_base_url(self) -> Optional[str]:
         if self.is_alive():
-            scheme = "https://" if self.is_ssl else "http://"
-            host = self.kwargs["host"]
-            port = self.kwargs["port"]
-            return f"{scheme}{host}:{port}"
+            return self._get_base_url("https://" if self.is_ssl else "http://")
         else:
             return None
 
 
 class PytestUvicornXServer(BaseUvicornTestServerFacade):
-    """'appstr' must be in format '<module>:<attribute>'"""
+    """'appstr' must be in format '<module>:<attribute>'
 
-    pattern = "Uvicorn running on *"
-    run_script = """
-import asyncio
-import json
-import sys
-import os
+    If 'zygote' is a running UvicornZygote, the server process is forked from it
+    instead of spawned as a new interpreter.
 
-import uvicorn
+    'replicas' server processes are run on the same address and managed as one
+    server. They share one listening socket, or with 'reuse_port=True' each gets
+    its own socket bound with SO_REUSEPORT so the kernel balances connections
+    between them. Only the "lifespan" and "log" readiness checks wait for every
+    replica; the others are satisfied by the first one that answers.
 
+    With 'profile' set to "sample" (a stack sampler running every
+    'profile_interval' seconds) or "cprofile", the server process profiles
+    itself. The profile is written to the 'profiles' directory next to the
+    process log, in one file per test, when the server stops or the test ends.
 
-def main():
-    params = json.loads(sys.argv[1])
-    os.chdir(params["rootdir"])
-    app = uvicorn.importer.import_from_string(params["appstr"])
-    config = uvicorn.Config(app, **params["kwargs"])
-    server = uvicorn.Server(config)
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(server.serve())
+    With 'metrics=True' the app is wrapped in a middleware that records the last
+    'metrics_size' requests handled by each replica, see 'metrics()'.
 
+    The last 'log_lines' lines of each process log are kept in 'logs' while the
+    server runs. Log files larger than 'log_max_bytes' are rotated.
 
-if __name__ == "__main__":
-    main()
-"""
+    With 'tracemalloc=True' the server processes trace their memory allocations,
+    keeping 'tracemalloc_frames' frames each, so allocation sites that grow
+    between two snapshots can be found without restarting the server, see
+    'take_snapshot()' and 'compare_snapshots()'.
+    """
+
+    run_script = Path(__file__).with_name("runner.py").read_text()
 
     def __init__(
         self,
@@ -190,8 +381,23 @@ if __name__ == "__main__":
         name: str = None,
         env: Dict[str, Any] = {},
         raise_if_used_port: bool = True,
+        zygote=None,
+        replicas: int = 1,
+        reuse_port: bool = False,
+        profile: Optional[str] = None,
+        profile_interval: float = 0.005,
+        metrics: bool = False,
+        metrics_size: int = 10000,
+        tracemalloc: bool = False,
+        tracemalloc_frames: int = 1,
+        log_lines: int = 1000,
+        log_max_bytes: Optional[int] = 10 * 2**20,
         **kwargs,
     ):
+        if replicas < 1:
+            raise ValueError(f"'replicas' must be at least 1, not {replicas}")
+        if profile is not None and profile not in PROFILE_MODES:
+            raise ValueError(f"'profile' must be one of {PROFILE_MODES}")
         super().__init__(**kwargs)
         self.xprocess = xprocess
         self.appstr = appstr
@@ -200,13 +406,40 @@ if __name__ == "__main__":
         self.raise_if_used_port = raise_if_used_port
         self.pytest_rootdir = os.path.abspath(pytestconfig.rootdir)
         self.script_path = tempfile.mkstemp()[1]
-        self.server_process = PytestXProcessWrapper(
-            xprocess=self.xprocess,
-            name=self.name,
-            pattern=self.pattern,
-            args=self._get_process_args(),
-            env=self._get_process_env(),
-        )
+        self.zygote = zygote
+        self.replicas = replicas
+        self.reuse_port = reuse_port
+        self.profile = profile
+        self.profile_interval = profile_interval
+        self.profiles: List[ServerProfile] = []
+        self.metrics_enabled = metrics
+        self.metrics_size = metrics_size
+        self.tracemalloc_enabled = tracemalloc
+        self.tracemalloc_frames = tracemalloc_frames
+        self.log_lines = log_lines
+        self.log_max_bytes = log_max_bytes
+        self.logs: List[LogTail] = []
+        self.control_dir: Optional[str] = None
+        process_wrapper = zygote.process_wrapper if zygote else PytestXProcessWrapper
+        self.server_processes = [
+            process_wrapper(
+                xprocess=self.xprocess,
+                name=self.name if n == 0 else f"{self.name}-replica{n}",
+                pattern=self.backend.pattern,
+                args=self._get_process_args(),
+                env=self._get_process_env(),
+                ready_timeout=self.ready_timeout,
+            )
+            for n in range(replicas)
+        ]
+
+    def bind_socket(self, reuse_port: bool = False) -> socket.socket:
+        return super().bind_socket(reuse_port=reuse_port or self.reuse_port)
+
+    @property
+    def server_process(self) -> PytestXProcessWrapper:
+        """Process of the first replica"""
+        return self.server_processes[0]
 
     def _get_process_env(self) -> dict:
         pypath = set(self.env.setdefault("PYTHONPATH", "").split(":"))
@@ -215,14 +448,30 @@ if __name__ == "__main__":
         self.env["PYTHONPATH"] = ":".join(pypath)
         return self.env
 
-    def _get_process_args(self) -> Sequence[str]:
-        port = get_unused_tcp_port()
-        self.kwargs.setdefault("port", port)
+    def _get_process_args(
+        self,
+        ready_path: Optional[str] = None,
+        sockets_path: Optional[str] = None,
+        control_path: Optional[str] = None,
+    ) -> Sequence[str]:
         script_params = {
             "appstr": self.appstr,
+            "backend": self.backend.name,
             "rootdir": self.pytest_rootdir,
             "kwargs": self.kwargs,
+            "ready_path": ready_path,
+            "sockets_path": sockets_path,
+            "control_path": control_path,
         }
+        if self.profile:
+            script_params["profile"] = {
+                "mode": self.profile,
+                "interval": self.profile_interval,
+            }
+        if self.metrics_enabled:
+            script_params["metrics"] = {"size": self.metrics_size}
+        if self.tracemalloc_enabled:
+            script_params["tracemalloc"] = {"frames": self.tracemalloc_frames}
         return [
             sys.executable,
             self.script_path,
@@ -230,8 +479,12 @@ if __name__ == "__main__":
         ]
 
     def start(self) -> None:
+        started_at = time.perf_counter()
         try:
             super().start()
+            sockets = [[self.socket] for _ in self.server_processes]
+            if self.reuse_port and not self.uds:
+                sockets[1:] = [[self.bind_socket()] for _ in sockets[1:]]
         except AddressAlreadyInUseException as err:
             if self.raise_if_used_port:
                 raise err
@@ -242,18 +495,175 @@ if __name__ == "__main__":
                     )
                 )
         else:
-            if not self.server_process.is_alive():
+            if not self.is_alive():
                 with open(self.script_path, "w") as f:
                     f.write(self.run_script)
-            self.server_process.start()
+            self.timings = start_timings(self.appstr, "xserver")
+            self.control_dir = tempfile.mkdtemp(prefix="pytest-asgi-server-")
+            try:
+                for server_process, replica_sockets in zip(
+                    self.server_processes, sockets
+                ):
+                    startup = self._start_process(server_process, replica_sockets)
+                    if startup is not None:
+                        self.timings.startup = max(self.timings.startup or 0, startup)
+                spawned_at = self.server_process.spawned_at
+                if spawned_at is not None:
+                    self.timings.spawn = spawned_at - started_at
+                self.timings.ready = time.perf_counter() - started_at
+                self._start_resources()
+            except Exception:
+                for server_process in self.server_processes:
+                    server_process.stop()
+                self._close_control()
+                raise
+            finally:
+                for sock in {sock for socks in sockets for sock in socks}:
+                    sock.close()
+
+    def _start_process(
+        self, server_process: PytestXProcessWrapper, sockets: Sequence[socket.socket]
+    ) -> Optional[float]:
+        """Start 'server_process' and return its startup duration, if reported"""
+        log_tail = LogTail(
+            self.xprocess.getinfo(server_process.name).logpath,
+            name=server_process.name,
+            max_lines=self.log_lines,
+            max_bytes=self.log_max_bytes,
+        )
+        log_tail.rotate()
+        self.logs.append(log_tail)
+        activate_log(log_tail)
+        probe = self.get_readiness_probe()
+        handoff = SocketHandoff(sockets)
+        server_process.args = self._get_process_args(
+            ready_path=getattr(probe, "path", None),
+            sockets_path=handoff.path,
+            control_path=self.get_control_path(server_process),
+        )
+        try:
+            server_process.start(probe=probe, handoff=handoff)
+        finally:
+            handoff.close()
+            if probe:
+                probe.close()
+        if self.profile:
+            n = self.server_processes.index(server_process)
+            profile = ServerProfile(
+                control_path=self.get_control_path(server_process),
+                mode=self.profile,
+                output_dir=str(server_process.xprocess_info.controldir / "profiles"),
+                suffix=f"-replica{n}" if n else "",
+            )
+            self.profiles.append(profile)
+            activate_profile(profile)
+        return getattr(probe, "startup_duration", None)
+
+    def get_control_path(self, server_process: PytestXProcessWrapper) -> str:
+        """Path of the control socket of 'server_process'"""
+        n = self.server_processes.index(server_process)
+        return os.path.join(self.control_dir, f"control{n}.sock")
+
+    def dump_profiles(self) -> List[str]:
+        """Write the profiles collected since the last dump, see 'profile'"""
+        paths = [profile.dump() for profile in self.profiles if self.is_alive()]
+        return [path for path in paths if path]
+
+    def _send_control_all(self, option: str, cmd: str, **kwargs) -> List[dict]:
+        if not getattr(self, f"{option}_enabled"):
+            raise RuntimeError(
+                f"{self.__class__.__name__} was not started with '{option}=True'"
+            )
+        if not self.is_alive():
+            raise RuntimeError(f"{self.__class__.__name__} is not running")
+        return [
+            send_control(self.get_control_path(server_process), cmd, **kwargs)
+            for server_process in self.server_processes
+        ]
+
+    def metrics(self) -> ServerMetrics:
+        """Return the requests recorded by all replicas, see 'metrics'"""
+        return ServerMetrics.from_responses(
+            self._send_control_all("metrics", "metrics")
+        )
+
+    def reset_metrics(self) -> None:
+        self._send_control_all("metrics", "metrics_reset")
+
+    def take_snapshot(self, name: str, collect: bool = True) -> None:
+        """Take a tracemalloc snapshot named 'name' in every replica, after a
+        garbage collection if 'collect'. A previous snapshot with the same name is
+        replaced."""
+        self._send_control_all(
+            "tracemalloc", "tracemalloc_snapshot", name=name, collect=collect
+        )
+
+    def compare_snapshots(
+        self, old: str, new: str, limit: int = 10, key_type: str = "lineno"
+    ) -> MemoryDiff:
+        """Return the 'limit' allocation sites of each replica that grew the most
+        from snapshot 'old' to snapshot 'new'. 'key_type' groups allocations by
+        "lineno", "filename" or "traceback", as in 'tracemalloc.Snapshot'."""
+        return MemoryDiff.from_responses(
+            self._send_control_all(
+                "tracemalloc",
+                "tracemalloc_compare",
+                old=old,
+                new=new,
+                limit=limit,
+                key_type=key_type,
+            )
+        )
+
+    def clear_snapshots(self) -> None:
+        self._send_control_all("tracemalloc", "tracemalloc_clear")
+
+    def get_readiness_probe(self) -> Optional[ReadinessProbe]:
+        if self.readiness == "lifespan":
+            return LifespanProbe()
+        elif self.readiness == "log":
+            return None
+        else:
+            return super().get_readiness_probe()
+
+    def _close_control(self) -> None:
+        for profile in self.profiles:
+            deactivate_profile(profile)
+        self.profiles.clear()
+        for log_tail in self.logs:
+            deactivate_log(log_tail)
+        self.logs.clear()
+        if self.control_dir:
+            shutil.rmtree(self.control_dir, ignore_errors=True)
+            self.control_dir = None
 
     def stop(self) -> None:
-        self.server_process.stop()
+        self.dump_profiles()
+        self._stop_resources()
+        stopped_at = time.perf_counter()
+        was_alive = any(p.is_alive() for p in self.server_processes)
+        for server_process in self.server_processes:
+            server_process.stop()
+        self._close_control()
+        if was_alive and self.timings and self.timings.shutdown is None:
+            self.timings.shutdown = time.perf_counter() - stopped_at
         if os.path.exists(self.script_path):
             os.remove(self.script_path)
+        self._remove_uds()
 
     def is_alive(self) -> bool:
-        return self.server_process.is_alive()
+        return all(
+            server_process.is_alive() for server_process in self.server_processes
+        )
+
+    @property
+    def pids(self) -> List[int]:
+        """PIDs of the running server processes"""
+        return [
+            server_process.xprocess_info.pid
+            for server_process in self.server_processes
+            if server_process.is_alive()
+        ]
 
     def __exit__(self, *args) -> None:
         self.stop()
@@ -263,55 +673,137 @@ class UvicornTestServerThread(BaseUvicornTestServerFacade):
     """Manages a background uvicorn application server for that runs in a parallel
     thread for i/o testing.
 
-    This test server thread is currently limited compared with the test server process.
-    The main benefits are:
+    The main benefits over the test server process are:
         - Can run outside of pytest, becuase it doesn't depend on pytest-xprocess
-        - The ability to run multiple servers at a time.
+        - Much cheaper to start and stop, so many servers can run at a time.
+
+    'stop()' asks the server to exit, waits up to 'stop_timeout' seconds for
+    in-flight requests and the lifespan shutdown to finish, then forces the exit.
+    With 'limit_max_requests' the server also exits on its own once that many
+    requests were handled.
 
-    The limitations are:
-        - Cannot run lifetime events.
-        - Requires setting 'limit_max_requests' to terminate the thread.
+    With the default "lifespan" readiness, 'start()' is woken by an event set when
+    server startup completes.
+
+    With 'metrics=True' the app is wrapped in a middleware that records the last
+    'metrics_size' requests it handled, see 'metrics()'. With 'resources=True'
+    the resources of the whole test process are sampled.
+
+    The "daphne" backend can't run in a thread, as Twisted's reactor can only be
+    started once per process.
 
     Init signature is forged from the Uvicorn server class:
     https://github.com/encode/uvicorn/blob/9d9f8820a8155e36dcb5e4d4023f470e51aa4e03/uvicorn/main.py#L369
     """
 
-    def __init__(self, app, **kwargs) -> None:
+    def __init__(
+        self,
+        app,
+        stop_timeout: float = 10.0,
+        metrics: bool = False,
+        metrics_size: int = 10000,
+        **kwargs,
+    ) -> None:
         super().__init__(**kwargs)
+        if not self.backend.supports_thread:
+            raise ValueError(
+                f"The {self.backend.name!r} server backend can't run in a thread"
+            )
         self.kwargs["app"] = app
+        self.stop_timeout = stop_timeout
+        self.metrics_enabled = metrics
+        self.metrics_size = metrics_size
+        self.thread: Optional[threading.Thread] = None
 
     def start(self) -> None:
-        thread = getattr(self, "thread", None)
-        if not thread:
-            if "limit_max_requests" not in self.kwargs.keys():
-                raise RuntimeError(
-                    f"{self.__class__.__name__} requires a value for",
-                    "parameter 'limit_max_requests' to determine when to",
-                    "close the thread.",
-                )
-
-            def install_signal_handlers_monkeypatch(self):
-                """https://github.com/encode/uvicorn/blob/9d9f8820a8155e36dcb5e4d4023f470e51aa4e03/tests/test_main.py#L21"""
-                pass
-
-            uvicorn.Server.install_signal_handlers = install_signal_handlers_monkeypatch
-            self.uvicorn = uvicorn.Server(config=uvicorn.Config(**self.kwargs))
-            self.thread = threading.Thread(target=self.uvicorn.run, daemon=True)
+        if not self.thread:
+            started_at = time.perf_counter()
+            super().start()
+            self.timings = start_timings(self._get_timings_name(), "thread")
+            self.uvicorn = self.backend.create_thread_server(
+                self.kwargs,
+                metrics_size=self.metrics_size if self.metrics_enabled else None,
+            )
+            self.thread = threading.Thread(
+                target=self.uvicorn.run, kwargs={"sockets": [self.socket]}, daemon=True
+            )
             self.thread.start()
-            while not self.uvicorn.started:
-                time.sleep(0.01)
+            self.timings.spawn = time.perf_counter() - started_at
+            probe = self.get_readiness_probe()
+            try:
+                wait_until_ready(
+                    probe, timeout=self.ready_timeout, is_alive=self.thread.is_alive
+                )
+            finally:
+                probe.close()
+            if self.uvicorn.started_event.is_set() and not self.uvicorn.started:
+                raise ServerStartupError(f"{self.__class__.__name__} failed to start.")
+            self.timings.ready = time.perf_counter() - started_at
+            self.timings.startup = self.uvicorn.startup_duration
+            self._start_resources()
         else:
             log.warning(
                 f"{self.__class__.__name__} instance is already running: {self}"
             )
 
-    def stop(self) -> None:
-        if self.is_alive():
-            self.thread.join()
+    def _get_timings_name(self) -> str:
+        app = self.kwargs["app"]
+        if isinstance(app, str):
+            return app
+        name = getattr(app, "__qualname__", type(app).__qualname__)
+        return f"{getattr(app, '__module__', '')}:{name}"
+
+    def _get_timing_middleware(self) -> TimingMiddleware:
+        middleware = getattr(getattr(self, "uvicorn", None), "timing_middleware", None)
+        if middleware is None:
+            raise RuntimeError(
+                f"{self.__class__.__name__} was not started with 'metrics=True'"
+            )
+        return middleware
+
+    def metrics(self) -> ServerMetrics:
+        """Return the requests recorded by the server, see 'metrics'"""
+        return ServerMetrics.from_responses(
+            [self._get_timing_middleware().get_metrics()]
+        )
+
+    def reset_metrics(self) -> None:
+        self._get_timing_middleware().reset_metrics()
+
+    def get_readiness_probe(self) -> ReadinessProbe:
+        if self.readiness == "lifespan":
+            return EventProbe(self.uvicorn.started_event)
+        else:
+            return super().get_readiness_probe()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Shut the server down gracefully, forcing it after 'timeout' seconds
+        (default 'stop_timeout')."""
+        self._stop_resources()
+        if self.thread:
+            stopped_at = time.perf_counter()
+            timeout = self.stop_timeout if timeout is None else timeout
+            self.uvicorn.request_exit()
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                log.warning(
+                    f"{self.__class__.__name__} did not stop within {timeout}"
+                    " seconds. Forcing exit."
+                )
+                self.uvicorn.request_exit(force=True)
+                self.thread.join(timeout)
+            if self.timings:
+                self.timings.shutdown = time.perf_counter() - stopped_at
+            self.thread = None
+        self._remove_uds()
 
     def is_alive(self) -> bool:
-        thread = getattr(self, "thread", None)
-        if thread:
-            return thread.is_alive()
+        if self.thread:
+            return self.thread.is_alive()
         else:
             return False
+
+    @property
+    def pids(self) -> List[int]:
+        """PID of the process running the server thread, while it runs"""
+        return [os.getpid()] if self.is_alive() else []
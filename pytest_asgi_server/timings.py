@@ -0,0 +1,117 @@
+# from __future__ import annotations
+
+import json
+from typing import Dict, List, Optional
+
+TIMING_FIELDS = ("spawn", "ready", "startup", "first_request", "shutdown")
+
+
+class ServerTimings:
+    """Durations in seconds of one start/stop cycle of a test server.
+
+    'spawn' is the time from 'start()' until the server process or thread exists,
+    'ready' until it is ready to serve, 'startup' the time uvicorn spent in its
+    startup including the lifespan startup events, 'first_request' the latency of
+    the first request sent by a PytestAsgiXClient and 'shutdown' the time 'stop()'
+    took. Durations that were not measured are None.
+    """
+
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.spawn: Optional[float] = None
+        self.ready: Optional[float] = None
+        self.startup: Optional[float] = None
+        self.first_request: Optional[float] = None
+        self.shutdown: Optional[float] = None
+
+    def __repr__(self) -> str:
+        values = " ".join(f"{k}={v}" for k, v in self.as_dict().items())
+        return f"<{self.__class__.__name__} {values}>"
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            **{field: getattr(self, field) for field in TIMING_FIELDS},
+        }
+
+
+class TimingsRegistry:
+    """Collects the ServerTimings of every server started during a test session"""
+
+    def __init__(self):
+        self.timings: List[ServerTimings] = []
+
+    def __len__(self) -> int:
+        return len(self.timings)
+
+    def add(self, timings: ServerTimings) -> None:
+        self.timings.append(timings)
+
+    def slowest(self, count: int = 10, field: str = "ready") -> List[ServerTimings]:
+        measured = [t for t in self.timings if getattr(t, field) is not None]
+        return sorted(measured, key=lambda t: getattr(t, field), reverse=True)[:count]
+
+    def totals(self) -> Dict[str, dict]:
+        """Return the number of starts and the summed durations per server name"""
+        totals: Dict[str, dict] = {}
+        for timings in self.timings:
+            entry = totals.setdefault(
+                timings.name, {"starts": 0, **{f: 0.0 for f in TIMING_FIELDS}}
+            )
+            entry["starts"] += 1
+            for field in TIMING_FIELDS:
+                entry[field] += getattr(timings, field) or 0.0
+        return totals
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "servers": [t.as_dict() for t in self.timings],
+                    "totals": self.totals(),
+                },
+                f,
+                indent=2,
+            )
+
+    def format_table(self, count: int = 10) -> List[str]:
+        def format_row(name: str, starts: str, values: list) -> str:
+            cells = ["-" if v is None else f"{v * 1000:.1f}ms" for v in values]
+            return f"{name[-40:]:<40} {starts:>6} " + " ".join(
+                f"{cell:>13}" for cell in cells
+            )
+
+        header = format_row("", "starts", [])
+        header += " ".join(f"{field:>13}" for field in TIMING_FIELDS)
+        lines = [f"slowest {count} server starts (by ready):", header]
+        for timings in self.slowest(count):
+            values = [getattr(timings, field) for field in TIMING_FIELDS]
+            lines.append(format_row(timings.name, "", values))
+        lines += ["", "totals per server:", header]
+        totals = sorted(self.totals().items(), key=lambda item: -item[1]["ready"])
+        for name, entry in totals:
+            values = [entry[field] for field in TIMING_FIELDS]
+            lines.append(format_row(name, str(entry["starts"]), values))
+        return lines
+
+
+_registry: Optional[TimingsRegistry] = None
+
+
+def set_registry(registry: Optional[TimingsRegistry]) -> None:
+    global _registry
+    _registry = registry
+
+
+def get_registry() -> Optional[TimingsRegistry]:
+    return _registry
+
+
+def start_timings(name: str, kind: str) -> ServerTimings:
+    """Return a new ServerTimings, added to the active TimingsRegistry if any"""
+    timings = ServerTimings(name, kind)
+    if _registry is not None:
+        _registry.add(timings)
+    return timings
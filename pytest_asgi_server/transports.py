@@ -0,0 +1,125 @@
+# from __future__ import annotations
+
+import asyncio
+from typing import Optional, Sequence, Union
+from urllib.parse import urlsplit
+
+from .errors import WebSocketClosed
+
+# "xserver" sends requests over the network, "asgi" directly to the app
+CLIENT_MODES = ("xserver", "asgi")
+
+
+class ASGIWebSocketSession:
+    """In-memory websocket connection to an ASGI app running in the test process.
+
+    Supports the parts of the 'websockets' client API that tests use: it can be
+    awaited or used as an asynchronous context manager to connect, and provides
+    'send()', 'recv()' and 'close()'. Raises WebSocketClosed when the app rejects
+    or closes the connection.
+    """
+
+    def __init__(
+        self,
+        app,
+        uri: str,
+        headers: Sequence = (),
+        subprotocols: Sequence[str] = (),
+        close_timeout: float = 5.0,
+    ):
+        self.app = app
+        self.url = urlsplit(uri)
+        self.headers = [
+            (bytes(k, "latin-1"), bytes(v, "latin-1")) for k, v in dict(headers).items()
+        ]
+        self.subprotocols = list(subprotocols)
+        self.close_timeout = close_timeout
+        self.subprotocol: Optional[str] = None
+        self.closed = False
+        self.task: Optional[asyncio.Future] = None
+
+    def _get_scope(self) -> dict:
+        return {
+            "type": "websocket",
+            "asgi": {"version": "3.0", "spec_version": "2.1"},
+            "http_version": "1.1",
+            "scheme": "wss" if self.url.scheme == "wss" else "ws",
+            "server": (self.url.hostname or "testserver", self.url.port or 80),
+            "client": ("127.0.0.1", 123),
+            "root_path": "",
+            "path": self.url.path or "/",
+            "raw_path": (self.url.path or "/").encode(),
+            "query_string": self.url.query.encode(),
+            "headers": [(b"host", b"testserver"), *self.headers],
+            "subprotocols": self.subprotocols,
+        }
+
+    async def connect(self) -> "ASGIWebSocketSession":
+        self.to_app: asyncio.Queue = asyncio.Queue()
+        self.from_app: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.ensure_future(
+            self.app(self._get_scope(), self.to_app.get, self.from_app.put)
+        )
+        await self.to_app.put({"type": "websocket.connect"})
+        message = await self._receive_from_app()
+        if message["type"] != "websocket.accept":
+            self.closed = True
+            raise WebSocketClosed(
+                "WebSocket connection rejected by the app",
+                code=message.get("code", 1000),
+                reason=message.get("reason", ""),
+            )
+        self.subprotocol = message.get("subprotocol")
+        return self
+
+    def __await__(self):
+        return self.connect().__await__()
+
+    async def __aenter__(self) -> "ASGIWebSocketSession":
+        return await self.connect()
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def _receive_from_app(self) -> dict:
+        get = asyncio.ensure_future(self.from_app.get())
+        await asyncio.wait([get, self.task], return_when=asyncio.FIRST_COMPLETED)
+        if get.done():
+            return get.result()
+        get.cancel()
+        self.closed = True
+        self.task.result()  # Raise the app's exception, if any
+        return {"type": "websocket.close", "code": 1006}
+
+    async def send(self, data: Union[str, bytes]) -> None:
+        if self.closed:
+            raise WebSocketClosed(code=1006)
+        if isinstance(data, str):
+            await self.to_app.put({"type": "websocket.receive", "text": data})
+        else:
+            await self.to_app.put({"type": "websocket.receive", "bytes": data})
+
+    async def recv(self) -> Union[str, bytes]:
+        if self.closed and self.from_app.empty():
+            raise WebSocketClosed(code=1006)
+        message = await self._receive_from_app()
+        if message["type"] == "websocket.close":
+            self.closed = True
+            raise WebSocketClosed(
+                code=message.get("code", 1000), reason=message.get("reason", "")
+            )
+        if message.get("text") is not None:
+            return message["text"]
+        return message["bytes"]
+
+    async def close(self, code: int = 1000) -> None:
+        if self.task is None or self.task.done():
+            self.closed = True
+            return
+        if not self.closed:
+            self.closed = True
+            await self.to_app.put({"type": "websocket.disconnect", "code": code})
+        try:
+            await asyncio.wait_for(self.task, self.close_timeout)
+        except asyncio.TimeoutError:
+            pass
@@ -1,5 +1,16 @@
+import array
 import contextlib
+import errno
+import json
+import os
+import select
+import shutil
 import socket
+import tempfile
+import time
+from typing import Callable, Optional, Sequence
+
+from .errors import ServerControlError, ServerStartupError, ServerStartupTimeout
 
 
 def get_unused_tcp_port() -> int:
@@ -15,3 +26,118 @@ def is_port_in_use(port: int, host: str = "localhost") -> bool:
 
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         return s.connect_ex((host, port)) == 0
+
+
+def bind_socket(
+    host: str, port: int = 0, backlog: int = 2048, reuse_port: bool = False
+) -> socket.socket:
+    """Return a listening TCP socket bound to (host, port).
+
+    With port 0 the OS picks an unused port. Binding up front, instead of picking a
+    port for the server to bind later, leaves no window for another process to
+    take the port in between. With 'reuse_port', SO_REUSEPORT is set so more
+    sockets can be bound to the same address.
+    """
+    family, type_, proto, _, address = socket.getaddrinfo(
+        host, port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE
+    )[0]
+    sock = socket.socket(family, type_, proto)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(address)
+        sock.listen(backlog)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def bind_unix_socket(path: str, backlog: int = 2048) -> socket.socket:
+    """Return a listening unix socket bound to 'path'.
+
+    A stale socket file at 'path' is replaced. Raises OSError(EADDRINUSE) if a
+    server is still listening on it.
+    """
+    if os.path.exists(path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            if probe.connect_ex(path) == 0:
+                raise OSError(errno.EADDRINUSE, os.strerror(errno.EADDRINUSE), path)
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(path)
+        sock.listen(backlog)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def send_control(control_path: str, cmd: str, timeout: float = 30.0, **kwargs) -> dict:
+    """Run the control command 'cmd' with 'kwargs' in the server process listening
+    at 'control_path' and return its response"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(control_path)
+        sock.sendall(json.dumps({"cmd": cmd, **kwargs}).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ServerControlError(f"Server closed the control connection on {cmd!r}")
+    response = json.loads(line)
+    if "error" in response:
+        raise ServerControlError(f"{cmd!r} failed: {response['error']}")
+    return response
+
+
+class SocketHandoff:
+    """Hands listening sockets to server processes.
+
+    Listens on a unix socket at 'path'. Each process that connects receives
+    duplicates of 'sockets' as SCM_RIGHTS ancillary data, preceded by their count.
+    """
+
+    def __init__(self, sockets: Sequence[socket.socket]):
+        self.sockets = sockets
+        self.tmpdir = tempfile.mkdtemp(prefix="pytest-asgi-server-")
+        self.path = os.path.join(self.tmpdir, "sockets.sock")
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.path)
+        self.listener.listen(16)
+
+    def serve(
+        self,
+        count: int = 1,
+        timeout: float = 10.0,
+        is_alive: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        """Send the sockets to the next 'count' processes that connect"""
+        deadline = time.monotonic() + timeout
+        fds = array.array("i", [sock.fileno() for sock in self.sockets])
+        while count:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ServerStartupTimeout(
+                    "No server process connected to receive its sockets.",
+                    timeout=timeout,
+                )
+            readable, _, _ = select.select(
+                [self.listener], [], [], min(remaining, 0.05)
+            )
+            if not readable:
+                if is_alive and not is_alive():
+                    raise ServerStartupError("Server process exited during startup.")
+                continue
+            conn, _ = self.listener.accept()
+            with conn:
+                conn.sendmsg(
+                    [b"%d\n" % len(fds)],
+                    [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds)],
+                )
+            count -= 1
+
+    def close(self) -> None:
+        self.listener.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
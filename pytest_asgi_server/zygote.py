@@ -0,0 +1,144 @@
+# from __future__ import annotations
+
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, Optional, Sequence
+
+from xprocess import XProcess
+
+from .backends import get_backend
+from .errors import ServerStartupError
+from .readiness import LifespanProbe, LogPatternProbe, ReadinessProbe, wait_until_ready
+from .servers import PytestUvicornXServer, PytestXProcessWrapper
+from .utils import SocketHandoff
+
+
+class PytestZygoteProcessWrapper(PytestXProcessWrapper):
+    """Process wrapper that forks the server from a UvicornZygote instead of
+    spawning a new interpreter.
+
+    'args' are the same as for a cold spawned process. The zygote runs the script's
+    'main()' with 'args[2:]' in the forked child.
+    """
+
+    def __init__(self, *, zygote: "UvicornZygote", **kwargs):
+        super().__init__(**kwargs)
+        self.zygote = zygote
+
+    def start(
+        self,
+        probe: Optional[ReadinessProbe] = None,
+        handoff: Optional[SocketHandoff] = None,
+    ) -> None:
+        if self.is_alive():
+            raise RuntimeError(
+                f"'start()' was called while {self.__class__.__name__} is",
+                "already alive and connected.",
+            )
+        info = self.xprocess.getinfo(self.name)
+        if probe is None:
+            probe = LogPatternProbe(str(info.logpath), self.pattern)
+        info.pid = self.zygote.fork(
+            argv=self.args[2:], env=self.env, logpath=str(info.logpath)
+        )
+        self.spawned_at = time.perf_counter()
+        info.pidpath.write(str(info.pid))
+        self.xprocess_info = info
+        if handoff is not None:
+            handoff.serve(timeout=self.ready_timeout, is_alive=self.is_alive)
+        wait_until_ready(probe, timeout=self.ready_timeout, is_alive=self.is_alive)
+
+
+class UvicornZygote:
+    """Long-lived helper process that imports uvicorn and the 'preload' modules
+    once, then forks a PytestUvicornXServer process for each server started with
+    'zygote=<UvicornZygote>'.
+
+    Forked servers only pay for applying their config and env and starting to
+    serve. Modules in 'preload' are imported before the per-server env is applied,
+    so they must not read it at import time.
+    """
+
+    def __init__(
+        self,
+        *,
+        pytestconfig,
+        xprocess: XProcess,
+        preload: Sequence[str] = (),
+        env: Dict[str, str] = {},
+        name: str = "pytest-asgi-server-zygote",
+        ready_timeout: float = 30.0,
+    ):
+        self.xprocess = xprocess
+        self.preload = list(preload)
+        self.name = name
+        self.pytest_rootdir = os.path.abspath(pytestconfig.rootdir)
+        self.tmpdir = tempfile.mkdtemp(prefix="pytest-asgi-server-zygote-")
+        self.script_path = os.path.join(self.tmpdir, "runner.py")
+        self.control_path = os.path.join(self.tmpdir, "control.sock")
+        pypath = [p for p in env.get("PYTHONPATH", "").split(":") if p]
+        self.env = {**env, "PYTHONPATH": ":".join([*pypath, self.pytest_rootdir])}
+        self.process = PytestXProcessWrapper(
+            xprocess=xprocess,
+            name=name,
+            pattern=get_backend("uvicorn").pattern,
+            args=[],
+            env=self.env,
+            ready_timeout=ready_timeout,
+        )
+
+    def __enter__(self) -> "UvicornZygote":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        with open(self.script_path, "w") as f:
+            f.write(PytestUvicornXServer.run_script)
+        probe = LifespanProbe()
+        params = {
+            "rootdir": self.pytest_rootdir,
+            "preload": self.preload,
+            "control_path": self.control_path,
+            "ready_path": probe.path,
+        }
+        self.process.args = [
+            sys.executable,
+            self.script_path,
+            "--zygote",
+            json.dumps(params),
+        ]
+        try:
+            self.process.start(probe=probe)
+        finally:
+            probe.close()
+
+    def stop(self) -> None:
+        self.process.stop()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def fork(self, *, argv: Sequence[str], env: dict, logpath: str) -> int:
+        """Fork a child from the zygote that runs 'main(argv)' and return its PID"""
+        if not self.is_alive():
+            raise ServerStartupError(f"{self.__class__.__name__} is not running.")
+        request = {"argv": list(argv), "env": env, "logpath": logpath}
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.control_path)
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            response = sock.makefile().readline()
+        if not response:
+            raise ServerStartupError(f"{self.__class__.__name__} failed to fork.")
+        return json.loads(response)["pid"]
+
+    def process_wrapper(self, **kwargs) -> PytestZygoteProcessWrapper:
+        return PytestZygoteProcessWrapper(zygote=self, **kwargs)
@@ -1,8 +1,10 @@
+import contextlib
 import json
+import os
 
 from starlette.applications import Starlette
 from starlette.endpoints import WebSocketEndpoint
-from starlette.responses import HTMLResponse
+from starlette.responses import HTMLResponse, Response
 from starlette.routing import Route, WebSocketRoute
 from starlette.websockets import WebSocket
 
@@ -11,6 +13,26 @@ async def get_message(request):
     return HTMLResponse(json.dumps({"msg": "Hello World"}))
 
 
+async def get_pid(request):
+    return HTMLResponse(json.dumps({"pid": os.getpid()}))
+
+
+async def get_bytes(request):
+    return Response(b"x" * request.path_params["size"])
+
+
+async def get_startups(request):
+    return HTMLResponse(json.dumps({"startups": startups}))
+
+
+leaked = []
+
+
+async def leak(request):
+    leaked.append(bytearray(10000))
+    return HTMLResponse(json.dumps({"leaked": len(leaked)}))
+
+
 class BroadcastWebSocket(WebSocketEndpoint):
     connected: list = []
 
@@ -26,9 +48,25 @@ class BroadcastWebSocket(WebSocketEndpoint):
         self.connected.remove(websocket)
 
 
+# Number of lifespan startups in this process
+startups = 0
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global startups
+    startups += 1
+    yield
+
+
 app = Starlette(
+    lifespan=lifespan,
     routes=[
         Route("/api", endpoint=get_message),
+        Route("/pid", endpoint=get_pid),
+        Route("/leak", endpoint=leak),
+        Route("/startups", endpoint=get_startups),
+        Route("/bytes/{size:int}", endpoint=get_bytes),
         WebSocketRoute("/ws", endpoint=BroadcastWebSocket),
     ],
 )
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from pytest_asgi_server.clients import PytestAsgiXClient
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+async def _max_loop_stall(coro) -> float:
+    """Run 'coro' and return the longest time the event loop was blocked meanwhile"""
+    stalls = []
+    done = asyncio.Event()
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            stalls.append(now - last)
+            last = now
+
+    task = asyncio.ensure_future(ticker())
+    try:
+        await coro
+    finally:
+        done.set()
+        await task
+    return max(stalls)
+
+
+@pytest.mark.asyncio
+async def test_xserver_astart_does_not_block_loop(xserver_factory):
+    xserver = xserver_factory(**xserver_params, pooled=False)
+    try:
+        assert await _max_loop_stall(xserver.astart()) < 0.1
+        assert xserver.is_alive()
+        async with httpx.AsyncClient() as client:
+            resp = await client.get(xserver.http_base_url + "/api")
+            assert resp.status_code == 200
+    finally:
+        await xserver.astop()
+    assert not xserver.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_server_thread_astart_and_astop(server_thread_factory):
+    server = server_thread_factory(lifespan=False)
+    await server.astart()
+    async with httpx.AsyncClient() as client:
+        resp = await client.get(server.http_base_url + "/api")
+        assert resp.status_code == 200
+    await server.astop()
+    assert not server.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_xclients_start_concurrently(xserver_factory):
+    clients = [
+        PytestAsgiXClient(xserver_factory(**xserver_params, name=f"async-start{n}"))
+        for n in range(3)
+    ]
+    await asyncio.gather(*(client.__aenter__() for client in clients))
+    try:
+        for client in clients:
+            resp = await client.get("/pid")
+            assert resp.status_code == 200
+        assert len({client.xserver.pids[0] for client in clients}) == 3
+    finally:
+        await asyncio.gather(*(client.__aexit__() for client in clients))
+    assert not any(client.xserver.is_alive() for client in clients)
@@ -0,0 +1,61 @@
+import httpx
+import pytest
+from pytest_asgi_server.backends import get_backend
+from pytest_asgi_server.servers import UvicornTestServerThread
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+def test_backend_kwargs_are_validated(app):
+    with pytest.raises(ValueError):
+        get_backend("gunicorn")
+    assert UvicornTestServerThread(app, lifespan=False).kwargs["lifespan"] == "off"
+    with pytest.raises(TypeError):
+        UvicornTestServerThread(app, backend="uvicorn", certfile="cert.pem")
+    pytest.importorskip("hypercorn")
+    server = UvicornTestServerThread(app, backend="hypercorn", certfile="cert.pem")
+    assert server.is_ssl
+    with pytest.raises(TypeError):
+        UvicornTestServerThread(app, backend="hypercorn", ssl_certfile="cert.pem")
+
+
+@pytest.mark.parametrize("backend", ["hypercorn", "daphne"])
+def test_xserver_backend(xserver_factory, backend):
+    pytest.importorskip(backend)
+    with xserver_factory(backend=backend, **xserver_params) as xserver:
+        response = httpx.get(xserver.http_base_url + "/api")
+        assert response.status_code == 200
+        assert response.json() == {"msg": "Hello World"}
+        assert xserver.timings.startup is not None
+
+
+@pytest.mark.parametrize("readiness", ["lifespan", "log"])
+def test_xserver_backend_readiness(xserver_factory, readiness):
+    pytest.importorskip("hypercorn")
+    with xserver_factory(
+        backend="hypercorn", readiness=readiness, **xserver_params
+    ) as xserver:
+        assert httpx.get(xserver.http_base_url + "/api").status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_server_thread_backend_http2(server_thread_factory):
+    pytest.importorskip("hypercorn")
+    pytest.importorskip("h2")
+    with server_thread_factory(backend="hypercorn", metrics=True) as server:
+        async with httpx.AsyncClient(
+            base_url=server.http_base_url, http1=False, http2=True
+        ) as client:
+            response = await client.get("/")
+        assert response.http_version == "HTTP/2"
+    assert not server.is_alive()
+    # Recorded once the response is sent, which may be after the client got it
+    assert server.metrics().count == 1
+
+
+def test_daphne_server_thread_is_not_supported(app, xserver_factory):
+    pytest.importorskip("daphne")
+    with pytest.raises(ValueError):
+        UvicornTestServerThread(app, backend="daphne")
+    with pytest.raises(ValueError):
+        xserver_factory(backend="daphne", uds=True, **xserver_params)
@@ -0,0 +1,129 @@
+import importlib.util
+import os
+
+import httpx
+import pytest
+from pytest_asgi_server.engines import ServerEngine, get_engine_matrix
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+def test_engine_matrix():
+    engines = get_engine_matrix(loop="asyncio,uvloop", http=["h11"])
+    assert engines == [
+        ServerEngine("asyncio", "h11", "auto"),
+        ServerEngine("uvloop", "h11", "auto"),
+    ]
+    assert engines[1].id == "uvloop-h11-auto"
+    assert engines[0].kwargs == {"loop": "asyncio", "http": "h11", "ws": "auto"}
+    with pytest.raises(ValueError):
+        get_engine_matrix(http="h3")
+
+
+def test_engine_missing_modules(monkeypatch):
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(
+        importlib.util,
+        "find_spec",
+        lambda name: None if name == "httptools" else find_spec(name),
+    )
+    assert ServerEngine(http="httptools").missing == ["httptools"]
+    assert ServerEngine(http="h11").missing == []
+
+
+@pytest.mark.asgi_server_engines(http=["h11", "httptools"], ws=["websockets"])
+def test_xserver_runs_with_engine(xserver_factory, asgi_server_engine, request):
+    assert request.node.callspec.id == asgi_server_engine.id
+    with xserver_factory(**xserver_params) as xserver:
+        assert xserver.kwargs["http"] == asgi_server_engine.http
+        assert xserver.kwargs["ws"] == "websockets"
+        assert httpx.get(xserver.http_base_url + "/api").status_code == 200
+
+
+@pytest.mark.asyncio
+@pytest.mark.asgi_server_engines(http="h11")
+async def test_server_thread_runs_with_engine(
+    server_thread_factory, asgi_server_engine, asgi_load, request
+):
+    with server_thread_factory(lifespan=False) as server:
+        assert server.kwargs["http"] == "h11"
+        async with httpx.AsyncClient(base_url=server.http_base_url) as client:
+            result = await asgi_load(client, "/api", duration=0.2, concurrency=2)
+    assert result.errors == 0
+    (entry,) = [r for r in request.config._asgi_server_engine_results if r[2] is result]
+    assert entry[:2] == ("test_server_thread_runs_with_engine", asgi_server_engine)
+
+
+@pytest.mark.asyncio
+@pytest.mark.asgi_server_engines(http=["auto", "h11"])
+async def test_engines_with_other_backend(
+    xserver_factory, asgi_server_engine, asgi_load, request
+):
+    pytest.importorskip("hypercorn")
+    xserver = xserver_factory(backend="hypercorn", **xserver_params)
+    assert asgi_server_engine.http == "auto"  # The h11 engine is skipped
+    with xserver:
+        assert "loop" not in xserver.kwargs
+        async with httpx.AsyncClient(base_url=xserver.http_base_url) as client:
+            result = await asgi_load(client, "/api", duration=0.1, concurrency=2)
+    assert result.errors == 0
+    engine_results = request.config._asgi_server_engine_results
+    assert not [r for r in engine_results if r[2] is result]
+
+
+CONFTEST = """
+import pytest
+
+pytest_plugins = "pytest_asgi_server"
+
+
+@pytest.fixture
+def app():
+    from tests.asgi_app import app
+
+    return app
+"""
+
+ENGINE_TEST = """
+import httpx
+import pytest
+
+
+@pytest.mark.asgi_server_engines(http=["auto", "h11"])
+def test_engine(server_thread_factory, asgi_server_engine):
+    with server_thread_factory() as server:
+        assert "http" not in server.kwargs
+        assert httpx.get(server.http_base_url + "/api").status_code == 200
+"""
+
+
+def test_engine_matrix_with_other_backend(pytester, monkeypatch):
+    pytest.importorskip("hypercorn")
+    monkeypatch.setenv("PYTHONPATH", os.path.dirname(os.path.dirname(__file__)))
+    pytester.makeconftest(CONFTEST)
+    pytester.makepyfile(ENGINE_TEST)
+    result = pytester.runpytest_subprocess("--asgi-server-backend=hypercorn", "-rs")
+    result.assert_outcomes(passed=1, skipped=1)
+    result.stdout.fnmatch_lines(["*asyncio-h11-auto only applies to the uvicorn*"])
+
+
+ASGI_LOAD_TEST = """
+import httpx
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_asgi_load(app, asgi_server_engine, asgi_load):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        await asgi_load(client, "/api", duration=0.1, concurrency=2)
+"""
+
+
+def test_engine_table_without_server_timings(pytester, monkeypatch):
+    monkeypatch.setenv("PYTHONPATH", os.path.dirname(os.path.dirname(__file__)))
+    pytester.makeconftest(CONFTEST)
+    pytester.makepyfile(ASGI_LOAD_TEST)
+    result = pytester.runpytest_subprocess()
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["*asgi-server engines*", "test_asgi_load *"])
@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.mark.asgi_server_external
+@pytest.mark.asyncio
+async def test_websocket_fanout_over_xserver(xclient, asgi_ws_fanout):
+    async with xclient as client:
+        result = await asgi_ws_fanout(
+            client, "/ws", connections=20, ramp_up=0.1, messages=5
+        )
+    assert result.connect_errors == 0
+    assert result.connections == 20
+    assert result.deliveries == result.expected_deliveries == 100
+    assert 0 < result.delivery.percentile(99) < 1
+    assert result.rss_before and result.rss_after
+
+
+@pytest.mark.asgi_server_client_mode("asgi")
+@pytest.mark.asyncio
+async def test_websocket_fanout_in_process(xclient, asgi_ws_fanout):
+    async with xclient as client:
+        result = await asgi_ws_fanout(client, "/ws", connections=10, messages=3)
+    assert result.deliveries == 30
+    assert result.memory_per_connection is None
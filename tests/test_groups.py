@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from pytest_asgi_server.errors import ServerGroupError, ServerStartupError
+from pytest_asgi_server.groups import ServerGroup, start_all, stop_all
+from pytest_asgi_server.servers import UvicornTestServerThread
+
+startup_delay = 0.3
+
+
+def make_app(fail: bool = False):
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                event = (await receive())["type"].split(".")[1]
+                if event == "startup":
+                    await asyncio.sleep(startup_delay)
+                    if fail:
+                        await send({"type": "lifespan.startup.failed"})
+                        return
+                await send({"type": f"lifespan.{event}.complete"})
+                if event == "shutdown":
+                    return
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    return app
+
+
+def test_start_all_starts_servers_concurrently():
+    servers = [UvicornTestServerThread(app=make_app()) for _ in range(6)]
+    started_at = time.perf_counter()
+    start_all(servers)
+    try:
+        assert time.perf_counter() - started_at < startup_delay * 3
+        for server in servers:
+            assert httpx.get(server.http_base_url).status_code == 204
+    finally:
+        stop_all(servers)
+    assert not any(server.is_alive() for server in servers)
+
+
+def test_start_all_aggregates_errors_and_stops_started_servers():
+    servers = [UvicornTestServerThread(app=make_app()) for _ in range(3)]
+    failing = [UvicornTestServerThread(app=make_app(fail=True)) for _ in range(2)]
+    with pytest.raises(ServerGroupError) as excinfo:
+        start_all(servers + failing)
+    assert {id(server) for server, _ in excinfo.value.errors} == set(map(id, failing))
+    assert all(isinstance(exc, ServerStartupError) for _, exc in excinfo.value.errors)
+    assert not any(server.is_alive() for server in servers)
+
+
+def test_server_group_of_xservers(xserver_factory):
+    group = ServerGroup(
+        xserver_factory(
+            appstr="tests.asgi_app:app",
+            env={"PYTHONDONTWRITEBYTECODE": "1"},
+            name=f"group-member{n}",
+        )
+        for n in range(3)
+    )
+    with group:
+        assert group.is_alive()
+        pids = {httpx.get(xs.http_base_url + "/pid").json()["pid"] for xs in group}
+        assert len(pids) == 3
+    assert not any(xserver.is_alive() for xserver in group)
+
+
+@pytest.mark.asyncio
+async def test_server_group_async_context_manager():
+    group = ServerGroup(UvicornTestServerThread(app=make_app()) for _ in range(3))
+    async with group:
+        async with httpx.AsyncClient() as client:
+            for server in group:
+                resp = await client.get(server.http_base_url)
+                assert resp.status_code == 204
+    assert not group.is_alive()
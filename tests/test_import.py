@@ -0,0 +1,28 @@
+import subprocess
+import sys
+
+from pytest_asgi_server.servers import PytestUvicornXServer, UvicornTestServerThread
+
+HEAVY_MODULES = ("httpx", "uvicorn", "websockets", "xprocess", "asgi_lifespan")
+
+
+def test_plugin_import_does_not_load_server_dependencies():
+    code = (
+        "import sys, pytest_asgi_server;"
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.strip() == "[]"
+
+
+def test_public_names_are_imported_on_access():
+    import pytest_asgi_server
+
+    assert pytest_asgi_server.PytestUvicornXServer is PytestUvicornXServer
+    assert pytest_asgi_server.UvicornTestServerThread is UvicornTestServerThread
+
+
+def test_config_param_keys_are_cached():
+    keys = PytestUvicornXServer._get_config_param_keys()
+    assert "port" in keys
+    assert UvicornTestServerThread._get_config_param_keys() is keys
@@ -0,0 +1,46 @@
+import random
+
+import pytest
+from pytest_asgi_server.load import LatencyHistogram, LoadRequest
+
+pytestmark = pytest.mark.asgi_server_client_mode("asgi")
+
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram()
+    values = sorted(random.Random(0).expovariate(100) for _ in range(10000))
+    for value in values:
+        histogram.record(value)
+    for percentile in (50, 90, 99):
+        expected = values[int(len(values) * percentile / 100) - 1]
+        assert histogram.percentile(percentile) == pytest.approx(expected, rel=0.01)
+    assert histogram.percentile(100) == values[-1]
+    assert histogram.count == len(values)
+
+
+def test_latency_histogram_corrects_coordinated_omission():
+    histogram = LatencyHistogram()
+    histogram.record_corrected(1.0, expected_interval=0.1)
+    assert histogram.count == 10
+    assert histogram.percentile(50) == pytest.approx(0.5, rel=0.01)
+
+
+@pytest.mark.asyncio
+async def test_asgi_load_closed_loop(xclient, asgi_load):
+    async with xclient as client:
+        result = await asgi_load(client, "/api", duration=0.2, concurrency=4)
+    assert result.requests > 0
+    assert result.errors == 0
+    assert result.status_codes == {200: result.requests}
+    assert 0 < result.p50 <= result.p99 <= result.max
+
+
+@pytest.mark.asyncio
+async def test_asgi_load_open_loop(xclient, asgi_load):
+    mix = [LoadRequest("GET", "/api", weight=3), LoadRequest("GET", "/missing")]
+    async with xclient as client:
+        result = await asgi_load(client, mix, duration=0.5, rate=200, seed=1)
+    assert result.requests == 100
+    assert 0 < result.errors < result.requests
+    assert result.errors == result.status_codes[404]
+    assert result.p99 < 0.5
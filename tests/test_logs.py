@@ -0,0 +1,60 @@
+import os
+
+import httpx
+from pytest_asgi_server.logs import LogTail, get_test_logs
+
+xserver_params = dict(
+    appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"}, pooled=False
+)
+
+
+def test_log_tail_reads_incrementally(tmp_path):
+    path = tmp_path / "server.log"
+    path.write_text("before\n")
+    tail = LogTail(str(path), max_lines=3)
+    with open(path, "a") as f:
+        f.write("one\ntw")
+        f.flush()
+        assert tail.poll() == 1
+        f.write("o\nthree\n")
+    mark = tail.mark()
+    with open(path, "a") as f:
+        f.write("four\nfive\n")
+    assert tail.lines_since(mark) == ["four", "five"]
+    assert tail.lines_since(0) == ["three", "four", "five"]
+    assert tail.count == 5
+
+
+def test_log_tail_rotates_and_follows_truncation(tmp_path):
+    path = tmp_path / "server.log"
+    tail = LogTail(str(path), max_bytes=10)
+    path.write_text("0123456789abc\n")
+    assert tail.poll() == 1
+    assert path.read_text() == ""
+    assert (tmp_path / "server.log.1").read_text() == "0123456789abc\n"
+    with open(path, "a") as f:
+        f.write("next\n")
+    assert tail.lines_since(0) == ["0123456789abc", "next"]
+
+
+def test_xserver_log_is_tailed(xserver_factory):
+    xserver = xserver_factory(**xserver_params, log_lines=50)
+    with xserver:
+        (log,) = xserver.logs
+        mark = log.mark()
+        assert log in get_test_logs()
+        httpx.get(xserver.http_base_url + "/api")
+        assert any("Uvicorn running on" in line for line in log.lines_since(0))
+    assert any('"GET /api HTTP/1.1" 200' in line for line in log.lines_since(mark))
+    assert log in get_test_logs() and not xserver.logs
+
+
+def test_xserver_log_is_rotated_on_start(xserver_factory):
+    xserver = xserver_factory(**xserver_params, name="rotated", log_max_bytes=100)
+    logpath = str(xserver.xprocess.getinfo("rotated").logpath)
+    with open(logpath, "a") as f:
+        f.write("x" * 200 + "\n")
+    with xserver:
+        pass
+    assert os.path.exists(logpath + ".1")
+    assert "x" * 200 not in open(logpath).read()
@@ -0,0 +1,49 @@
+import httpx
+import pytest
+from pytest_asgi_server.memory import AllocationSite, MemoryDiff
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+def test_xserver_finds_growing_allocation_site(xserver_factory):
+    with xserver_factory(**xserver_params, tracemalloc=True) as xserver:
+        with httpx.Client(base_url=xserver.http_base_url) as client:
+            for _ in range(10):  # Warm up
+                client.get("/leak")
+                client.get("/api")
+            xserver.take_snapshot("before")
+            for _ in range(50):
+                client.get("/leak")
+            xserver.take_snapshot("after")
+            leaks = xserver.compare_snapshots("before", "after", limit=5)
+            xserver.take_snapshot("idle")
+            for _ in range(50):
+                client.get("/api")
+            xserver.take_snapshot("api")
+            api = xserver.compare_snapshots("idle", "api")
+    (site,) = leaks.filter(filename="asgi_app.py")
+    assert site is leaks.sites[0] and site.location.startswith(site.traceback[0])
+    assert 50 * 10000 <= site.size_diff < 60 * 10000
+    assert site.count_diff >= 50 and leaks.size_diff >= site.size_diff
+    assert not api.filter(filename="asgi_app.py")
+    assert not api.filter(min_size_diff=100000)
+
+
+def test_xserver_snapshots_require_tracemalloc_option(xserver_factory):
+    with xserver_factory(**xserver_params, tracemalloc=False) as xserver:
+        with pytest.raises(RuntimeError):
+            xserver.take_snapshot("before")
+
+
+def test_memory_diff_merges_replicas():
+    response = {
+        "fields": AllocationSite._fields,
+        "stats": [[["app.py:1"], 100, 200, 1, 2], [["app.py:2"], 10, 10, 1, 1]],
+        "size_diff": 90,
+        "count_diff": 2,
+    }
+    diff = MemoryDiff.from_responses([response, response])
+    assert [site.location for site in diff] == ["app.py:1", "app.py:2"]
+    assert diff.sites[0] == AllocationSite(("app.py:1",), 200, 400, 2, 4)
+    assert diff.size_diff == 180 and diff.count_diff == 4
+    assert len(diff.filter(min_size_diff=100)) == 1
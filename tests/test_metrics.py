@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from pytest_asgi_server.clients import PytestAsgiXClient
+from pytest_asgi_server.metrics import ServerMetrics
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+body_size = len(json.dumps({"msg": "Hello World"}))
+
+
+def test_xserver_metrics(xserver_factory):
+    with xserver_factory(**xserver_params, metrics=True) as xserver:
+        xserver.reset_metrics()
+        for _ in range(5):
+            httpx.get(xserver.http_base_url + "/api")
+        httpx.get(xserver.http_base_url + "/missing")
+        metrics = xserver.metrics()
+    assert metrics.count == 6 and metrics.dropped == 0
+    api = metrics.filter(path="/api", method="GET")
+    assert api.count == 5
+    assert {record["status"] for record in api.records} == {200}
+    assert api.bytes_sent == 5 * body_size
+    assert metrics.filter(status=404).count == 1
+    assert all(record["queued"] is not None for record in metrics.records)
+    assert 0 < api.handler.percentile(50) <= api.handler.max
+
+
+def test_xserver_metrics_ring_buffer(xserver_factory):
+    xserver = xserver_factory(**xserver_params, metrics=True, metrics_size=3)
+    with xserver:
+        xserver.reset_metrics()
+        for _ in range(5):
+            httpx.get(xserver.http_base_url + "/api")
+        metrics = xserver.metrics()
+        xserver.reset_metrics()
+        assert xserver.metrics().total == 0
+    assert metrics.count == 3 and metrics.total == 5 and metrics.dropped == 2
+
+
+@pytest.mark.asyncio
+async def test_server_thread_metrics_include_websockets(
+    server_thread_factory, random_string_factory
+):
+    with server_thread_factory(metrics=True) as server:
+        async with PytestAsgiXClient(server) as client:
+            ws = await client.websocket_connect("/ws")
+            message = random_string_factory() + "\u00e9\u20ac"
+            await ws.send(message)
+            assert await ws.recv() == message
+            await ws.close()
+            await client.get("/api")
+            for _ in range(100):  # The websocket is recorded when its app returns
+                if len(server.metrics()) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            metrics = server.metrics()
+            server.reset_metrics()
+            assert server.metrics().total == 0
+    records = {record["type"]: record for record in metrics.records}
+    assert records["websocket"]["path"] == "/ws"
+    assert records["websocket"]["status"] == 101
+    assert records["websocket"]["bytes_sent"] == len(message.encode())
+    assert records["http"]["bytes_sent"] == body_size
+
+
+def test_server_metrics_require_metrics_option(server_thread_factory):
+    with server_thread_factory(metrics=False) as server:
+        with pytest.raises(RuntimeError):
+            server.metrics()
+
+
+def test_server_metrics_merge_responses():
+    fields = ["type", "method", "path", "status", "queued", "handler", "bytes_sent"]
+    responses = [
+        {
+            "fields": fields,
+            "records": [["http", "GET", "/a", 200, 0, 0.1, 2]],
+            "total": 2,
+        },
+        {
+            "fields": fields,
+            "records": [["http", "GET", "/b", 500, 0, 0.2, 3]],
+            "total": 1,
+        },
+    ]
+    metrics = ServerMetrics.from_responses(responses)
+    assert metrics.count == 2 and metrics.dropped == 1 and metrics.bytes_sent == 5
+    assert metrics.filter(path="/b").handler.max == 0.2
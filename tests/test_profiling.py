@@ -0,0 +1,83 @@
+import os
+import pstats
+
+import httpx
+import pytest
+from pytest_asgi_server.profiling import get_current_test_name
+from pytest_asgi_server.utils import send_control
+
+xserver_params = dict(
+    appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"}, pooled=False
+)
+
+
+def test_sampling_profile_written_on_stop(xserver_factory):
+    xserver = xserver_factory(**xserver_params, profile="sample")
+    with xserver:
+        for _ in range(20):
+            httpx.get(xserver.http_base_url + "/api")
+        controldir = xserver.server_process.xprocess_info.controldir
+    path = str(controldir / "profiles" / (get_current_test_name() + ".collapsed"))
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert stack.startswith("MainThread;") and int(count) > 0
+
+
+def test_cprofile_dumps_are_segmented(xserver_factory):
+    with xserver_factory(**xserver_params, profile="cprofile") as xserver:
+        httpx.get(xserver.http_base_url + "/api")
+        (first,) = xserver.dump_profiles()
+        (second,) = xserver.dump_profiles()
+    assert first != second
+    assert os.path.basename(first) == get_current_test_name() + ".prof"
+    functions = {func[2] for func in pstats.Stats(first).stats}
+    assert "get_message" in functions
+    assert "get_message" not in {func[2] for func in pstats.Stats(second).stats}
+
+
+@pytest.mark.asgi_server_profile("sample")
+def test_profile_marker(xserver_factory):
+    xserver = xserver_factory(**xserver_params)
+    assert xserver.profile == "sample"
+
+
+def test_unknown_control_command_raises(xserver_factory):
+    from pytest_asgi_server.errors import ServerControlError
+
+    with xserver_factory(**xserver_params) as xserver:
+        path = xserver.get_control_path(xserver.server_process)
+        with pytest.raises(ServerControlError):
+            send_control(path, "no_such_command")
+
+
+def test_pooled_server_profile_per_test(pytester, monkeypatch):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    monkeypatch.setenv("PYTHONPATH", root)
+    pytester.makeconftest('pytest_plugins = "pytest_asgi_server"')
+    pytester.makepyfile(f"""
+        import httpx
+
+        params = dict(
+            appstr="tests.asgi_app:app",
+            env={{"PYTHONPATH": {root!r}, "PYTHONDONTWRITEBYTECODE": "1"}},
+            profile="sample",
+        )
+
+        def test_one(xserver_factory):
+            with xserver_factory(**params) as xserver:
+                httpx.get(xserver.http_base_url + "/api")
+
+        def test_two(xserver_factory):
+            with xserver_factory(**params) as xserver:
+                httpx.get(xserver.http_base_url + "/api")
+        """)
+    result = pytester.runpytest_subprocess("--asgi-server-pool")
+    result.assert_outcomes(passed=2)
+    names = sorted(path.name for path in pytester.path.rglob("*.collapsed"))
+    module = "test_pooled_server_profile_per_test.py"
+    assert names == [
+        f"{module}_test_one.collapsed",
+        f"{module}_test_two.collapsed",
+    ]
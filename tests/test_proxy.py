@@ -0,0 +1,72 @@
+import time
+
+import httpx
+import pytest
+from pytest_asgi_server.clients import PytestAsgiXClient
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+def timed_get(client, path="/api"):
+    started_at = time.perf_counter()
+    response = client.get(path)
+    return response, time.perf_counter() - started_at
+
+
+def test_proxy_latency_is_adjustable(server_thread, impairment_proxy_factory):
+    with impairment_proxy_factory(server_thread, latency=0.1) as proxy:
+        assert server_thread.is_alive()
+        with httpx.Client(base_url=proxy.http_base_url) as client:
+            response, elapsed = timed_get(client)
+            assert response.status_code == 200
+            assert elapsed >= 0.2  # Request and response are delayed
+            proxy.update(latency=0.0)
+            _, elapsed = timed_get(client)
+            assert elapsed < 0.1
+        assert proxy.stats["connections"] == 1
+        assert proxy.stats["bytes_downstream"] > 0
+    assert not server_thread.is_alive()
+    with pytest.raises(TypeError):
+        proxy.update(loss=0.1)
+
+
+def test_proxy_bandwidth_and_accept_delay(server_thread, impairment_proxy_factory):
+    proxy = impairment_proxy_factory(server_thread, bandwidth=500_000)
+    with proxy, httpx.Client(base_url=proxy.http_base_url) as client:
+        response, elapsed = timed_get(client, "/bytes/100000")
+        assert len(response.content) == 100_000
+        assert elapsed >= 0.18
+        assert proxy.stats["bytes_downstream"] > 100_000
+        proxy.update(bandwidth=None, accept_delay=0.2)
+        with httpx.Client(base_url=proxy.http_base_url) as new_client:
+            _, elapsed = timed_get(new_client)
+        assert elapsed >= 0.2
+        _, elapsed = timed_get(client)  # Already accepted
+        assert elapsed < 0.2
+
+
+def test_proxy_resets_connections(server_thread, impairment_proxy_factory):
+    proxy = impairment_proxy_factory(server_thread, reset_probability=1.0, seed=1)
+    with proxy, httpx.Client(base_url=proxy.http_base_url) as client:
+        with pytest.raises(httpx.TransportError):
+            client.get("/api")
+        assert proxy.stats["resets"] == 1
+        proxy.update(reset_probability=0.0)
+        assert client.get("/api").status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_xclient_through_proxy(
+    xserver_factory, impairment_proxy_factory, random_string_factory
+):
+    xserver = xserver_factory(**xserver_params)
+    proxy = impairment_proxy_factory(xserver, latency=0.01, jitter=0.01)
+    async with PytestAsgiXClient(proxy) as client:
+        assert xserver.is_alive()
+        assert client.base_url.port == proxy.port != xserver.port
+        assert (await client.get("/api")).status_code == 200
+        async with client.websocket_connect("/ws") as ws:
+            message = random_string_factory()
+            await ws.send(message)
+            assert await ws.recv() == message
+    assert not proxy.is_alive()
@@ -0,0 +1,42 @@
+import threading
+
+import httpx
+import pytest
+from pytest_asgi_server.errors import ServerStartupError, ServerStartupTimeout
+from pytest_asgi_server.readiness import EventProbe, TCPProbe, wait_until_ready
+from pytest_asgi_server.utils import get_unused_tcp_port
+
+
+def test_wait_until_ready_times_out():
+    probe = TCPProbe("127.0.0.1", get_unused_tcp_port())
+    with pytest.raises(ServerStartupTimeout):
+        wait_until_ready(probe, timeout=0.05)
+
+
+def test_wait_until_ready_raises_when_not_alive():
+    probe = EventProbe(threading.Event())
+    with pytest.raises(ServerStartupError):
+        wait_until_ready(probe, timeout=5, is_alive=lambda: False)
+
+
+@pytest.mark.parametrize("readiness", ["lifespan", "tcp", "http", "log"])
+def test_uvicorn_xprocess_server_readiness(xserver, readiness):
+    xserver.readiness = readiness
+    with xserver:
+        resp = httpx.get(xserver.http_base_url + "/api")
+        assert resp.status_code == 200
+
+
+def test_uvicorn_xprocess_server_startup_failure(xserver_factory):
+    xserver = xserver_factory(appstr="tests.asgi_app:missing", env={})
+    with pytest.raises(ServerStartupError):
+        xserver.start()
+    assert not xserver.is_alive()
+
+
+@pytest.mark.parametrize("readiness", ["lifespan", "tcp"])
+def test_server_thread_readiness(server_thread, readiness):
+    server_thread.readiness = readiness
+    with server_thread(limit_max_requests=1, lifespan=False) as server:
+        resp = httpx.get(server.http_base_url + "/api")
+        assert resp.status_code == 200
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import time
+
+import pytest
+from pytest_asgi_server.clients import PytestAsgiXClient
+from pytest_asgi_server.recording import TrafficRecorder, read_recording
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+async def record_traffic(xserver, path, random_string_factory):
+    with TrafficRecorder(path) as recorder:
+        async with PytestAsgiXClient(xserver, recorder=recorder) as client:
+            await client.get("/api", headers={"x-test": "1", "authorization": "secret"})
+            await client.post("/api", content=b"\x00body")
+            async with client.websocket_connect("/ws") as ws:
+                await ws.send(random_string_factory())
+                await ws.send(b"\x01\x02")
+                await ws.recv()
+    return recorder
+
+
+@pytest.mark.asyncio
+async def test_record_traffic(xserver_factory, random_string_factory, tmp_path):
+    path = tmp_path / "traffic.jsonl"
+    xserver = xserver_factory(**xserver_params)
+    recorder = await record_traffic(xserver, path, random_string_factory)
+    events = list(read_recording(path))
+    assert recorder.count == len(events) == 6
+    types = [event["type"] for event in events]
+    assert types == ["http", "http", "ws_connect", "ws_send", "ws_send", "ws_close"]
+    assert [event["t"] for event in events] == sorted(event["t"] for event in events)
+    get, post = events[:2]
+    assert get["path"] == "/api" and ["x-test", "1"] in get["headers"]
+    assert "authorization" not in dict(get["headers"]) and "body" not in get
+    assert post["method"] == "POST" and post["body"] == "AGJvZHk="
+    assert {event["id"] for event in events[2:]} == {1}
+    assert "text" in events[3] and events[4]["bytes"] == "AQI="
+    assert json.loads(path.read_text().splitlines()[0]) == {"t": 0, "type": "session"}
+    with pytest.raises(ValueError):
+        recorder.record({"type": "ws_close", "id": 1})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("speed", [None, 10.0])
+async def test_replay_traffic(
+    xserver_factory, asgi_replay, random_string_factory, tmp_path, speed
+):
+    path = tmp_path / "traffic.jsonl"
+    await record_traffic(xserver_factory(**xserver_params), path, random_string_factory)
+    fresh_xserver = xserver_factory(**xserver_params)
+    async with PytestAsgiXClient(fresh_xserver) as client:
+        result = await asgi_replay(client, path, speed=speed, concurrency=2)
+    assert result.status_codes == {200: 1, 405: 1, 101: 1}
+    assert not result.exceptions
+    assert result.histogram.count == 3
+
+
+@pytest.mark.asyncio
+async def test_replay_traffic_rejects_speed(xserver_factory, asgi_replay, tmp_path):
+    path = tmp_path / "traffic.jsonl"
+    path.write_text("")
+    async with PytestAsgiXClient(xserver_factory(**xserver_params)) as client:
+        with pytest.raises(ValueError):
+            await asgi_replay(client, path, speed=0)
+
+
+@pytest.mark.asyncio
+async def test_replay_appended_recordings(xserver_factory, asgi_replay, tmp_path):
+    path = tmp_path / "traffic.jsonl"
+    for _ in range(2):
+        with TrafficRecorder(path) as recorder:
+            recorder.record({"type": "ws_connect", "id": 1, "path": "/ws"})
+            recorder.record({"type": "ws_send", "id": 1, "text": "message"})
+            time.sleep(0.05)
+            recorder.record(
+                {"type": "http", "method": "GET", "path": "/api", "headers": []}
+            )
+    events = list(read_recording(path))
+    assert [event["session"] for event in events] == [1, 1, 1, 2, 2, 2]
+    times = [event["t"] for event in events]
+    assert times == sorted(times) and times[-1] >= 0.1
+    async with PytestAsgiXClient(xserver_factory(**xserver_params)) as client:
+        for speed in (None, 10.0):
+            result = await asyncio.wait_for(
+                asgi_replay(client, path, speed=speed), timeout=5
+            )
+            assert result.status_codes == {101: 2, 200: 2}
+            assert not result.exceptions
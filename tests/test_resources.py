@@ -0,0 +1,85 @@
+import os
+
+import httpx
+import pytest
+from pytest_asgi_server.resources import (
+    ResourceSample,
+    ResourceSamples,
+    read_resources,
+)
+from pytest_asgi_server.servers import UvicornTestServerThread
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+def make_samples(field, values, pid=1):
+    samples = []
+    for n, value in enumerate(values):
+        sample = ResourceSample(time=n, pid=pid, rss=0, cpu=0.0, fds=0, threads=1)
+        samples.append(sample._replace(**{field: value}))
+    return samples
+
+
+def test_read_resources():
+    sample = read_resources(os.getpid())
+    assert sample.pid == os.getpid()
+    assert sample.rss > 0 and sample.cpu > 0 and sample.fds > 0
+    assert sample.threads >= 1
+    assert read_resources(2**22 + 1) is None
+
+
+def test_resource_samples_growth():
+    growing = ResourceSamples(make_samples("fds", [10, 10, 11, 13]))
+    assert growing.is_growing("fds")
+    assert not growing.is_growing("fds", min_growth=4)
+    assert growing.growth("fds") == 3 and growing.peak("fds") == 13
+    assert not ResourceSamples(make_samples("fds", [10, 12, 10, 13])).is_growing("fds")
+    replicas = ResourceSamples(
+        make_samples("rss", [5, 4], pid=1) + make_samples("rss", [1, 2], pid=2)
+    )
+    assert replicas.is_growing("rss") and replicas.filter(pid=1).peak("rss") == 5
+    assert replicas.filter(since=1).values("rss") == [4, 2]
+    with pytest.raises(ValueError):
+        replicas.peak("pid")
+
+
+def test_xserver_resources(xserver_factory):
+    xserver = xserver_factory(
+        **xserver_params, replicas=2, resources=True, resources_interval=0.01
+    )
+    with xserver:
+        pids = xserver.pids
+        before = xserver.resources.sample()
+        for _ in range(20):
+            httpx.get(xserver.http_base_url + "/api")
+        samples = xserver.resources.since(before)
+    assert samples.pids == sorted(pids)
+    assert 0 < samples.peak("rss") < 2**30
+    assert samples.peak("threads") >= 1
+    assert not samples.is_growing("fds", min_growth=5)
+
+
+def test_server_thread_resources_detect_fd_leak():
+    leaked = []
+
+    async def leaky_app(scope, receive, send):
+        leaked.append(open(os.devnull))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    server = UvicornTestServerThread(
+        leaky_app, lifespan="off", resources=True, resources_interval=60
+    )
+    try:
+        with server:
+            with httpx.Client(base_url=server.http_base_url) as client:
+                marks = server.resources.sample()
+                for _ in range(5):
+                    client.get("/")
+                    server.resources.sample()
+                samples = server.resources.since(marks)
+        assert samples.pids == [os.getpid()]
+        assert samples.is_growing("fds", min_growth=5)
+    finally:
+        for f in leaked:
+            f.close()
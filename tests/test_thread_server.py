@@ -1,4 +1,5 @@
 import httpx
+from pytest_asgi_server.servers import UvicornTestServerThread
 
 
 def test_server_thread_is_alive(server_thread):
@@ -37,3 +38,42 @@ def test_server_thread_factory_http_requests_to_many_servers(server_thread_facto
                 assert resp.status_code == 200
                 resp = httpx.get(server_threads[0].http_base_url + "/api")
                 assert resp.status_code == 200
+
+
+def test_server_thread_stops_without_limit_max_requests(server_thread_factory):
+    server = server_thread_factory(lifespan=False)
+    with server:
+        for _ in range(3):
+            resp = httpx.get(server.http_base_url + "/api")
+            assert resp.status_code == 200
+    assert server.is_alive() is False
+
+
+def test_server_thread_can_restart(server_thread_factory):
+    server = server_thread_factory(lifespan=False)
+    for _ in range(2):
+        with server:
+            resp = httpx.get(server.http_base_url + "/api")
+            assert resp.status_code == 200
+        assert server.is_alive() is False
+
+
+def test_server_thread_runs_lifespan(server_thread_factory):
+    events = []
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                event = (await receive())["type"].split(".")[1]
+                events.append(event)
+                await send({"type": f"lifespan.{event}.complete"})
+                if event == "shutdown":
+                    return
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    server = UvicornTestServerThread(app=app, lifespan="on")
+    with server:
+        assert events == ["startup"]
+        assert httpx.get(server.http_base_url).status_code == 204
+    assert events == ["startup", "shutdown"]
@@ -0,0 +1,52 @@
+import json
+
+import httpx
+import pytest
+from pytest_asgi_server.clients import PytestAsgiXClient
+from pytest_asgi_server.timings import ServerTimings, TimingsRegistry, get_registry
+
+
+@pytest.mark.asgi_server_isolated
+@pytest.mark.asyncio
+async def test_xserver_records_timings(xserver):
+    async with PytestAsgiXClient(xserver) as client:
+        await client.get("/api")
+        await client.get("/api")
+        timings = xserver.timings
+        assert timings.kind == "xserver"
+        assert 0 < timings.spawn < timings.ready
+        assert 0 < timings.startup < timings.ready
+        assert timings.first_request > 0
+        assert timings.shutdown is None
+    assert timings.shutdown > 0
+    assert timings in get_registry().timings
+
+
+def test_server_thread_records_timings(server_thread):
+    with server_thread as server:
+        httpx.get(server.http_base_url + "/api")
+    timings = server.timings
+    assert timings.kind == "thread"
+    assert timings.name == "starlette.applications:Starlette"
+    assert 0 < timings.spawn < timings.ready
+    assert timings.startup > 0
+    assert timings.shutdown > 0
+
+
+def test_timings_registry_report(tmp_path):
+    registry = TimingsRegistry()
+    for name, ready in [("a:app", 0.2), ("b:app", 0.5), ("a:app", 0.1)]:
+        timings = ServerTimings(name, "xserver")
+        timings.ready = ready
+        registry.add(timings)
+    assert [t.ready for t in registry.slowest(2)] == [0.5, 0.2]
+    totals = registry.totals()
+    assert totals["a:app"]["starts"] == 2
+    assert totals["a:app"]["ready"] == pytest.approx(0.3)
+    assert any(
+        "a:app" in line and "300.0ms" in line for line in registry.format_table()
+    )
+    registry.write_json(tmp_path / "timings.json")
+    exported = json.loads((tmp_path / "timings.json").read_text())
+    assert len(exported["servers"]) == 3
+    assert exported["totals"]["b:app"]["ready"] == 0.5
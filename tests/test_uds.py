@@ -0,0 +1,48 @@
+import json
+import os
+
+import httpx
+import pytest
+from pytest_asgi_server.clients import PytestAsgiXClient
+
+xserver_params = dict(
+    appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"}, uds=True
+)
+
+
+@pytest.mark.parametrize("readiness", ["lifespan", "tcp", "http"])
+def test_uvicorn_xprocess_server_over_uds(xserver_factory, readiness):
+    with xserver_factory(**xserver_params, readiness=readiness) as xserver:
+        assert os.path.exists(xserver.uds)
+        transport = httpx.HTTPTransport(uds=xserver.uds)
+        with httpx.Client(transport=transport) as client:
+            resp = client.get(xserver.http_base_url + "/api")
+        assert resp.status_code == 200
+
+
+def test_uvicorn_xprocess_server_removes_uds_on_stop(xserver_factory):
+    xserver = xserver_factory(**xserver_params, pooled=False)
+    with xserver:
+        path = xserver.uds
+    assert not os.path.exists(path)
+    assert xserver.uds is None
+
+
+@pytest.mark.asyncio
+async def test_xclient_over_uds(xserver_factory, random_string_factory):
+    async with PytestAsgiXClient(xserver_factory(**xserver_params)) as client:
+        resp = await client.get("/api")
+        assert resp.status_code == 200
+        ws = await client.websocket_connect("/ws")
+        payload = {"key": random_string_factory()}
+        await ws.send(json.dumps(payload))
+        assert str(payload) == str(json.loads(await ws.recv()))
+        await ws.close()
+
+
+def test_server_thread_over_uds(server_thread_factory):
+    with server_thread_factory(uds=True) as server:
+        transport = httpx.HTTPTransport(uds=server.uds)
+        with httpx.Client(transport=transport) as client:
+            resp = client.get(server.http_base_url + "/api")
+        assert resp.status_code == 200
@@ -3,6 +3,8 @@ import json
 import pytest
 
 
+@pytest.mark.asgi_server_external
+@pytest.mark.asgi_server_isolated
 @pytest.mark.asyncio
 async def test_uvicorn_xclient_xserver_is_alive(xclient):
     assert xclient.xserver.is_alive() is False
@@ -51,3 +53,22 @@ async def test_broadcast_with_external_server(xclient, random_string_factory):
         ws2_resp = json.loads(await ws2.recv())
         ws3_resp = json.loads(await ws3.recv())
         assert ws1_resp == ws2_resp == ws3_resp == payload
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["xserver", "asgi"])
+async def test_xclient_runs_lifespan_once(xserver_factory, xclient_factory, mode):
+    from tests import asgi_app
+
+    startups = asgi_app.startups
+    xserver = xserver_factory(
+        appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"}
+    )
+    async with await xclient_factory(asgi_app.app, xserver, mode=mode) as client:
+        resp = await client.get("/startups")
+        assert client.startup_duration is not None
+    if mode == "xserver":
+        assert resp.json() == {"startups": 1}
+        assert asgi_app.startups == startups
+    else:
+        assert asgi_app.startups == startups + 1
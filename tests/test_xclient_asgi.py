@@ -0,0 +1,62 @@
+import json
+
+import pytest
+from pytest_asgi_server.errors import WebSocketClosed
+
+pytestmark = pytest.mark.asgi_server_client_mode("asgi")
+
+
+@pytest.mark.asyncio
+async def test_asgi_xclient_does_not_start_xserver(xclient):
+    async with xclient as client:
+        assert client.mode == "asgi"
+        resp = await client.get("/api")
+        assert resp.status_code == 200
+        assert json.loads(resp.text) == {"msg": "Hello World"}
+        assert client.xserver.is_alive() is False
+
+
+@pytest.mark.asyncio
+async def test_asgi_xclient_websocket_echo(xclient, random_string_factory):
+    async with xclient as client:
+        async with client.websocket_connect("/ws") as ws:
+            payload = {"key": random_string_factory()}
+            await ws.send(json.dumps(payload))
+            assert str(payload) == str(json.loads(await ws.recv()))
+
+
+@pytest.mark.asyncio
+async def test_asgi_xclient_websocket_rejected(xclient):
+    async with xclient as client:
+        with pytest.raises(WebSocketClosed):
+            await client.websocket_connect("/missing")
+
+
+@pytest.mark.asyncio
+async def test_asgi_xclient_runs_lifespan(xserver_factory, xclient_factory):
+    events = []
+
+    async def app(scope, receive, send):
+        assert scope["type"] == "lifespan"
+        while True:
+            message = await receive()
+            event = message["type"].split(".")[1]
+            events.append(event)
+            await send({"type": f"lifespan.{event}.complete"})
+            if event == "shutdown":
+                return
+
+    client = await xclient_factory(app, xserver=xserver_factory("unused:app", {}))
+    async with client:
+        assert events == ["startup"]
+    assert events == ["startup", "shutdown"]
+
+
+@pytest.mark.asgi_server_external
+@pytest.mark.asyncio
+async def test_external_marker_overrides_client_mode(xclient):
+    async with xclient as client:
+        assert client.mode == "xserver"
+        assert client.xserver.is_alive() is True
+        resp = await client.get("/api")
+        assert resp.status_code == 200
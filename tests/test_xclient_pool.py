@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from pytest_asgi_server.clients import PytestAsgiXClientPool, SharedAsgiXClient
+
+xclient_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+@pytest.fixture
+async def client_pool(xserver_pool):
+    pool = PytestAsgiXClientPool(
+        server_pool=xserver_pool, limits=httpx.Limits(max_keepalive_connections=2)
+    )
+    yield pool
+    await pool.adrain()
+
+
+@pytest.mark.asyncio
+async def test_shared_xclient_is_reused(client_pool):
+    client = await client_pool.acquire(**xclient_params)
+    assert isinstance(client, SharedAsgiXClient)
+    async with client:
+        assert (await client.get("/api")).status_code == 200
+    assert client.xserver.is_alive() is True
+    assert await client_pool.acquire(**xclient_params) is client
+    async with client:
+        assert (await client.get("/api")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_shared_xclient_resets_cookies_and_headers(client_pool):
+    async with await client_pool.acquire(**xclient_params) as client:
+        client.cookies.set("session", "abc")
+        client.headers["x-test"] = "1"
+    client = await client_pool.acquire(**xclient_params)
+    assert not client.cookies
+    assert "x-test" not in client.headers
+
+
+@pytest.mark.asyncio
+async def test_shared_xclient_reuses_open_websockets(
+    client_pool, random_string_factory
+):
+    async with await client_pool.acquire(**xclient_params) as client:
+        ws = await client.websocket_connect("/ws")
+        await ws.send(json.dumps({"key": random_string_factory()}))
+        await ws.recv()
+    async with await client_pool.acquire(**xclient_params) as client:
+        assert await client.websocket_connect("/ws") is ws
+        payload = {"key": random_string_factory()}
+        await ws.send(json.dumps(payload))
+        assert str(payload) == str(json.loads(await ws.recv()))
+        await ws.close()
+    async with await client_pool.acquire(**xclient_params) as client:
+        assert await client.websocket_connect("/ws") is not ws
+
+
+@pytest.mark.asyncio
+async def test_shared_xclient_drops_unread_messages(client_pool, random_string_factory):
+    async with await client_pool.acquire(**xclient_params) as client:
+        ws = await client.websocket_connect("/ws")
+        for _ in range(3):
+            await ws.send(random_string_factory())
+        await asyncio.sleep(0.1)  # Left unread
+    async with await client_pool.acquire(**xclient_params) as client:
+        assert await client.websocket_connect("/ws") is ws
+        message = random_string_factory()
+        await ws.send(message)
+        assert await ws.recv() == message
+
+
+@pytest.mark.asyncio
+async def test_xclient_pool_closes_clients(client_pool):
+    async with await client_pool.acquire(**xclient_params) as client:
+        assert (await client.get("/api")).status_code == 200
+        ws = await client.websocket_connect("/ws")
+    client.xserver.stop()
+    new_client = await client_pool.acquire(**xclient_params)
+    assert new_client is not client and client.is_closed
+    assert not client.idle_websockets and ws.state.name == "CLOSED"
+    async with new_client:
+        assert (await new_client.get("/api")).status_code == 200
+    await client_pool.adrain()
+    assert new_client.is_closed
@@ -1,9 +1,13 @@
+import threading
+
 import httpx
 import pytest
 from pytest_asgi_server.errors import (
     AddressAlreadyInUseException,
     AddressAlreadyInUseWarning,
 )
+from pytest_asgi_server.runner import receive_sockets
+from pytest_asgi_server.utils import SocketHandoff, bind_socket
 
 
 def test_uvicorn_xprocess_server_with_used_port_raises(xserver_factory):
@@ -30,3 +34,33 @@ def test_uvicorn_xprocess_server_with_specified_address_warns(xserver_factory):
             with xserver_factory(**xserver_params, port=xserver1.port) as xserver2:
                 httpx.get(xserver1.http_base_url + "/api")
                 assert not xserver2.is_alive()
+
+
+def test_uvicorn_xprocess_server_binds_port_on_start(xserver):
+    assert xserver.port == 0
+    with xserver:
+        assert xserver.port != 0
+        resp = httpx.get(xserver.http_base_url + "/api")
+        assert resp.status_code == 200
+
+
+def test_server_thread_with_used_port_raises(server_thread_factory):
+    with server_thread_factory(limit_max_requests=1, lifespan=False) as server1:
+        with pytest.raises(AddressAlreadyInUseException):
+            server_thread_factory(limit_max_requests=1, port=server1.port).start()
+        httpx.get(server1.http_base_url + "/api")
+
+
+def test_socket_handoff():
+    sock = bind_socket("127.0.0.1")
+    handoff = SocketHandoff([sock])
+    thread = threading.Thread(target=handoff.serve)
+    thread.start()
+    try:
+        (received,) = receive_sockets(handoff.path)
+        thread.join()
+        assert received.getsockname() == sock.getsockname()
+        received.close()
+    finally:
+        handoff.close()
+        sock.close()
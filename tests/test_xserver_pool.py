@@ -0,0 +1,55 @@
+import httpx
+import pytest
+from pytest_asgi_server.pools import PytestUvicornXServerPool
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+def test_pooled_xserver_is_alive(xserver_factory):
+    xserver = xserver_factory(**xserver_params, pooled=True)
+    assert xserver.is_alive() is False
+    with xserver:
+        assert xserver.is_alive() is True
+        resp = httpx.get(xserver.http_base_url + "/api")
+        assert resp.status_code == 200
+    assert xserver.is_alive() is False
+
+
+def test_pooled_xserver_reuses_process(xserver_factory, xserver_pool):
+    with xserver_factory(**xserver_params, pooled=True) as xserver1:
+        server1 = xserver1.server
+    with xserver_factory(**xserver_params, pooled=True) as xserver2:
+        assert xserver2.server is server1
+        assert xserver2.server.is_alive()
+    with xserver_factory(**xserver_params, pooled=True, lifespan=False) as xserver3:
+        assert xserver3.server is not server1
+
+
+def test_pooled_xserver_reset_hook(xserver_factory):
+    resets = []
+    with xserver_factory(**xserver_params, pooled=True, reset=resets.append) as xs:
+        server = xs.server
+    resets.clear()
+    with xserver_factory(**xserver_params, pooled=True, reset=resets.append):
+        assert resets == [server]
+
+
+def test_xserver_pool_evicts_idle_servers(xprocess, pytestconfig):
+    pool = PytestUvicornXServerPool(
+        pytestconfig=pytestconfig, xprocess=xprocess, max_size=1
+    )
+    server1 = pool.acquire(**xserver_params)
+    server2 = pool.acquire(**xserver_params, lifespan=False)
+    assert len(pool) == 2
+    pool.release(server1)
+    assert len(pool) == 1
+    assert not server1.is_alive()
+    pool.drain()
+    assert len(pool) == 0
+    assert not server2.is_alive()
+
+
+@pytest.mark.asgi_server_isolated
+def test_isolated_xserver_is_not_pooled(xserver_factory):
+    xserver = xserver_factory(**xserver_params)
+    assert not hasattr(xserver, "pool")
@@ -0,0 +1,41 @@
+import httpx
+import pytest
+
+xserver_params = dict(
+    appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"}, pooled=False
+)
+
+
+def get_pids(xserver, count):
+    pids = set()
+    for _ in range(count):
+        with httpx.Client() as client:
+            pids.add(client.get(xserver.http_base_url + "/pid").json()["pid"])
+    return pids
+
+
+@pytest.mark.parametrize("reuse_port", [False, True])
+def test_xserver_replicas_start_and_stop_together(xserver_factory, reuse_port):
+    xserver = xserver_factory(**xserver_params, replicas=3, reuse_port=reuse_port)
+    with xserver:
+        assert xserver.is_alive() is True
+        infos = [process.xprocess_info for process in xserver.server_processes]
+        assert len({info.pid for info in infos}) == 3
+        assert get_pids(xserver, 5) <= {info.pid for info in infos}
+    assert not any(info.isrunning() for info in infos)
+
+
+def test_xserver_replicas_balance_with_reuse_port(xserver_factory):
+    with xserver_factory(**xserver_params, replicas=3, reuse_port=True) as xserver:
+        assert len(get_pids(xserver, 50)) > 1
+
+
+def test_xserver_replicas_not_alive_if_one_exits(xserver_factory):
+    with xserver_factory(**xserver_params, replicas=2) as xserver:
+        xserver.server_processes[1].stop()
+        assert xserver.is_alive() is False
+
+
+def test_xserver_replicas_must_be_positive(xserver_factory):
+    with pytest.raises(ValueError):
+        xserver_factory(**xserver_params, replicas=0)
@@ -0,0 +1,50 @@
+import httpx
+import pytest
+from pytest_asgi_server.zygote import PytestZygoteProcessWrapper, UvicornZygote
+
+xserver_params = dict(appstr="tests.asgi_app:app", env={"PYTHONDONTWRITEBYTECODE": "1"})
+
+
+@pytest.fixture(scope="module")
+def zygote(xprocess, pytestconfig):
+    with UvicornZygote(
+        pytestconfig=pytestconfig,
+        xprocess=xprocess,
+        preload=["tests.asgi_app"],
+        name="test-zygote",
+    ) as zygote:
+        yield zygote
+
+
+def test_zygote_xserver_is_alive(xserver_factory, zygote):
+    xserver = xserver_factory(**xserver_params, zygote=zygote, pooled=False)
+    assert isinstance(xserver.server_process, PytestZygoteProcessWrapper)
+    assert xserver.is_alive() is False
+    with xserver:
+        assert xserver.is_alive() is True
+        resp = httpx.get(xserver.http_base_url + "/api")
+        assert resp.status_code == 200
+    assert xserver.is_alive() is False
+
+
+def test_zygote_forks_many_servers(xserver_factory, zygote):
+    xservers = [
+        xserver_factory(
+            **xserver_params, name=f"zygote-{n}", zygote=zygote, pooled=False
+        )
+        for n in range(3)
+    ]
+    for xserver in xservers:
+        xserver.start()
+    assert len({xserver.server_process.xprocess_info.pid for xserver in xservers}) == 3
+    for xserver in xservers:
+        resp = httpx.get(xserver.http_base_url + "/api")
+        assert resp.status_code == 200
+        xserver.stop()
+        assert not xserver.is_alive()
+
+
+def test_zygote_xserver_log_readiness(xserver_factory, zygote):
+    with xserver_factory(**xserver_params, zygote=zygote, readiness="log") as xserver:
+        resp = httpx.get(xserver.http_base_url + "/api")
+        assert resp.status_code == 200